@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Load generator for serve.py.
+
+Starts bench/mock_ionos.py in-process and serve.py as a subprocess pointed
+at it (``--upstream-override``), then has ``--clients`` simulated browsers
+each run ``--iterations`` VDC or location loads:
+
+    python3 bench/loadgen.py --scenario vdc --clients 4 --iterations 10
+    python3 bench/loadgen.py --scenario location --mode snapshot
+
+``--mode proxy`` replays the loadVDC()/loadLocation() call graph through
+``/proxy`` over six keep-alive connections per client, like a browser.
+``--mode snapshot`` calls ``/api/vdc/{id}/snapshot`` or
+``/api/location/{loc}/snapshot`` instead. Reports p50/p99 latency per
+load and per request, throughput, upstream calls and serve.py's peak RSS.
+"""
+
+import argparse
+import http.client
+import json
+import queue
+import resource
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Optional
+
+BENCH_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import mock_ionos  # noqa: E402
+import serve  # noqa: E402
+
+BROWSER_CONNECTIONS = 6  # per-host connection limit of browsers
+STARTUP_TIMEOUT_SECONDS = 20
+
+
+class Browser:
+    """One simulated browser: a few keep-alive connections to serve.py."""
+
+    def __init__(self, host: str, port: int, token: str, no_cache: bool = False,
+                 connections: int = BROWSER_CONNECTIONS) -> None:
+        self.host = host
+        self.port = port
+        self.headers = {"X-Token": token, "Accept-Encoding": "gzip"}
+        if no_cache:
+            self.headers["Cache-Control"] = "no-cache"
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        for _ in range(connections):
+            self._idle.put(None)
+        self.requests: list = []  # (ms, status)
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str,
+                body: Optional[bytes] = None) -> tuple:
+        """``(status, headers, decoded body)``; blocks while all connections are busy."""
+        conn = self._idle.get()
+        started = time.monotonic()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(
+                    self.host, self.port, timeout=serve.SNAPSHOT_TIMEOUT_SECONDS
+                )
+            conn.request(method, path, body=body, headers=self.headers)
+            resp = conn.getresponse()
+            data = serve.decode_body(resp.read(), resp.headers.get("Content-Encoding"))
+            if resp.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = None
+            with self._lock:
+                self.requests.append(((time.monotonic() - started) * 1000, 0))
+            raise
+        finally:
+            self._idle.put(conn)
+        with self._lock:
+            self.requests.append(((time.monotonic() - started) * 1000, resp.status))
+        return resp.status, resp.headers, data
+
+    def proxy_fetch(self, url: str) -> dict:
+        """``fetch`` for serve.FetchGraph: one GET through ``/proxy``."""
+        started = time.monotonic()
+        call = {"url": url, "status": 0, "body": None, "error": None, "cache": None}
+        try:
+            status, headers, data = self.request(
+                "GET", "/proxy?url=" + urllib.parse.quote(url, safe="")
+            )
+            call.update(status=status, cache=headers.get("X-Cache"))
+            if status >= 400:
+                call["error"] = data[:200].decode("utf-8", errors="replace")
+            else:
+                call["body"] = json.loads(data) if data.strip() else None
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            call["error"] = str(e)
+        call["ms"] = round((time.monotonic() - started) * 1000, 1)
+        return call
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_kb(pid: int, field: str = "VmHWM") -> Optional[int]:
+    """Resident set size of a process from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def start_server(port: int, upstream: str, extra_args: list) -> subprocess.Popen:
+    cache_file = Path(tempfile.mkdtemp(prefix="hub-bench-")) / "price-list.json"
+    proc = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR.parent / "serve.py"), "--no-browser",
+         "--port", str(port), "--upstream-override", upstream,
+         "--price-list-cache", str(cache_file), *extra_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"serve.py exited with status {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("serve.py did not start in time")
+
+
+def run_load(browser: Browser, scenario: str, mode: str, target: dict) -> dict:
+    """One VDC or location load; returns ``{"ms", "errors", "complete"}``."""
+    started = time.monotonic()
+    if mode == "snapshot":
+        if scenario == "vdc":
+            path = (f"/api/vdc/{target['id']}/snapshot?location="
+                    f"{urllib.parse.quote(target['location'])}")
+        else:
+            path = f"/api/location/{target['location']}/snapshot"
+        status, _, data = browser.request("GET", path)
+        result = json.loads(data) if status == 200 else {"errors": [status]}
+    elif scenario == "vdc":
+        result = serve.build_vdc_snapshot(
+            browser.proxy_fetch, target["id"], target["location"],
+            concurrency=BROWSER_CONNECTIONS,
+        )
+    else:
+        result = serve.build_location_snapshot(
+            browser.proxy_fetch, target["location"], concurrency=BROWSER_CONNECTIONS,
+        )
+    return {"ms": (time.monotonic() - started) * 1000,
+            "errors": len(result.get("errors") or []),
+            "complete": result.get("complete", False)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark serve.py against a mock IONOS API")
+    parser.add_argument("--scenario", choices=("vdc", "location"), default="vdc",
+                        help="What each iteration loads (default: vdc)")
+    parser.add_argument("--mode", choices=("proxy", "snapshot"), default="proxy",
+                        help="Browser-style /proxy calls or server-side snapshot endpoints")
+    parser.add_argument("--clients", type=int, default=4,
+                        help="Concurrent simulated browsers (default: 4)")
+    parser.add_argument("--iterations", type=int, default=10,
+                        help="Loads per client (default: 10)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="Untimed loads before measuring (default: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Send Cache-Control: no-cache so every /proxy call goes upstream")
+    parser.add_argument("--serve-args", default="",
+                        help='Extra serve.py arguments, e.g. "--workers 8 --cache-mb 0"')
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if any request failed or a load was incomplete")
+    mock_ionos.add_arguments(parser)
+    args = parser.parse_args()
+
+    state = mock_ionos.state_from_args(args)
+    mock = mock_ionos.serve_mock(state)
+    port = free_port()
+    proc = start_server(port, f"http://127.0.0.1:{mock.server_port}",
+                        shlex.split(args.serve_args))
+    contract = state.contract
+    if args.scenario == "vdc":
+        targets = [{"id": dc["id"], "location": dc["properties"]["location"]}
+                   for dc in contract.datacenters]
+    else:
+        targets = [{"location": serve.location_region(loc)} for loc in contract.locations]
+
+    browsers = [Browser("127.0.0.1", port, f"bench-token-{i}", args.no_cache)
+                for i in range(args.clients)]
+    loads: list = []
+    lock = threading.Lock()
+    peak_rss = [rss_kb(proc.pid, "VmRSS") or 0]
+    sampling = threading.Event()
+
+    def sample_rss() -> None:
+        while not sampling.wait(0.05):
+            peak_rss[0] = max(peak_rss[0], rss_kb(proc.pid, "VmRSS") or 0)
+
+    def client(index: int) -> None:
+        browser = browsers[index]
+        for i in range(args.warmup + args.iterations):
+            target = targets[(index + i) % len(targets)]
+            try:
+                load = run_load(browser, args.scenario, args.mode, target)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                load = {"ms": 0.0, "errors": 1, "complete": False, "exception": str(e)}
+            if i >= args.warmup:
+                with lock:
+                    loads.append(load)
+            elif i == args.warmup - 1:
+                browser.requests.clear()
+
+    threading.Thread(target=sample_rss, daemon=True).start()
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    sampling.set()
+
+    hwm = rss_kb(proc.pid)
+    stats_conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    stats_conn.request("GET", "/stats")
+    server_stats = json.loads(stats_conn.getresponse().read())
+    proc.terminate()
+    try:
+        proc.wait(serve.SHUTDOWN_GRACE_SECONDS + 5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    if hwm is None:  # no /proc: fall back to the child's rusage (bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        hwm = maxrss // 1024 if sys.platform == "darwin" else maxrss
+    mock.shutdown()
+
+    load_ms = [l["ms"] for l in loads if "exception" not in l]
+    request_ms = [ms for b in browsers for ms, _ in b.requests]
+    failed = sum(1 for b in browsers for _, status in b.requests
+                 if status == 0 or status >= 400)
+    cache = server_stats.get("response_cache", {})
+    report = {
+        "scenario": args.scenario, "mode": args.mode, "clients": args.clients,
+        "loads": len(loads),
+        "incomplete_loads": sum(1 for l in loads if not l["complete"]),
+        "load_ms": {"p50": percentile(load_ms, 50), "p99": percentile(load_ms, 99),
+                    "mean": statistics.fmean(load_ms) if load_ms else 0.0,
+                    "max": max(load_ms, default=0.0)},
+        "requests": len(request_ms), "failed_requests": failed,
+        "request_ms": {"p50": percentile(request_ms, 50),
+                       "p99": percentile(request_ms, 99)},
+        "loads_per_second": len(loads) / elapsed if elapsed else 0.0,
+        "requests_per_second": len(request_ms) / elapsed if elapsed else 0.0,
+        "upstream_calls": sum(v for k, v in state.counts.items()
+                              if not k.startswith("injected_")),
+        "cache_hits": cache.get("hits", 0), "cache_misses": cache.get("misses", 0),
+        "peak_rss_mb": round(max(hwm or 0, peak_rss[0]) / 1024, 1),
+        "elapsed_seconds": round(elapsed, 2),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args, contract)
+    if args.check and (failed or report["incomplete_loads"]):
+        sys.exit(1)
+
+
+def print_report(report: dict, args: argparse.Namespace,
+                 contract: "mock_ionos.Contract") -> None:
+    print(f"{args.scenario} loads via {args.mode}: {report['loads']} loads by "
+          f"{args.clients} client(s) in {report['elapsed_seconds']} s "
+          f"({len(contract.datacenters)} VDCs, {len(contract.servers)} servers, "
+          f"{args.latency_ms:g} ms upstream latency)")
+    print(f"  load     p50 {report['load_ms']['p50']:8.1f} ms   "
+          f"p99 {report['load_ms']['p99']:8.1f} ms   "
+          f"max {report['load_ms']['max']:8.1f} ms   "
+          f"{report['loads_per_second']:.2f} loads/s")
+    print(f"  request  p50 {report['request_ms']['p50']:8.1f} ms   "
+          f"p99 {report['request_ms']['p99']:8.1f} ms   "
+          f"{report['requests_per_second']:.1f} req/s   "
+          f"{report['requests']} requests, {report['failed_requests']} failed")
+    print(f"  upstream {report['upstream_calls']} calls   cache "
+          f"{report['cache_hits']} hits / {report['cache_misses']} misses   "
+          f"incomplete loads {report['incomplete_loads']}")
+    print(f"  serve.py peak RSS {report['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,734 @@
+#!/usr/bin/env python3
+"""
+Mock IONOS Cloud APIs for offline benchmarks.
+
+Serves a synthetic contract (VDCs with servers, NICs, LANs, load balancers
+and NAT gateways, IP blocks, DBaaS, NFS, VPN, Kafka and Kubernetes
+clusters), telemetry matrices, billing traffic, the GitBook docs MCP endpoint (SSE), the
+price list page and a streaming AI Model Hub, all from one port. The API
+is picked from the Host header, so point serve.py at it with:
+
+    python3 bench/mock_ionos.py --port 9000 --vdcs 8 --servers 40
+    python3 serve.py --upstream-override http://127.0.0.1:9000
+
+Latency and error injection (``--latency-ms``, ``--error-rate``, ...)
+apply to every request. ``GET /__mock/stats`` reports request counts and
+``GET /__mock/touch?dc=<id>`` edits one server of that VDC, which is what
+``/api/vdc/{id}/watch`` should then report.
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from typing import Optional
+
+LOCATIONS = ("de/fra", "de/txl", "es/vit", "gb/lhr", "fr/par", "us/las")
+MCP_SESSION_TTL_SECONDS = 600
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class Contract:
+    """A deterministic synthetic contract built from a seed.
+
+    Resources are stored fully expanded (IONOS shape: ``id``, ``type``,
+    ``href``, ``metadata``, ``properties``, ``entities``) and trimmed to
+    the requested ``depth`` when served.
+    """
+
+    def __init__(self, vdcs: int = 4, servers: int = 20, nics: int = 2,
+                 lans: int = 3, dbaas: int = 2, k8s: int = 1,
+                 locations: tuple = LOCATIONS[:2], nic_fallback: float = 0.1,
+                 seed: int = 1) -> None:
+        self.rng = random.Random(seed)
+        self.locations = locations
+        self.nic_fallback = nic_fallback
+        self.datacenters = [
+            self._datacenter(i, locations[i % len(locations)], servers, nics, lans)
+            for i in range(vdcs)
+        ]
+        self.by_id = {dc["id"]: dc for dc in self.datacenters}
+        self.servers = [s for dc in self.datacenters
+                        for s in dc["entities"]["servers"]["items"]]
+        self.ipblocks = [self._ipblock(i, loc) for i, loc in enumerate(locations)]
+        self.k8s = [self._k8s(i) for i in range(k8s)]
+        self.dbaas = {kind: [self._dbaas(kind, i) for i in range(dbaas)]
+                      for kind in ("postgresql", "mongodb", "mysql", "mariadb",
+                                   "nfs", "kafka", "wireguard", "ipsec")}
+
+    # ── Builders ─────────────────────────────────────────────────────
+
+    def _id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    @staticmethod
+    def _resource(kind: str, rid: str, href: str, properties: dict,
+                  entities: Optional[dict] = None) -> dict:
+        res = {
+            "id": rid, "type": kind, "href": href,
+            "metadata": {
+                "state": "AVAILABLE", "createdDate": "2026-01-01T00:00:00Z",
+                "lastModifiedDate": "2026-01-01T00:00:00Z",
+                "etag": hashlib.md5(f"{href}/{rid}".encode()).hexdigest(),
+            },
+            "properties": properties,
+        }
+        if entities is not None:
+            res["entities"] = entities
+        return res
+
+    @staticmethod
+    def _collection(href: str, items: list) -> dict:
+        return {"id": href.rsplit("/", 1)[-1], "type": "collection",
+                "href": href, "items": items}
+
+    def _datacenter(self, index: int, location: str, servers: int, nics: int,
+                    lans: int) -> dict:
+        dc_id = self._id()
+        href = f"https://api.ionos.com/cloudapi/v6/datacenters/{dc_id}"
+        subnet = index % 250
+        lan_items = [
+            self._resource("lan", str(n), f"{href}/lans/{n}", {
+                "name": f"lan-{n}", "public": n == 1, "ipv6CidrBlock": None,
+                "ipFailover": [],
+            })
+            for n in range(1, lans + 1)
+        ]
+        server_items = []
+        for s in range(servers):
+            sid = self._id()
+            shref = f"{href}/servers/{sid}"
+            nic_items = []
+            for n in range(nics):
+                lan = 1 + (s + n) % lans
+                ip = (f"85.{subnet}.{s // 250}.{s % 250 + 1}" if lan == 1
+                      else f"10.{subnet}.{lan}.{s % 250 + 10}")
+                nic_items.append(self._resource("nic", self._id(), f"{shref}/nics", {
+                    "name": f"nic-{n}", "mac": "02:01:%02x:%02x:%02x:%02x" % (
+                        subnet, lan, s // 256, s % 256),
+                    "ips": [ip], "dhcp": True, "lan": lan,
+                    "firewallActive": n == 0, "firewallType": "INGRESS",
+                }, {"firewallrules": self._collection(f"{shref}/firewallrules", [
+                    self._resource("firewall-rule", self._id(), f"{shref}/fw", {
+                        "name": name, "protocol": "TCP", "portRangeStart": port,
+                        "portRangeEnd": port, "sourceIp": None, "type": "INGRESS",
+                    }) for name, port in (("ssh", 22), ("https", 443))
+                ])}))
+            volume = self._resource("volume", self._id(), f"{shref}/volumes", {
+                "name": f"vol-{s}", "size": 20 + s % 5 * 10, "type": "SSD",
+                "licenceType": "LINUX", "bootServer": sid,
+            })
+            server = self._resource("server", sid, shref, {
+                "name": f"vm-{index}-{s}", "cores": 2 + s % 4, "ram": 2048 * (1 + s % 4),
+                "vmState": "RUNNING" if s % 7 else "SHUTOFF",
+                "availabilityZone": "AUTO", "cpuFamily": "INTEL_ICELAKE",
+                "type": "ENTERPRISE",
+            }, {
+                "nics": self._collection(f"{shref}/nics", nic_items),
+                "volumes": self._collection(f"{shref}/volumes", [volume]),
+            })
+            # Some servers come back from depth=5 without NIC details, which
+            # is what the frontend's NIC fallback exists for.
+            server["_shallow"] = self.rng.random() < self.nic_fallback
+            server_items.append(server)
+
+        public_ip = f"85.{subnet}.200.1"
+        nat = self._resource("natgateway", self._id(), f"{href}/natgateways", {
+            "name": f"nat-{index}", "publicIps": [public_ip],
+            "lans": [{"id": 2, "gatewayIps": [f"10.{subnet}.2.1/24"]}],
+        })
+        alb = self._resource("applicationloadbalancer", self._id(),
+                             f"{href}/applicationloadbalancers", {
+            "name": f"alb-{index}", "listenerLan": 1, "ips": [f"85.{subnet}.200.2"],
+            "targetLan": 2, "lbPrivateIps": [f"10.{subnet}.2.5/24"],
+        })
+        nlb = self._resource("networkloadbalancer", self._id(),
+                             f"{href}/networkloadbalancers", {
+            "name": f"nlb-{index}", "listenerLan": 1, "ips": [f"85.{subnet}.200.3"],
+            "targetLan": 3 if lans >= 3 else 2, "lbPrivateIps": [f"10.{subnet}.3.5/24"],
+        })
+        return self._resource("datacenter", dc_id, href, {
+            "name": f"vdc-{index}", "description": "synthetic", "location": location,
+            "version": 1, "features": [], "secAuthProtection": False,
+        }, {
+            "servers": self._collection(f"{href}/servers", server_items),
+            "lans": self._collection(f"{href}/lans", lan_items),
+            "natgateways": self._collection(f"{href}/natgateways", [nat]),
+            "applicationloadbalancers": self._collection(
+                f"{href}/applicationloadbalancers", [alb]),
+            "networkloadbalancers": self._collection(
+                f"{href}/networkloadbalancers", [nlb]),
+        })
+
+    def _ipblock(self, index: int, location: str) -> dict:
+        return self._resource("ipblock", self._id(),
+                              "https://api.ionos.com/cloudapi/v6/ipblocks", {
+            "name": f"block-{index}", "location": location, "size": 4,
+            "ips": [f"85.{index}.250.{n}" for n in range(1, 5)],
+            "ipConsumers": [],
+        })
+
+    def _k8s(self, index: int) -> dict:
+        cid = self._id()
+        dc = self.datacenters[index % len(self.datacenters)] if self.datacenters else None
+        pool = self._resource("nodepool", self._id(),
+                              f"https://api.ionos.com/cloudapi/v6/k8s/{cid}/nodepools", {
+            "name": f"pool-{index}", "nodeCount": 3, "cpuFamily": "INTEL_ICELAKE",
+            "datacenterId": dc["id"] if dc else None,
+            "lans": [{"id": 2, "dhcp": True}],
+        })
+        cluster = self._resource("k8s", cid,
+                                 f"https://api.ionos.com/cloudapi/v6/k8s/{cid}", {
+            "name": f"k8s-{index}", "k8sVersion": "1.30.4", "public": True,
+        }, {"nodepools": self._collection(
+            f"https://api.ionos.com/cloudapi/v6/k8s/{cid}/nodepools", [pool])})
+        return cluster
+
+    def _dbaas(self, kind: str, index: int) -> dict:
+        dc = self.datacenters[index % len(self.datacenters)] if self.datacenters else {}
+        subnet = self.datacenters.index(dc) % 250 if dc else 0
+        return {
+            "id": self._id(), "type": "cluster",
+            "metadata": {"state": "AVAILABLE"},
+            "properties": {
+                "displayName": f"{kind}-{index}", "name": f"{kind}-{index}",
+                "location": (dc.get("properties") or {}).get("location", ""),
+                "instances": 1, "cores": 2, "ram": 4096,
+                "connections": [{"datacenterId": dc.get("id"), "lanId": "2",
+                                 "cidr": f"10.{subnet}.2.{200 + index}/24"}],
+            },
+        }
+
+    def touch(self, dc_id: str) -> Optional[str]:
+        """Resize one server of a VDC (new etag too); returns its id."""
+        dc = self.by_id.get(dc_id)
+        if dc is None or not dc["entities"]["servers"]["items"]:
+            return None
+        server = self.rng.choice(dc["entities"]["servers"]["items"])
+        props = server["properties"]
+        props["cores"] = props["cores"] % 16 + 1
+        server["metadata"] = {
+            **server["metadata"],
+            "lastModifiedDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "etag": self._id().replace("-", ""),
+        }
+        return server["id"]
+
+    # ── Depth handling ───────────────────────────────────────────────
+
+    def shape(self, res: dict, depth: int, root: bool = True) -> dict:
+        """Trim a resource to what the API returns at ``depth``."""
+        if not root and depth <= 0:
+            return {"id": res["id"], "type": res["type"], "href": res["href"]}
+        out = {k: v for k, v in res.items() if k not in ("entities", "_shallow")}
+        if "entities" in res:
+            out["entities"] = {
+                name: self.shape_collection(
+                    coll, 0 if res.get("_shallow") and name == "nics" else depth - 1
+                )
+                for name, coll in res["entities"].items()
+            }
+        return out
+
+    def shape_collection(self, coll: dict, depth: int, offset: int = 0,
+                         limit: Optional[int] = None) -> dict:
+        items = coll["items"]
+        out = {k: v for k, v in coll.items() if k != "items"}
+        if limit is not None:
+            page = items[offset:offset + limit]
+            out.update(offset=offset, limit=limit, _links={})
+            if offset + limit < len(items):
+                out["_links"]["next"] = f"{coll['href']}?offset={offset + limit}&limit={limit}"
+        else:
+            page = items
+        out["items"] = [self.shape(item, depth, root=False) for item in page]
+        return out
+
+
+class MockState:
+    """Shared configuration, request counters and MCP sessions."""
+
+    def __init__(self, contract: Contract, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_statuses: tuple = (503,), stall_rate: float = 0.0,
+                 stall_seconds: float = 35.0, telemetry_points: int = 60,
+                 mcp_result_kb: int = 8, ai_tokens: int = 200,
+                 token_ms: float = 15.0, seed: int = 1) -> None:
+        self.contract = contract
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.telemetry_points = telemetry_points
+        self.mcp_result_kb = mcp_result_kb
+        self.ai_tokens = ai_tokens
+        self.token_ms = token_ms
+        self.rng = random.Random(seed)
+        self.counts: Counter = Counter()
+        self.mcp_sessions: dict = {}  # session id -> expiry
+        self._lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def roll(self) -> tuple:
+        """``(delay_seconds, error_status_or_None, stall)`` for one request."""
+        with self._lock:
+            delay = max(0.0, self.latency_ms
+                        + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            error = (self.rng.choice(self.error_statuses)
+                     if self.rng.random() < self.error_rate else None)
+            stall = self.rng.random() < self.stall_rate
+        return delay, error, stall
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    """Routes on the original Host header, then on the path."""
+
+    protocol_version = "HTTP/1.1"
+    state: MockState = None  # set by serve_mock()
+
+    # ── Plumbing ─────────────────────────────────────────────────────
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send_json(self, code: int, data, headers: Optional[dict] = None) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_sse(self, headers: Optional[dict] = None) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _sse(self, data: str, event: str = "message") -> None:
+        frame = f"event: {event}\ndata: {data}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+        self.wfile.flush()
+
+    def _end_sse(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _inject(self, family: str) -> bool:
+        """Apply latency and injected failures; True if a reply was sent."""
+        state = self.state
+        state.count(family)
+        delay, error, stall = state.roll()
+        if stall:
+            time.sleep(state.stall_seconds)
+        elif delay:
+            time.sleep(delay)
+        if error is None:
+            return False
+        state.count(f"injected_{error}")
+        headers = {"Retry-After": "1"} if error == 429 else None
+        self._send_json(error, {"httpStatus": error, "messages": [
+            {"errorCode": "000", "message": "Injected by mock_ionos"}
+        ]}, headers)
+        return True
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    # ── Routing ──────────────────────────────────────────────────────
+
+    def do_GET(self) -> None:
+        parsed = urllib.parse.urlsplit(self.path)
+        host = (self.headers.get("Host") or "").split(":")[0]
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        if parsed.path == "/__mock/stats":
+            self._send_json(200, dict(self.state.counts))
+            return
+        if parsed.path == "/__mock/touch":
+            self._send_json(200, {"id": self.state.contract.touch(params.get("dc", ""))})
+            return
+        if not self.headers.get("Authorization") and host != "docs.ionos.com":
+            self._send_json(401, {"httpStatus": 401, "messages": [
+                {"errorCode": "315", "message": "Unauthorized"}]})
+            return
+        family = self._family(host, parsed.path)
+        if self._inject(family):
+            return
+        if family == "price-list":
+            self._send_price_list()
+        elif family == "telemetry":
+            self._send_json(200, self._telemetry(params))
+        elif family == "billing":
+            self._send_json(200, self._billing(parsed.path))
+        elif family == "cloudapi":
+            self._cloudapi(parsed.path.split("/cloudapi/v6", 1)[1], params)
+        else:
+            self._send_json(200, self._service(host, parsed.path))
+
+    def do_POST(self) -> None:
+        parsed = urllib.parse.urlsplit(self.path)
+        host = (self.headers.get("Host") or "").split(":")[0]
+        body = self._body()
+        family = self._family(host, parsed.path)
+        if self._inject(family):
+            return
+        try:
+            message = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        if family == "mcp":
+            self._mcp(message)
+        elif parsed.path.endswith("/chat/completions"):
+            self._chat(message)
+        else:
+            self._send_json(404, {"httpStatus": 404, "messages": [
+                {"errorCode": "309", "message": f"No POST route for {parsed.path}"}]})
+
+    @staticmethod
+    def _family(host: str, path: str) -> str:
+        """Request family used for counters and routing."""
+        if "~gitbook/mcp" in path:
+            return "mcp"
+        if host == "docs.ionos.com" or "price-list" in path:
+            return "price-list"
+        if "/telemetry/" in path:
+            return "telemetry"
+        if path.startswith("/billing/"):
+            return "billing"
+        if path.startswith("/cloudapi/v6"):
+            return "cloudapi"
+        if path.endswith("/chat/completions"):
+            return "ai"
+        return host.split(".", 1)[0] if host.endswith(".ionos.com") else "other"
+
+    # ── Cloud API ────────────────────────────────────────────────────
+
+    def _cloudapi(self, path: str, params: dict) -> None:
+        contract = self.state.contract
+        depth = int(params.get("depth", 0) or 0)
+        parts = [p for p in path.split("/") if p]
+        base = "https://api.ionos.com/cloudapi/v6"
+        limit = int(params["limit"]) if params.get("limit") else None
+        offset = int(params.get("offset", 0) or 0)
+
+        def collection(name: str, items: list) -> dict:
+            return contract.shape_collection(
+                contract._collection(f"{base}/{name}", items), depth, offset, limit
+            )
+
+        if parts == ["datacenters"]:
+            self._send_json(200, collection("datacenters", contract.datacenters))
+        elif len(parts) >= 2 and parts[0] == "datacenters":
+            dc = contract.by_id.get(parts[1])
+            if dc is None:
+                self._send_json(404, {"httpStatus": 404, "messages": [
+                    {"errorCode": "309", "message": "Resource does not exist"}]})
+            elif len(parts) == 2:
+                self._send_json(200, contract.shape(dc, depth))
+            elif len(parts) == 5 and parts[2] == "servers" and parts[4] == "nics":
+                server = next((s for s in dc["entities"]["servers"]["items"]
+                               if s["id"] == parts[3]), None)
+                nics = server["entities"]["nics"] if server else {"items": [],
+                                                                   "href": ""}
+                self._send_json(200, contract.shape_collection(nics, depth))
+            elif len(parts) == 3 and parts[2] in dc["entities"]:
+                self._send_json(200, contract.shape_collection(
+                    dc["entities"][parts[2]], depth, offset, limit))
+            elif len(parts) == 4 and parts[2] in dc["entities"]:
+                item = next((i for i in dc["entities"][parts[2]]["items"]
+                             if i["id"] == parts[3]), None)
+                if item is None:
+                    self._send_json(404, {"httpStatus": 404, "messages": [
+                        {"errorCode": "309", "message": "Resource does not exist"}]})
+                else:
+                    self._send_json(200, contract.shape(item, depth))
+            else:
+                self._send_json(200, collection("/".join(parts), []))
+        elif parts == ["ipblocks"]:
+            self._send_json(200, collection("ipblocks", contract.ipblocks))
+        elif parts == ["k8s"]:
+            self._send_json(200, collection("k8s", contract.k8s))
+        elif len(parts) == 3 and parts[0] == "k8s" and parts[2] == "nodepools":
+            cluster = next((c for c in contract.k8s if c["id"] == parts[1]), None)
+            pools = cluster["entities"]["nodepools"] if cluster else {
+                "items": [], "href": f"{base}/k8s/{parts[1]}/nodepools"}
+            self._send_json(200, contract.shape_collection(pools, depth))
+        elif parts == ["locations"]:
+            self._send_json(200, collection("locations", [
+                {"id": loc, "type": "location", "href": f"{base}/locations/{loc}",
+                 "properties": {"name": loc}} for loc in contract.locations
+            ]))
+        elif parts == ["contracts"]:
+            self._send_json(200, {"type": "contract", "items": [{
+                "type": "contract",
+                "properties": {"contractNumber": 31000000, "owner": "bench@example.com",
+                               "status": "BILLABLE", "regDomain": "ionos.de"},
+            }]})
+        else:
+            self._send_json(200, collection("/".join(parts) or "root", []))
+
+    # ── Other services ───────────────────────────────────────────────
+
+    def _service(self, host: str, path: str) -> dict:
+        """Managed services: DBaaS, NFS, VPN, Kafka; empty for the rest."""
+        dbaas = self.state.contract.dbaas
+        location = host.split(".", 1)[1].rsplit(".ionos.com", 1)[0] if host.count(".") > 2 else ""
+        kind = None
+        for key in ("postgresql", "mongodb", "mysql"):
+            if f"/databases/{key}/" in path:
+                kind = key
+        service = host.split(".", 1)[0]
+        if service in ("mariadb", "nfs", "kafka") and path.endswith("/clusters"):
+            kind = service
+        elif path.endswith("/nfs/v1/clusters"):
+            kind = "nfs"
+        elif service == "vpn" and path.endswith("gateways"):
+            kind = "wireguard" if "wireguard" in path else "ipsec"
+        items = dbaas.get(kind, []) if kind else []
+        if location:
+            items = [c for c in items if (c["properties"].get("location") or "")
+                     .replace("/", "-").startswith(location)]
+        return {"id": path, "type": "collection", "items": items,
+                "offset": 0, "limit": 100, "_links": {}}
+
+    def _telemetry(self, params: dict) -> dict:
+        """A Prometheus matrix: one series per UUID in the query."""
+        query = params.get("query", "")
+        uuids = UUID_PATTERN.findall(query) or ["00000000-0000-0000-0000-000000000000"]
+        if "by (uuid)" not in query:
+            uuids = uuids[:1]
+        end = float(params.get("end") or time.time())
+        step = float(params.get("step") or 60)
+        points = self.state.telemetry_points
+        result = []
+        for uid in uuids:
+            seeded = random.Random(uid)
+            level = 10 if seeded.random() < 0.3 else seeded.uniform(1e3, 1e6)
+            result.append({
+                "metric": {"uuid": uid},
+                "values": [[end - (points - i) * step,
+                            f"{level * seeded.uniform(0.5, 1.5):.3f}"]
+                           for i in range(points)],
+            })
+        return {"status": "success",
+                "data": {"resultType": "matrix", "result": result}}
+
+    def _billing(self, path: str) -> dict:
+        """Last 30 days of traffic: bytes per VDC, or GB meters per server."""
+        datacenters = self.state.contract.datacenters
+        today = time.time() // 86400 * 86400
+        days = [time.strftime("%Y-%m-%d", time.gmtime(today - 86400 * (29 - i)))
+                for i in range(30)]
+        if "/traffic" in path:
+            vdcs = []
+            for dc in datacenters:
+                seeded = random.Random(dc["id"])
+                vdcs.append({
+                    "vdcUUID": dc["id"], "vdcName": dc["properties"]["name"],
+                    "dates": [{"Date": day, "In": seeded.randrange(10 ** 10),
+                               "Out": seeded.randrange(10 ** 10)} for day in days],
+                })
+            return {"metadata": {"unit": "Bytes"}, "trafficObj": {"vdc": vdcs}}
+        result = []
+        for dc in datacenters:
+            meters = []
+            for srv in dc["entities"]["servers"]["items"]:
+                seeded = random.Random(srv["id"])
+                meters.extend(
+                    {"serverId": srv["id"], "meterId": meter,
+                     "quantity": {"quantity": round(seeded.uniform(0, 5), 4),
+                                  "unit": "1G"},
+                     "from": f"{day}T00:00:00.000Z"}
+                    for day in days for meter in ("TI1000", "TO1000")
+                )
+            result.append({"id": dc["id"], "name": dc["properties"]["name"],
+                           "meters": meters})
+        return {"datacenters": result}
+
+    def _send_price_list(self) -> None:
+        rows = "".join(
+            f"<tr><td>{name} {n}</td><td>{0.01 * (n + 1):.4f} &euro;</td></tr>"
+            for name in ("vCPU core", "RAM GB", "SSD GB", "HDD GB", "IP address")
+            for n in range(40)
+        )
+        body = (f"<html><head><script>var x = 1;</script></head><body>"
+                f"<h1>Price list</h1><table><tr><th>Item</th><th>Price</th></tr>"
+                f"{rows}</table></body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ── Streaming endpoints ──────────────────────────────────────────
+
+    def _mcp(self, message: dict) -> None:
+        """GitBook MCP over Streamable HTTP; replies as server-sent events."""
+        state = self.state
+        method = message.get("method", "")
+        session = self.headers.get("Mcp-Session-Id", "")
+        now = time.monotonic()
+        with state._lock:
+            if method == "initialize":
+                session = uuid.uuid4().hex
+                state.mcp_sessions[session] = now + MCP_SESSION_TTL_SECONDS
+            elif state.mcp_sessions.get(session, 0) < now:
+                state.mcp_sessions.pop(session, None)
+                session = ""
+        if not session:
+            self._send_json(404, {"jsonrpc": "2.0", "error": {
+                "code": -32001, "message": "Session not found"}})
+            return
+        if "id" not in message:
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if method == "initialize":
+            result = {"protocolVersion": "2025-03-26", "capabilities": {"tools": {}},
+                      "serverInfo": {"name": "mock-gitbook", "version": "1"}}
+        elif method == "tools/list":
+            result = {"tools": [{
+                "name": "searchDocumentation",
+                "description": "Search the IONOS Cloud documentation",
+                "inputSchema": {"type": "object",
+                                "properties": {"query": {"type": "string"}}},
+            }]}
+        else:
+            query = ((message.get("params") or {}).get("arguments") or {}).get("query", "")
+            text = (f"Result for {query}: " + "lorem ipsum " * 100)[:1024]
+            result = {"content": [{"type": "text", "text": text}
+                                  for _ in range(state.mcp_result_kb)]}
+        self._start_sse({"Mcp-Session-Id": session})
+        self._sse(json.dumps({"jsonrpc": "2.0", "method": "notifications/progress",
+                              "params": {"progress": 0.5}}))
+        self._sse(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": result}))
+        self._end_sse()
+
+    def _chat(self, message: dict) -> None:
+        """OpenAI-style chat completions, streamed token by token if asked."""
+        state = self.state
+        words = [f"token{i} " for i in range(state.ai_tokens)]
+        if not message.get("stream"):
+            time.sleep(state.token_ms * state.ai_tokens / 1000)
+            self._send_json(200, {"choices": [{"index": 0, "message": {
+                "role": "assistant", "content": "".join(words)}}]})
+            return
+        self._start_sse()
+        try:
+            for word in words:
+                time.sleep(state.token_ms / 1000)
+                self._sse(json.dumps({"choices": [{"index": 0,
+                                                   "delta": {"content": word}}]}))
+            self._sse("[DONE]")
+            self._end_sse()
+        except OSError:
+            state.count("ai_cancelled")
+
+
+def serve_mock(state: MockState, host: str = "127.0.0.1",
+               port: int = 0) -> http.server.ThreadingHTTPServer:
+    """Start the mock on a daemon thread and return the server."""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ionos",
+                     daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Contract and fault-injection options, shared with loadgen.py."""
+    group = parser.add_argument_group("mock contract")
+    group.add_argument("--vdcs", type=int, default=4, help="Data centers (default: 4)")
+    group.add_argument("--servers", type=int, default=20,
+                       help="Servers per data center (default: 20)")
+    group.add_argument("--nics", type=int, default=2, help="NICs per server (default: 2)")
+    group.add_argument("--lans", type=int, default=3, help="LANs per data center (default: 3)")
+    group.add_argument("--dbaas", type=int, default=2,
+                       help="Clusters per managed service (default: 2)")
+    group.add_argument("--k8s", type=int, default=1, help="Kubernetes clusters (default: 1)")
+    group.add_argument("--locations", default="de/fra,de/txl",
+                       help="Comma-separated locations the VDCs are spread over")
+    group.add_argument("--nic-fallback", type=float, default=0.1,
+                       help="Share of servers returned without NIC details (default: 0.1)")
+    group.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    group = parser.add_argument_group("mock behaviour")
+    group.add_argument("--latency-ms", type=float, default=40.0,
+                       help="Added latency per request (default: 40)")
+    group.add_argument("--jitter-ms", type=float, default=10.0,
+                       help="Uniform +/- jitter on the latency (default: 10)")
+    group.add_argument("--error-rate", type=float, default=0.0,
+                       help="Share of requests answered with an error (default: 0)")
+    group.add_argument("--error-status", default="503",
+                       help="Comma-separated statuses to inject (default: 503)")
+    group.add_argument("--stall-rate", type=float, default=0.0,
+                       help="Share of requests that stall past the proxy timeout")
+    group.add_argument("--telemetry-points", type=int, default=60,
+                       help="Samples per telemetry series (default: 60)")
+    group.add_argument("--mcp-result-kb", type=int, default=8,
+                       help="Size of each docs search result in KB (default: 8)")
+    group.add_argument("--ai-tokens", type=int, default=200,
+                       help="Tokens per AI reply (default: 200)")
+    group.add_argument("--token-ms", type=float, default=15.0,
+                       help="Delay between streamed AI tokens (default: 15)")
+
+
+def state_from_args(args: argparse.Namespace) -> MockState:
+    contract = Contract(
+        vdcs=args.vdcs, servers=args.servers, nics=args.nics, lans=args.lans,
+        dbaas=args.dbaas, k8s=args.k8s,
+        locations=tuple(l.strip() for l in args.locations.split(",") if l.strip()),
+        nic_fallback=args.nic_fallback, seed=args.seed,
+    )
+    return MockState(
+        contract, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_status.split(",")),
+        stall_rate=args.stall_rate, telemetry_points=args.telemetry_points,
+        mcp_result_kb=args.mcp_result_kb, ai_tokens=args.ai_tokens,
+        token_ms=args.token_ms, seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock IONOS Cloud APIs for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind to")
+    parser.add_argument("--port", "-p", type=int, default=9000,
+                        help="Port to listen on (default: 9000)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    state = state_from_args(args)
+    server = serve_mock(state, args.host, args.port)
+    contract = state.contract
+    print(f"  [Mock] {len(contract.datacenters)} VDCs, {len(contract.servers)} servers "
+          f"on http://{args.host}:{server.server_port}", file=sys.stderr)
+    print(f"  [Mock] python3 serve.py --upstream-override "
+          f"http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
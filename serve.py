@@ -12,6 +12,7 @@ This lightweight server does two things:
 Usage:
   python3 serve.py
   python3 serve.py --port 8080
+  python3 serve.py --workers 64
 
 Then open http://localhost:8080 in your browser.
 No pip dependencies required - uses only Python standard library.
@@ -19,311 +20,5624 @@ No pip dependencies required - uses only Python standard library.
 License: Apache-2.0
 """
 
+import bisect
+import codecs
+import gzip
+import hashlib
+import heapq
+import html.parser
+import http.client
 import http.server
-import urllib.request
+import itertools
 import urllib.parse
-import urllib.error
 import ssl
 import json
+import math
+import mmap
+import os
 import socket
+import statistics
 import sys
+import tempfile
+import random
 import re
+import select
+import selectors
 import time
+import signal
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import webbrowser
 import argparse
+import email.utils
+from array import array
+from collections import Counter, OrderedDict, deque
 from pathlib import Path
 from typing import Optional
 
+try:  # optional: `pip install brotli` adds br alongside gzip
+    import brotli
+except ImportError:
+    brotli = None
+
 PORT = 8080
 HTML_FILE = "ionos-cloud-network-hub.html"
 SCRIPT_DIR = Path(__file__).parent.resolve()
+# State the server saves for itself; kept out of SCRIPT_DIR, which is served.
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ionos-cloud-network-hub"
 MAX_PORT_RETRIES = 10
 REQUEST_TIMEOUT_SECONDS = 30
 MAX_RESPONSE_BYTES = 10 * 1024 * 1024  # 10 MB
+BUFFER_THRESHOLD_BYTES = 1024 * 1024  # larger proxy responses are streamed
+STREAM_CHUNK_BYTES = 64 * 1024
+KEEPALIVE_TIMEOUT_SECONDS = 15
+SNAPSHOT_TIMEOUT_SECONDS = 120
+WATCH_INTERVAL_SECONDS = 10    # default poll interval of /api/vdc/{id}/watch
+WATCH_INTERVAL_MIN = 2
+WATCH_INTERVAL_MAX = 300
+WATCH_RECONCILE_POLLS = 30     # full-depth re-fetch every this many polls
+WATCH_MAX_PER_CLIENT = 4       # open watches per token and contract
+PREFETCH_RATE = 4.0            # upstream calls per second, all sessions together
+PREFETCH_REFRESH_SECONDS = 120  # re-walk each VDC well inside the stale window
+PREFETCH_IDLE_SECONDS = 1800   # forget a browser that stopped checking in
+PREFETCH_MAX_SESSIONS = 16
+PREFETCH_CONCURRENCY = 4
+COMPLIANCE_VDC_CONCURRENCY = 4  # VDC snapshots evaluated at once by /api/compliance
+COMPLIANCE_REPORTS = 1024       # per-VDC reports kept for unchanged-input reuse
+COMPLIANCE_TRANSFER_FACTOR = 3  # CST-02: outbound above this many times the median
+COMPLIANCE_TRANSFER_MIN_GB = 10
+# Rule id, category, what a passing result says, what a finding says.
+# Same rules, in the same order, as COMPLIANCE_PROMPT in the frontend.
+COMPLIANCE_RULES = (
+    ("NET-01", "Network", "All {total} servers have a NIC firewall or a security group",
+     "{count} of {total} servers have neither a NIC firewall nor a security group"),
+    ("NET-02", "Network", "Flow logs are enabled on every NIC of all {total} servers",
+     "{count} of {total} servers have NICs without flow logs"),
+    ("NET-03", "Network", "All {total} managed databases are on private LANs",
+     "{count} of {total} managed databases are connected to a public LAN"),
+    ("NET-04", "Network", "All {total} private LANs with servers have a NAT gateway",
+     "{count} of {total} private LANs with servers have no NAT gateway for egress"),
+    ("ACC-01", "Access", "All {total} protected servers use security groups",
+     "{count} of {total} protected servers rely on NIC firewalls only"),
+    ("ACC-02", "Access", "NIC multi-queue is on for all {total} servers with 2+ vCPUs",
+     "{count} of {total} servers with 2+ vCPUs have NIC multi-queue off"),
+    ("AUD-01", "Audit", "None of the {total} servers is shut off but still billable",
+     "{count} of {total} servers are SHUTOFF but still AVAILABLE (billable)"),
+    ("AUD-02", "Audit", "All {total} servers have descriptive names",
+     "{count} of {total} servers have generic or UUID names"),
+    ("CST-01", "Cost", "None of the {total} servers has 1 vCPU or 1 GB RAM or less",
+     "{count} of {total} servers have 1 vCPU or 1 GB RAM or less"),
+    ("CST-02", "Cost", "No outbound transfer outliers among {total} billed servers",
+     "{count} of {total} billed servers send far more data out than the others"),
+    ("DAT-01", "Data", "All {total} managed databases run a recent major version",
+     "{count} of {total} managed databases run an old major version"),
+    ("DAT-02", "Data", "All {total} managed databases have more than one instance",
+     "{count} of {total} managed databases run a single instance"),
+)
+# Snapshot key, version property and oldest major version still "recent".
+COMPLIANCE_DB_VERSIONS = (
+    ("postgresClusters", "postgresVersion", 15),
+    ("mysqlClusters", "mysqlVersion", 8),
+    ("mongoClusters", "mongoDBVersion", 6),
+    ("mariadbClusters", "mariadbVersion", 10),
+)
+GENERIC_NAME_RE = re.compile(
+    r"^(server|vm|node|host|instance|machine|unnamed|untitled|new server|test)?"
+    r"[\s_-]*\d*$", re.I,
+)
+PAGE_SIZE = 1000       # items per upstream page when ?paginate=1
+PAGE_SIZE_MAX = 10000
+PAGE_WINDOW = 4        # pages requested ahead while walking a collection
+BATCH_MAX_REQUESTS = 500
+BATCH_CONCURRENCY = 16
+COMPRESS_MIN_BYTES = 1024  # JSON responses smaller than this go out as-is
 
+# Upstream API bases, mirroring API_BASES in the frontend.
+CLOUD_API = "https://api.ionos.com/cloudapi/v6"
+DBAAS_PG_API = "https://api.ionos.com/databases/postgresql"
+DBAAS_MONGO_API = "https://api.ionos.com/databases/mongodb"
+DBAAS_MYSQL_API = "https://api.ionos.com/databases/mysql"
+NFS_API = "https://api.ionos.com/nfs/v1"
+TELEMETRY_API = "https://api.ionos.com/telemetry/api/v1"
+BILLING_API = "https://api.ionos.com/billing"
+# An IONOS location (``de/fra`` or ``de/fra/2``); it becomes part of a hostname.
+LOCATION_RE = re.compile(r"^[a-z]{2}/[a-z]+(/\d+)?$")
 
-class ProxyHandler(http.server.SimpleHTTPRequestHandler):
-    """HTTP handler that serves static files and proxies IONOS API calls."""
+UUID_RE = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.I
+)
+IDLE_THRESHOLD_BYTES_PER_SEC = 100  # same default as _idleThresholdBytesPerSec
+IDLE_SCAN_QUERY_MAX_CHARS = 3500    # keeps query_range URLs well under 8 KB
+TELEMETRY_CACHE_SERIES = 4096       # cached sample buffers (one per query/step)
+TELEMETRY_REFETCH_STEPS = 2         # newest samples are re-read; ingestion lags
+TELEMETRY_MAX_WINDOW = 24 * 3600
+BILLING_ROLLUP_TTL = 900           # same lifetime as cached /billing/ calls
+BILLING_ROLLUP_ENTRIES = 64        # contract + period rollups kept
+BILLING_METERS = {"TI1000": 0, "TO1000": 1}  # traffic in / out, in GB
+NETWORK_METRICS = (                 # same series as fetchNetworkMetrics()
+    ("bytesIn", "instance_network_in_bytes"),
+    ("bytesOut", "instance_network_out_bytes"),
+    ("packetsIn", "instance_network_in_packets"),
+    ("packetsOut", "instance_network_out_packets"),
+)
+STATIC_CACHED = (HTML_FILE, "docs/ionos-cloud-banner.svg")  # other files: from disk
+CHUNK_PREFIX = "/chunks/"            # --split-modules: content-hashed, cached for a year
+CHUNK_CACHE_CONTROL = "public, max-age=31536000, immutable"
+LAZY_START_RE = re.compile(r"^// @lazy ([\w-]+)[^\n]*\n", re.M)
+LAZY_END_RE = re.compile(r"^// @end-lazy[^\n]*\n", re.M)
+LAZY_SCRIPT_RE = re.compile(
+    r'^<script [^>]*\bdata-lazy="([\w-]+)"[^>]*\bsrc="([^"]+)"[^>]*></script>\n', re.M
+)
+TOP_LEVEL_FUNCTION_RE = re.compile(r"^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)", re.M)
+TOP_LEVEL_BINDING_RE = re.compile(r"^(?:let|const|var|class)\s+([A-Za-z_$][\w$]*)", re.M)
+IDENTIFIER_RE = re.compile(r"(?<![\w$.])[A-Za-z_$][\w$]*")
+TRANSLATIONS_RE = re.compile(r"^const TRANSLATIONS = \{\n(.*?)^\};\n", re.M | re.S)
+LOCALE_BLOCK_RE = re.compile(r"^  (\w\w): \{\n.*?^  \},?\n", re.M | re.S)
+DEFAULT_WORKERS = 32
+DEFAULT_MAX_STREAMS = 32  # event streams running outside the worker pool
+SHUTDOWN_GRACE_SECONDS = 10
+USER_AGENT = "IONOS-Cloud-Network-Hub/1.1"
+POOL_MAX_PER_HOST = 16
+POOL_IDLE_SECONDS = 60
+MAX_REDIRECTS = 5
+PRIORITY_INTERACTIVE = 0   # the view the user is looking at
+PRIORITY_BACKGROUND = 1    # prefetches and background refreshes
+HOST_BACKOFF_COOLDOWN = 1.0  # seconds between window cuts for one host
+RETRY_STATUSES = (429, 502, 503, 504)
+RETRY_ATTEMPTS = 3         # extra tries for an idempotent call
+RETRY_BASE_SECONDS = 0.5   # backoff doubles per attempt, +-50% jitter
+RETRY_BUDGET_SECONDS = 10  # all tries of one call, waits included
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+CACHE_STALE_SECONDS = 300  # serve stale while revalidating for this long
+CACHE_DEFAULT_TTL = 60     # same window as the frontend's memoizedFetch
+# TTL classes per endpoint family (matched against the upstream URL path,
+# first match wins, 0 = never cache).
+CACHE_TTL_RULES = (
+    (re.compile(r"/telemetry/"), 0),
+    (re.compile(r"/cloudapi/v6/(locations|contracts)\b"), 3600),
+    (re.compile(r"/datacenters/[^/]+"), 20),
+    (re.compile(r"/billing/"), 900),
+)
+PRICE_LIST_URL = (
+    "https://docs.ionos.com/cloud/support/general-information/"
+    "price-list/ionos-cloud-se-en"
+)
+PRICE_LIST_TTL = 3600              # refreshed in the background after this
+PRICE_LIST_JITTER = 0.1            # refresh up to 10% early, at random
+PRICE_LIST_RETRY_SECONDS = 300
+PRICE_LIST_MAX_HTML_BYTES = 512 * 1024
+PRICE_LIST_MAX_CHARS = 16000       # keeps the AI context manageable
+METRIC_ROUTES = frozenset((
+    "/proxy", "/proxy/batch", "/price-list", "/health", "/stats", "/metrics",
+    "/mcp-docs", "/mcp-docs-support", "/mcp-docs-tutorials",
+    "/api/telemetry/idle-scan", "/api/prefetch", "/api/billing/rollup",
+    "/api/compliance",
+    "/api/flowlogs", "/api/flowlogs/query",
+    "/api/flowlogs/aggregate", "/api/flowlogs/attribute",
+))
+METRIC_ROUTE_PATTERNS = (
+    (re.compile(r"^/api/vdc/[^/]+/snapshot$"), "/api/vdc/{id}/snapshot"),
+    (re.compile(r"^/api/vdc/[^/]+/watch$"), "/api/vdc/{id}/watch"),
+    (re.compile(r"^/api/vdc/[^/]+/compliance$"), "/api/vdc/{id}/compliance"),
+    (re.compile(r"^/api/telemetry/server/[^/]+/network$"),
+     "/api/telemetry/server/{id}/network"),
+    (re.compile(r"^/api/location/.+/snapshot$"), "/api/location/{location}/snapshot"),
+)
+MCP_CACHE_ENTRIES = 256   # docs search results kept per server
+MCP_CACHE_TTL = 1800      # seconds; docs change rarely
 
-    server_port: int = PORT  # set at runtime from main()
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=str(SCRIPT_DIR), **kwargs)
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTPServer that hands requests to a bounded pool of worker threads.
 
-    # ── Routing ──────────────────────────────────────────────────────
+    Connections wait in a selector until a request arrives and are then
+    queued per client address; the workers pull from those queues
+    round-robin, so a browser firing a burst of proxy calls cannot starve
+    another client. A worker serves one request at a time: a kept-alive
+    connection goes back to the selector afterwards instead of holding the
+    worker while idle, and is closed after ``KEEPALIVE_TIMEOUT_SECONDS``
+    without a request. The pool size caps the number of upstream calls in
+    flight at once. Long-lived event streams leave the pool through
+    ``detach_worker()``, up to ``max_streams`` at a time.
+    """
+
+    request_queue_size = 128  # browsers open many sockets at once
+
+    def __init__(self, server_address, handler_class,
+                 workers: int = DEFAULT_WORKERS,
+                 max_streams: int = DEFAULT_MAX_STREAMS) -> None:
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.max_streams = max_streams
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._closing = False
+        self.stopping = threading.Event()  # set on shutdown; ends event streams
+        self._local = threading.local()
+        self._streams = 0
+        self._parking: list = []  # (connection, deadline) for the idle thread
+        self._deadlines: dict = {}  # socket -> close time, idle connections
+        self._idle = selectors.DefaultSelector()
+        self._wake, self._waker = socket.socketpair()
+        self._wake.setblocking(False)
+        self._idle.register(self._wake, selectors.EVENT_READ)
+        self._stats = {"requests": 0, "parked": 0, "idle_closed": 0,
+                       "streams_started": 0, "streams_refused": 0}
+        self._thread_ids = itertools.count()
+        self._threads: list = []
+        for _ in range(workers):
+            self._start_worker()
+        self._idle_thread = threading.Thread(
+            target=self._idle_loop, name="hub-idle", daemon=True
+        )
+        self._idle_thread.start()
+
+    def process_request(self, request, client_address) -> None:
+        """Wait for the first request in the selector, not on a worker."""
+        self._park((request, client_address, None))
+
+    def park(self, handler) -> bool:
+        """Take back a kept-alive connection after one request.
+
+        Called from the handler's ``finish()``; returns False (the caller
+        then closes the connection) while the server is shutting down.
+        """
+        if self._closing:
+            return False
+        connection = (handler.request, handler.client_address, handler)
+        sock = handler.connection
+        try:
+            sock.settimeout(0)
+            buffered = handler.rfile.peek(1)  # a pipelined request, already read
+        except OSError:
+            return False
+        finally:
+            try:
+                sock.settimeout(handler.timeout)
+            except OSError:
+                pass
+        self._local.parked = True
+        if buffered:
+            self._enqueue(connection)
+        else:
+            self._park(connection)
+        return True
+
+    def detach_worker(self) -> bool:
+        """Move the calling worker's request (a long-lived stream) off the pool.
+
+        A replacement worker starts at once, and the calling thread exits
+        once its request is done. Returns False when ``max_streams``
+        streams are already open.
+        """
+        with self._cond:
+            if self._closing or self._streams >= self.max_streams:
+                self._stats["streams_refused"] += 1
+                return False
+            self._streams += 1
+            self._stats["streams_started"] += 1
+        self._local.detached = True
+        self._start_worker()
+        return True
+
+    def _start_worker(self) -> None:
+        thread = threading.Thread(
+            target=self._worker_loop, daemon=True,
+            name=f"hub-worker-{next(self._thread_ids)}",
+        )
+        with self._cond:
+            self._threads.append(thread)
+        thread.start()
+
+    def _park(self, connection) -> None:
+        with self._cond:
+            if self._closing:
+                closing = True
+            else:
+                closing = False
+                self._stats["parked"] += 1
+                self._parking.append(
+                    (connection, time.monotonic() + KEEPALIVE_TIMEOUT_SECONDS)
+                )
+        if closing:
+            self._close(connection)
+            return
+        try:
+            self._waker.send(b"\0")
+        except OSError:
+            pass
+
+    def _enqueue(self, connection) -> None:
+        client = connection[1][0] if connection[1] else ""
+        with self._cond:
+            if self._closing:
+                closing = True
+            else:
+                closing = False
+                self._queues.setdefault(client, deque()).append(connection)
+                self._cond.notify()
+        if closing:
+            self._close(connection)
+
+    def _close(self, connection) -> None:
+        request, _, handler = connection
+        if handler is not None:
+            try:
+                http.server.BaseHTTPRequestHandler.finish(handler)
+            except OSError:
+                pass
+        self.shutdown_request(request)
+
+    def _idle_loop(self) -> None:
+        """Hand connections to the workers as soon as a request arrives."""
+        deadlines = self._deadlines
+        while True:
+            ready = self._idle.select(timeout=1.0)
+            expired = []
+            with self._cond:
+                if self._closing:
+                    break
+                for key, _ in ready:
+                    if key.fileobj is self._wake:
+                        try:
+                            while self._wake.recv(4096):
+                                pass
+                        except OSError:
+                            pass
+                        continue
+                    self._idle.unregister(key.fileobj)
+                    deadlines.pop(key.fileobj, None)
+                    client = key.data[1][0] if key.data[1] else ""
+                    self._queues.setdefault(client, deque()).append(key.data)
+                    self._cond.notify()
+                for connection, deadline in self._parking:
+                    try:
+                        self._idle.register(connection[0], selectors.EVENT_READ,
+                                            connection)
+                    except (ValueError, OSError):
+                        expired.append(connection)  # closed meanwhile
+                        continue
+                    deadlines[connection[0]] = deadline
+                self._parking.clear()
+                now = time.monotonic()
+                for sock, deadline in list(deadlines.items()):
+                    if deadline <= now:
+                        expired.append(self._idle.unregister(sock).data)
+                        del deadlines[sock]
+                        self._stats["idle_closed"] += 1
+            for connection in expired:
+                self._close(connection)
+        for key in list(self._idle.get_map().values()):
+            if key.fileobj is not self._wake:
+                self._close(key.data)
+        for connection, _ in self._parking:
+            self._close(connection)
+        self._idle.close()
+
+    def _next_request(self):
+        """Pop the next connection, rotating fairly across clients."""
+        with self._cond:
+            while not self._queues:
+                if self._closing:
+                    return None
+                self._cond.wait()
+            client, queue = self._queues.popitem(last=False)
+            item = queue.popleft()
+            if queue:
+                self._queues[client] = queue  # re-append: back of the line
+            return item
+
+    def _worker_loop(self) -> None:
+        local = self._local
+        while True:
+            item = self._next_request()
+            if item is None:
+                return
+            request, client_address, handler = item
+            local.parked = False
+            try:
+                if handler is None:
+                    self.finish_request(request, client_address)
+                else:
+                    try:
+                        handler.handle()
+                    finally:
+                        handler.finish()
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                if not local.parked:
+                    self.shutdown_request(request)
+                with self._cond:
+                    self._stats["requests"] += 1
+            if getattr(local, "detached", False):
+                with self._cond:
+                    self._streams -= 1
+                    self._threads.remove(threading.current_thread())
+                return
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["workers"] = self.workers
+            stats["queued"] = sum(len(q) for q in self._queues.values())
+            stats["idle_connections"] = len(self._deadlines) + len(self._parking)
+            stats["streams"] = self._streams
+        return stats
+
+    def server_close(self) -> None:
+        """Stop accepting, then let workers drain queued connections."""
+        super().server_close()
+        self.stopping.set()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        try:
+            self._waker.send(b"\0")
+        except OSError:
+            pass
+        deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS
+        for thread in threads + [self._idle_thread]:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+def route_label(path: str) -> str:
+    """Bounded route name for metrics labels (ids collapsed, static grouped)."""
+    if path in METRIC_ROUTES:
+        return path
+    for pattern, label in METRIC_ROUTE_PATTERNS:
+        if pattern.match(path):
+            return label
+    return "/api/other" if path.startswith("/api/") else "static"
+
+
+class CountingWriter:
+    """Wraps a handler's ``wfile`` to count the bytes written to the client."""
+
+    __slots__ = ("raw", "bytes")
+
+    def __init__(self, raw) -> None:
+        self.raw = raw
+        self.bytes = 0
+
+    def write(self, data) -> int:
+        self.bytes += len(data)
+        return self.raw.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self.raw, name)
+
+
+class UpstreamTimer:
+    """Time one client request spent with upstream calls open.
+
+    A handler creates one per request and binds it to its thread; calls
+    it hands to executor threads bind the same timer there (see
+    ``ProxyHandler.fetch_json``). Overlapping calls count once, so the
+    total is wall time and stays within the request's own duration.
+    """
+
+    _local = threading.local()
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._open = 0
+        self._since = 0.0
+        self._total = 0.0
+
+    @classmethod
+    def current(cls) -> Optional["UpstreamTimer"]:
+        return getattr(cls._local, "timer", None)
+
+    @classmethod
+    def bind(cls, timer: Optional["UpstreamTimer"]) -> Optional["UpstreamTimer"]:
+        """Make ``timer`` the calling thread's; returns the one it replaces."""
+        previous = cls.current()
+        cls._local.timer = timer
+        return previous
+
+    def opened(self, now: float) -> None:
+        with self._lock:
+            if self._open == 0:
+                self._since = now
+            self._open += 1
+
+    def closed(self, now: float) -> None:
+        with self._lock:
+            self._open -= 1
+            if self._open == 0:
+                self._total += now - self._since
+
+    def elapsed(self) -> float:
+        with self._lock:
+            if self._open:
+                return self._total + time.monotonic() - self._since
+            return self._total
+
+
+class Metrics:
+    """Process-wide counters, gauges and latency histograms.
+
+    Rendered in the Prometheus text exposition format at ``/metrics``.
+    Series are keyed by metric name plus a tuple of label pairs. Upstream
+    calls are also reported to the calling thread's ``UpstreamTimer`` so a
+    handler can say how long its request waited on upstream
+    (``Server-Timing``).
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+               10.0, 30.0, 60.0)
+    FAMILIES = {
+        "hub_requests_total": (
+            "counter", "Requests handled, by route, method and status."),
+        "hub_request_duration_seconds": (
+            "histogram", "Time from request line to last byte, by route."),
+        "hub_response_bytes_total": (
+            "counter", "Bytes written to clients, headers included, by route."),
+        "hub_requests_in_flight": (
+            "gauge", "Requests currently being handled, by route."),
+        "hub_response_limit_exceeded_total": (
+            "counter", "Responses refused (413) or cut off for exceeding the "
+                       "size limit, by route."),
+        "hub_upstream_requests_total": (
+            "counter", "Upstream responses by host and status "
+                       "(status=\"error\" for failed calls)."),
+        "hub_upstream_duration_seconds": (
+            "histogram", "Upstream call time until the body is done, by host."),
+        "hub_upstream_in_flight": (
+            "gauge", "Upstream calls currently open, by host."),
+        "hub_upstream_timeouts_total": (
+            "counter", "Upstream calls that timed out, by host."),
+        "hub_upstream_retries_total": (
+            "counter", "Idempotent upstream calls retried after a throttled "
+                       "or failed response, by host and status."),
+    }
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict = {}      # (name, labels) -> number
+        self._histograms: dict = {}  # (name, labels) -> [counts..., sum]
+
+    def inc(self, name: str, labels: tuple, value: float = 1) -> None:
+        key = (name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(self.BUCKETS) + 2)
+            hist[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            hist[-1] += seconds
+
+    # Hooks called by UpstreamPool / PooledResponse, on the calling thread.
+
+    def upstream_started(self, host: str) -> float:
+        self.inc("hub_upstream_in_flight", (("host", host),))
+        now = time.monotonic()
+        timer = UpstreamTimer.current()
+        if timer is not None:
+            timer.opened(now)
+        return now
+
+    def upstream_responded(self, host: str, status: int, started: float) -> float:
+        now = time.monotonic()
+        self.inc("hub_upstream_requests_total",
+                 (("host", host), ("status", str(status))))
+        return now
+
+    def upstream_finished(self, host: str, started: float,
+                          responded: float) -> None:
+        now = time.monotonic()
+        self._closed(now)
+        self.observe("hub_upstream_duration_seconds", (("host", host),),
+                     now - started)
+        self.inc("hub_upstream_in_flight", (("host", host),), -1)
+
+    def upstream_failed(self, host: str, started: float,
+                        error: BaseException) -> None:
+        now = time.monotonic()
+        self._closed(now)
+        labels = (("host", host),)
+        if isinstance(error, socket.timeout):
+            self.inc("hub_upstream_timeouts_total", labels)
+        self.inc("hub_upstream_requests_total", labels + (("status", "error"),))
+        self.observe("hub_upstream_duration_seconds", labels, now - started)
+        self.inc("hub_upstream_in_flight", labels, -1)
+
+    @staticmethod
+    def _closed(now: float) -> None:
+        timer = UpstreamTimer.current()
+        if timer is not None:
+            timer.closed(now)
+
+    def render(self) -> str:
+        """Every series in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            values = sorted(self._values.items())
+            histograms = sorted(self._histograms.items())
+        series: dict = {}
+        for (name, labels), value in values:
+            series.setdefault(name, []).append(
+                f"{name}{self._labels(labels)} {self.number(value)}"
+            )
+        for (name, labels), hist in histograms:
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + (float("inf"),), hist):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket"
+                             f"{self._labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {hist[-1]:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {cumulative}")
+        out = []
+        for name, (kind, help_text) in self.FAMILIES.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(series.get(name, ()))
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def number(value: float) -> str:
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        def esc(v: str) -> str:
+            return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+
+class HostLimiter:
+    """Adaptive (AIMD) concurrency window for one upstream host.
+
+    The window grows by one slot per window's worth of answered calls and
+    halves on a 429 or 503, at most once per ``HOST_BACKOFF_COOLDOWN``. A
+    ``Retry-After`` pauses the host until it has passed. Callers wait in
+    priority lanes: interactive calls always go ahead of background ones,
+    first come first served within a lane.
+    """
+
+    def __init__(self, limit: int, minimum: int = 1) -> None:
+        self.limit = limit
+        self.minimum = minimum
+        self.window = float(limit)
+        self.active = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._lanes = (deque(), deque())  # waiting tickets per priority
+        self._last_cut = 0.0
+        self._stats = {"throttled": 0, "window_cuts": 0, "queued": 0}
+
+    def acquire(self, priority: int, timeout: float) -> bool:
+        """Wait for a slot; False if none became free within ``timeout``."""
+        deadline = time.monotonic() + timeout
+        lane = self._lanes[min(max(priority, 0), len(self._lanes) - 1)]
+        ticket = object()
+        queued = False
+        with self._cond:
+            lane.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if (self._head() is ticket and now >= self.paused_until
+                            and self.active < int(self.window)):
+                        lane.popleft()
+                        self.active += 1
+                        return True
+                    if now >= deadline:
+                        return False
+                    if not queued:
+                        queued = True
+                        self._stats["queued"] += 1
+                    wait = deadline - now
+                    if now < self.paused_until:
+                        wait = min(wait, self.paused_until - now)
+                    self._cond.wait(wait)
+            finally:
+                if ticket in lane:
+                    lane.remove(ticket)
+                # Let the next waiter check whether there is room for it too.
+                self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def feedback(self, status: int, retry_after: float = 0.0) -> None:
+        """Adjust the window from an upstream response status."""
+        with self._cond:
+            now = time.monotonic()
+            if status in (429, 503):
+                self._stats["throttled"] += 1
+                if now - self._last_cut >= HOST_BACKOFF_COOLDOWN:
+                    self.window = max(self.minimum, self.window / 2)
+                    self._last_cut = now
+                    self._stats["window_cuts"] += 1
+                if retry_after > 0:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif status < 500:
+                self.window = min(self.limit, self.window + 1 / self.window)
+            self._cond.notify_all()
+
+    def _head(self):
+        """The ticket allowed to go next (caller holds the lock)."""
+        for lane in self._lanes:
+            if lane:
+                return lane[0]
+        return None
+
+    def stats(self) -> dict:
+        with self._cond:
+            paused = max(0.0, self.paused_until - time.monotonic())
+            return {
+                **self._stats,
+                "window": round(self.window, 2),
+                "active": self.active,
+                "waiting": [len(lane) for lane in self._lanes],
+                "paused_seconds": round(paused, 1),
+            }
+
+
+def retry_after_seconds(value: Optional[str]) -> float:
+    """Parse a ``Retry-After`` header (seconds or an HTTP date); 0 if absent."""
+    if not value:
+        return 0.0
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when is None:
+        return 0.0
+    return max(0.0, when.timestamp() - time.time())
+
+
+class PooledResponse:
+    """An upstream response that hands its connection back to the pool.
+
+    Use as a context manager. If the body was read to the end the
+    keep-alive connection is returned for reuse; otherwise it is closed.
+    """
+
+    def __init__(self, pool: "UpstreamPool", key: tuple,
+                 conn: http.client.HTTPConnection,
+                 resp: http.client.HTTPResponse, host: str = "",
+                 started: float = 0.0, responded: float = 0.0,
+                 limiter: Optional[HostLimiter] = None) -> None:
+        self._pool = pool
+        self._key = key
+        self._host = host
+        self._limiter = limiter
+        self._conn = conn
+        self._resp = resp
+        self._started = started
+        self._responded = responded
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._resp.read(amt)
+
+    def read1(self, amt: int = STREAM_CHUNK_BYTES) -> bytes:
+        """Return whatever is available (up to ``amt``) without waiting for more."""
+        return self._resp.read1(amt)
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        reusable = self._resp.isclosed() and not self._resp.will_close
+        self._pool._release(self._key, self._conn, reusable)
+        self._conn = None
+        if self._limiter is not None:
+            self._limiter.release()
+        if self._pool.metrics is not None:
+            self._pool.metrics.upstream_finished(
+                self._host, self._started, self._responded
+            )
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class UpstreamPool:
+    """Per-host pool of persistent HTTP/1.1 connections to the upstream APIs.
+
+    All connections share one SSL context. Idle connections are evicted
+    after ``idle_timeout`` seconds and probed before reuse. Concurrency
+    per host is capped by a ``HostLimiter`` window of at most
+    ``max_per_host`` calls that shrinks while the host is throttling us,
+    and throttled or failed idempotent calls are retried with jittered
+    exponential backoff.
+    """
+
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, max_per_host: int = POOL_MAX_PER_HOST,
+                 idle_timeout: float = POOL_IDLE_SECONDS,
+                 metrics: Optional[Metrics] = None) -> None:
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.metrics = metrics
+        self.override: Optional[tuple] = None  # (scheme, host, port) for benchmarks
+        self.ssl_context = ssl.create_default_context()
+        self._lock = threading.Lock()
+        self._idle: dict = {}    # key -> [(conn, last_used), ...]
+        self._limiters: dict = {}  # hostname -> HostLimiter
+        self._stats = {
+            "requests": 0, "connections_created": 0, "reused": 0,
+            "stale_discarded": 0, "idle_evicted": 0, "retried": 0,
+            "retried_status": 0,
+        }
+
+    def request(self, method: str, url: str, headers: Optional[dict] = None,
+                body: Optional[bytes] = None,
+                timeout: float = REQUEST_TIMEOUT_SECONDS,
+                priority: int = PRIORITY_INTERACTIVE) -> PooledResponse:
+        """Send a request, following redirects for idempotent methods.
+
+        Idempotent calls answered with 429/502/503/504 are retried up to
+        ``RETRY_ATTEMPTS`` times, waiting for the ``Retry-After`` if the
+        host sent one and for a jittered exponential backoff otherwise.
+        All tries of one call, waits included, fit in
+        ``RETRY_BUDGET_SECONDS``: a response whose wait would overrun it is
+        returned as is, like the last one. Coalesced callers and background
+        work would otherwise sit out a long ``Retry-After`` behind a
+        single call.
+        """
+        redirects = 0
+        attempt = 0
+        deadline = time.monotonic() + RETRY_BUDGET_SECONDS
+        while True:
+            resp = self._request_once(method, url, headers or {}, body,
+                                      timeout, priority)
+            idempotent = method in self.IDEMPOTENT_METHODS
+            if (resp.status in RETRY_STATUSES and idempotent
+                    and attempt < RETRY_ATTEMPTS):
+                delay = max(
+                    retry_after_seconds(resp.headers.get("Retry-After")),
+                    RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5),
+                )
+                if time.monotonic() + delay <= deadline:
+                    resp.read(STREAM_CHUNK_BYTES)  # drain so the socket is reused
+                    resp.close()
+                    attempt += 1
+                    with self._lock:
+                        self._stats["retried_status"] += 1
+                    if self.metrics is not None:
+                        self.metrics.inc("hub_upstream_retries_total", (
+                            ("host", urllib.parse.urlsplit(url).hostname or ""),
+                            ("status", str(resp.status)),
+                        ))
+                    time.sleep(delay)
+                    continue
+            location = resp.headers.get("Location")
+            if (resp.status not in (301, 302, 303, 307, 308) or not location
+                    or not idempotent):
+                return resp
+            resp.close()
+            redirects += 1
+            if redirects > MAX_REDIRECTS:
+                raise http.client.HTTPException(f"Too many redirects for {url}")
+            url = urllib.parse.urljoin(url, location)
+
+    def stats(self) -> dict:
+        """Snapshot of pool counters, including the connection reuse ratio."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle_connections"] = sum(len(v) for v in self._idle.values())
+            stats["idle_hosts"] = sorted(f"{k[1]}:{k[2]}" for k in self._idle)
+        stats["reuse_ratio"] = (
+            round(stats["reused"] / stats["requests"], 3)
+            if stats["requests"] else 0.0
+        )
+        return stats
+
+    def host_stats(self) -> dict:
+        """Concurrency window, queue and throttling counters per host."""
+        with self._lock:
+            limiters = sorted(self._limiters.items())
+        return {host: limiter.stats() for host, limiter in limiters}
+
+    def _limiter(self, host: str) -> HostLimiter:
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = HostLimiter(self.max_per_host)
+            return limiter
+
+    def _request_once(self, method, url, headers, body, timeout,
+                      priority: int = PRIORITY_INTERACTIVE) -> PooledResponse:
+        parsed = urllib.parse.urlsplit(url)
+        host = parsed.hostname or ""
+        if self.override is not None:
+            # Benchmarks: every host is served by one stand-in, which tells
+            # the APIs apart by the original Host header.
+            key = self.override
+            headers = {**headers, "Host": parsed.netloc}
+        else:
+            scheme = parsed.scheme or "https"
+            port = parsed.port or (443 if scheme == "https" else 80)
+            key = (scheme, host, port)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += f"?{parsed.query}"
+
+        limiter = self._limiter(host)
+        if not limiter.acquire(priority, timeout):
+            raise socket.timeout(f"No free connection to {host}")
+        metrics = self.metrics
+        started = metrics.upstream_started(host) if metrics else 0.0
+        try:
+            for attempt in range(2):
+                conn, reused = self._acquire(key, timeout)
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    resp = conn.getresponse()
+                except (http.client.RemoteDisconnected, ConnectionResetError,
+                        BrokenPipeError):
+                    # The server closed a kept-alive socket under us. Safe to
+                    # replay on a fresh connection unless the call mutates state.
+                    self._release(key, conn, reusable=False)
+                    if reused and attempt == 0 and method in self.IDEMPOTENT_METHODS:
+                        with self._lock:
+                            self._stats["retried"] += 1
+                        continue
+                    raise
+                except BaseException:
+                    self._release(key, conn, reusable=False)
+                    raise
+                limiter.feedback(resp.status, retry_after_seconds(
+                    resp.headers.get("Retry-After")
+                ))
+                responded = (metrics.upstream_responded(host, resp.status, started)
+                             if metrics else 0.0)
+                return PooledResponse(self, key, conn, resp, host,
+                                      started, responded, limiter)
+            raise http.client.RemoteDisconnected("Upstream closed the connection")
+        except BaseException as e:
+            limiter.release()
+            if metrics:
+                metrics.upstream_failed(host, started, e)
+            raise
+
+    def _acquire(self, key: tuple, timeout: float):
+        now = time.monotonic()
+        with self._lock:
+            self._stats["requests"] += 1
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used > self.idle_timeout:
+                    self._stats["idle_evicted"] += 1
+                elif not self._is_healthy(conn):
+                    self._stats["stale_discarded"] += 1
+                else:
+                    self._stats["reused"] += 1
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+            self._stats["connections_created"] += 1
+
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self.ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def _release(self, key: tuple, conn, reusable: bool) -> None:
+        if reusable and conn.sock is not None:
+            with self._lock:
+                self._idle.setdefault(key, []).append((conn, time.monotonic()))
+                self._evict_idle()
+        else:
+            conn.close()
+
+    def _evict_idle(self) -> None:
+        """Close connections idle for too long (caller holds the lock)."""
+        cutoff = time.monotonic() - self.idle_timeout
+        for key in list(self._idle):
+            keep = []
+            for conn, last_used in self._idle[key]:
+                if last_used < cutoff:
+                    conn.close()
+                    self._stats["idle_evicted"] += 1
+                else:
+                    keep.append((conn, last_used))
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        """An idle socket should have nothing to read; EOF means it was closed."""
+        sock = conn.sock
+        if sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+
+class UpstreamResult:
+    """A fully buffered upstream response."""
+
+    __slots__ = ("status", "headers", "body", "oversized")
+
+    def __init__(self, status: int, headers, body: bytes,
+                 oversized: bool = False) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.oversized = oversized
+
+
+def fetch_upstream(pool: UpstreamPool, method: str, url: str, headers: dict,
+                   body: Optional[bytes] = None,
+                   limit: int = MAX_RESPONSE_BYTES,
+                   priority: int = PRIORITY_INTERACTIVE) -> UpstreamResult:
+    """Make an upstream call and buffer at most ``limit`` bytes of the body."""
+    with pool.request(method, url, headers=headers, body=body,
+                      priority=priority) as resp:
+        data = resp.read(limit + 1)
+        return UpstreamResult(
+            resp.status, resp.headers, data[:limit], len(data) > limit
+        )
+
+
+class ProxyOutcome:
+    """What a proxied upstream call produced.
+
+    ``delivered`` is True when the response was too large to buffer and
+    was streamed straight to the requesting client. ``result`` holds the
+    buffered response (None if streamed and not captured) and ``entry``
+    the cache entry it produced, if any.
+    """
+
+    __slots__ = ("result", "entry", "delivered")
+
+    def __init__(self, result: Optional[UpstreamResult],
+                 entry: Optional["CacheEntry"] = None,
+                 delivered: bool = False) -> None:
+        self.result = result
+        self.entry = entry
+        self.delivered = delivered
+
+
+def decode_body(body: bytes, encoding: Optional[str]) -> bytes:
+    """Undo a gzip/deflate Content-Encoding, tolerating truncated input."""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        wbits_options = (16 + zlib.MAX_WBITS,)
+    elif encoding == "deflate":
+        # "deflate" is zlib-wrapped per the RFC, but some servers send raw.
+        wbits_options = (zlib.MAX_WBITS, -zlib.MAX_WBITS)
+    else:
+        return body
+    for wbits in wbits_options:
+        try:
+            return zlib.decompressobj(wbits).decompress(body)
+        except zlib.error:
+            continue
+    return body
+
+
+class CacheEntry:
+    """A cached 200 response plus the validators needed to revalidate it."""
+
+    __slots__ = ("body", "content_type", "content_encoding", "etag",
+                 "last_modified", "stored_at", "ttl", "revalidating")
+
+    def __init__(self, body: bytes, content_type: str, content_encoding: str,
+                 etag: str, last_modified: str, ttl: int) -> None:
+        self.body = body
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ttl = ttl
+        self.stored_at = time.monotonic()
+        self.revalidating = False
+
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+
+class ResponseCache:
+    """Byte-bounded LRU of upstream GET responses, scoped per API token.
+
+    Keys combine a hash of the caller's token and contract number with the
+    upstream URL, so one user's data is never served to another. Expired
+    entries are kept around so they can be revalidated with
+    If-None-Match / If-Modified-Since, and for ``stale_seconds`` after
+    expiry they are served immediately while a background refresh runs.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES,
+                 stale_seconds: int = CACHE_STALE_SECONDS) -> None:
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0,
+                       "revalidated": 0, "evictions": 0, "invalidated": 0}
+
+    @staticmethod
+    def make_key(token: str, contract: str, url: str) -> str:
+        scope = hashlib.sha256(f"{token}\0{contract}".encode()).hexdigest()
+        return f"{scope}:{url}"
+
+    def ttl_for(self, url: str) -> int:
+        """Cache lifetime in seconds for an upstream URL (0 = uncacheable)."""
+        if self.max_bytes <= 0:
+            return 0
+        path = urllib.parse.urlsplit(url).path
+        for pattern, ttl in CACHE_TTL_RULES:
+            if pattern.search(path):
+                return ttl
+        return CACHE_DEFAULT_TTL
+
+    def lookup(self, key: str):
+        """Return ``(entry, state)``; state is fresh, stale, expired or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, "miss"
+            self._entries.move_to_end(key)
+            age = entry.age()
+            if age < entry.ttl:
+                self._stats["hits"] += 1
+                return entry, "fresh"
+            if age < entry.ttl + self.stale_seconds:
+                self._stats["stale_hits"] += 1
+                return entry, "stale"
+            self._stats["misses"] += 1
+            return entry, "expired"
+
+    def claim_revalidation(self, entry: CacheEntry) -> bool:
+        """Mark an entry as being refreshed; False if a refresh is running."""
+        with self._lock:
+            if entry.revalidating:
+                return False
+            entry.revalidating = True
+            return True
+
+    @property
+    def max_entry_bytes(self) -> int:
+        # One huge VDC should not flush everything else.
+        return self.max_bytes // 4
+
+    @staticmethod
+    def conditional_headers(previous: Optional[CacheEntry]) -> dict:
+        """Validators to send when revalidating ``previous``."""
+        headers = {}
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+        return headers
+
+    def mark_revalidated(self, entry: CacheEntry) -> None:
+        """Upstream answered 304: restart the entry's lifetime."""
+        with self._lock:
+            entry.stored_at = time.monotonic()
+            self._stats["revalidated"] += 1
+
+    def store_result(self, key: str, url: str,
+                     result: UpstreamResult) -> Optional[CacheEntry]:
+        """Cache a 200 upstream result; returns the entry, or None if skipped."""
+        if result.status != 200 or result.oversized:
+            return None
+        entry = CacheEntry(
+            result.body,
+            result.headers.get("Content-Type", "application/json"),
+            result.headers.get("Content-Encoding", ""),
+            result.headers.get("ETag", ""),
+            result.headers.get("Last-Modified", ""),
+            self.ttl_for(url),
+        )
+        self._store(key, entry)
+        return entry
+
+    def refresh(self, pool: UpstreamPool, key: str, url: str, headers: dict,
+                previous: Optional[CacheEntry] = None,
+                priority: int = PRIORITY_INTERACTIVE,
+                limit: int = MAX_RESPONSE_BYTES):
+        """Fetch ``url`` (conditionally if ``previous`` is given) and cache it.
+
+        Returns ``(result, entry)``; ``entry`` is None when the response
+        was not cacheable (or over ``limit`` bytes) and ``result`` should
+        be relayed as-is.
+        """
+        headers = {**headers, **self.conditional_headers(previous)}
+        try:
+            result = fetch_upstream(pool, "GET", url, headers,
+                                    limit=limit, priority=priority)
+        finally:
+            if previous is not None:
+                previous.revalidating = False
+
+        if result.status == 304 and previous is not None:
+            self.mark_revalidated(previous)
+            return result, previous
+        return result, self.store_result(key, url, result)
+
+    def refresh_in_background(self, pool: UpstreamPool, key: str, url: str,
+                              headers: dict, previous: CacheEntry,
+                              limit: int = MAX_RESPONSE_BYTES) -> None:
+        def run() -> None:
+            try:
+                self.refresh(pool, key, url, headers, previous,
+                             PRIORITY_BACKGROUND, limit)
+            except (OSError, http.client.HTTPException) as e:
+                sys.stderr.write(f"  [Cache] Revalidation failed for {url}: {e}\n")
+
+        threading.Thread(target=run, name="hub-cache-refresh", daemon=True).start()
+
+    def invalidate(self, token: str, contract: str, url: str) -> int:
+        """Drop the caller's cached GETs that a write to ``url`` may change.
+
+        That is everything at or below the written resource's parent path
+        (the collection it belongs to) and every path above it, since deep
+        listings of a parent embed the resource. Query strings are ignored.
+        Returns the number of entries dropped.
+        """
+        scope = self.make_key(token, contract, "")
+        target = urllib.parse.urlsplit(url)
+        path = target.path.rstrip("/")
+        parent = path.rsplit("/", 1)[0]
+
+        def affected(key: str) -> bool:
+            if not key.startswith(scope):
+                return False
+            cached = urllib.parse.urlsplit(key[len(scope):])
+            if (cached.scheme, cached.netloc) != (target.scheme, target.netloc):
+                return False
+            cached_path = cached.path.rstrip("/")
+            return (cached_path == parent or cached_path.startswith(parent + "/")
+                    or path.startswith(cached_path + "/"))
+
+        with self._lock:
+            dropped = [key for key in self._entries if affected(key)]
+            for key in dropped:
+                self._bytes -= len(self._entries.pop(key).body)
+            self._stats["invalidated"] += len(dropped)
+        return len(dropped)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        size = len(entry.body)
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self._stats["evictions"] += 1
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into a single execution.
+
+    The first caller for a key runs the call; anyone arriving while it is
+    in flight waits and receives the same result (or exception).
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "error", "waiters")
+
+        def __init__(self) -> None:
+            self.done = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+            self.waiters = 0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._stats = {"leaders": 0, "waiters": 0, "max_waiters": 0,
+                       "saved_upstream_calls": 0}
+
+    def do(self, key: str, fn):
+        """Run ``fn()`` once per key; returns ``(result, shared)``."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = self._Call()
+                self._stats["leaders"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stats["waiters"] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.waiters:
+                    # Failed calls still spared the waiters a round trip.
+                    self._stats["saved_upstream_calls"] += call.waiters
+                    self._stats["max_waiters"] = max(
+                        self._stats["max_waiters"], call.waiters
+                    )
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+def with_query(url: str, **params) -> str:
+    """Return ``url`` with the given query parameters set or replaced."""
+    parts = urllib.parse.urlsplit(url)
+    query = dict(urllib.parse.parse_qsl(parts.query, keep_blank_values=True))
+    query.update({k: str(v) for k, v in params.items()})
+    return urllib.parse.urlunsplit(
+        parts._replace(query=urllib.parse.urlencode(query, safe="/,"))
+    )
+
+
+def field_tree(fields: list) -> dict:
+    """``["properties.name", "id"]`` -> ``{"properties": {"name": {}}, "id": {}}``."""
+    tree: dict = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def project(value, tree: dict):
+    """Keep only the paths in ``tree``; lists are projected element-wise.
+
+    ``id``, ``type`` and ``href`` are always kept so the frontend can still
+    key and link resources.
+    """
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project(v, tree) for v in value]
+    if not isinstance(value, dict):
+        return value
+    kept = {k: value[k] for k in ("id", "type", "href") if k in value}
+    for key, sub in tree.items():
+        if key in value:
+            kept[key] = project(value[key], sub)
+    return kept
+
+
+def idle_scan_query(metric: str, uuids: list) -> str:
+    """One PromQL query returning a per-UUID traffic series for many servers."""
+    matcher = "|".join(uuids)
+    return f'avg by (uuid) (irate({metric}{{uuid=~"{matcher}"}}[5m]))'
+
+
+def chunk_uuids(uuids: list, max_chars: int = IDLE_SCAN_QUERY_MAX_CHARS) -> list:
+    """Split UUIDs into groups whose URL-encoded matcher query fits ``max_chars``."""
+    chunks, current = [], []
+    for uuid in uuids:
+        candidate = current + [uuid]
+        query = idle_scan_query("instance_network_out_bytes", candidate)
+        if current and len(urllib.parse.quote(query)) > max_chars:
+            chunks.append(current)
+            candidate = [uuid]
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def series_means(body: Optional[dict]) -> dict:
+    """Average value per ``uuid`` label across a query_range matrix."""
+    means = {}
+    for series in ((body or {}).get("data") or {}).get("result") or []:
+        uuid = (series.get("metric") or {}).get("uuid")
+        values = series.get("values") or []
+        if uuid and values:
+            means[uuid] = statistics.fmean(
+                float(v) if v not in ("NaN", "+Inf", "-Inf") else 0.0
+                for _, v in values
+            )
+    return means
+
+
+class SeriesBuffer:
+    """One telemetry series sampled on a fixed step grid.
+
+    ``values[i]`` is the sample at ``start + i * step`` (NaN = no data).
+    ``fetched_until`` is the last grid timestamp already asked upstream.
+    """
+
+    __slots__ = ("step", "start", "values", "fetched_until")
+
+    def __init__(self, step: int, start: int) -> None:
+        self.step = step
+        self.start = start
+        self.values = array("d")
+        self.fetched_until = start - step
+
+    def trim(self, start: int) -> None:
+        """Drop samples older than ``start`` (a grid timestamp)."""
+        drop = (start - self.start) // self.step
+        if drop <= 0:
+            return
+        del self.values[:drop]
+        self.start = start
+        self.fetched_until = max(self.fetched_until, start - self.step)
+
+    def merge(self, first: int, last: int, samples) -> None:
+        """Store the ``(timestamp, value)`` samples fetched for ``first..last``.
+
+        Grid points in the range with no sample are reset to NaN, so a
+        revised tail replaces what was there.
+        """
+        need = (last - self.start) // self.step + 1
+        if need > len(self.values):
+            self.values.extend([math.nan] * (need - len(self.values)))
+        lo = max(0, (first - self.start) // self.step)
+        for i in range(lo, need):
+            self.values[i] = math.nan
+        for ts, value in samples:
+            i = (int(float(ts)) - self.start) // self.step
+            if lo <= i < need:
+                try:
+                    self.values[i] = float(value)
+                except ValueError:
+                    pass
+        self.fetched_until = max(self.fetched_until, last)
+
+    def window(self, start: int, end: int) -> list:
+        """Samples for ``start..end`` as a list, None where there is no data."""
+        out = []
+        for ts in range(start, end + 1, self.step):
+            i = (ts - self.start) // self.step
+            v = self.values[i] if 0 <= i < len(self.values) else math.nan
+            out.append(None if math.isnan(v) else v)
+        return out
+
+
+class TelemetryCache:
+    """Step-aligned sample buffers for repeated ``query_range`` windows.
+
+    Windows are snapped to the step grid, so the same chart opened again a
+    little later overlaps what is cached: only the tail since the last
+    fetch (plus ``TELEMETRY_REFETCH_STEPS`` recent samples, which the
+    telemetry API may still revise) is requested, merged in, and samples
+    that fell out of the window are dropped. Buffers are keyed on the
+    caller's credentials, the query and the step, and evicted LRU.
+    """
+
+    def __init__(self, max_series: int = TELEMETRY_CACHE_SERIES) -> None:
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._buffers: OrderedDict = OrderedDict()
+        self._stats = {"requests": 0, "upstream_queries": 0, "served_cached": 0,
+                       "samples_fetched": 0, "samples_served": 0, "evictions": 0}
+
+    def query(self, fetch, auth_key: str, queries: dict, step: int,
+              window: int, now: Optional[float] = None) -> dict:
+        """Serve ``{name: query}`` for the last ``window`` seconds at ``step``.
+
+        ``fetch(url)`` returns a ``fetch_json``-style call dict. Missing
+        tails of all series are fetched concurrently. Returns the aligned
+        ``start``/``end``/``step``, per-series value lists and errors.
+        """
+        end = int(now if now is not None else time.time()) // step * step
+        start = end - window // step * step
+        buffers, plan = {}, {}
+        with self._lock:
+            self._stats["requests"] += 1
+            for name, query in queries.items():
+                key = (auth_key, query, step)
+                buf = self._buffers.get(key)
+                if buf is None or buf.start > start:
+                    buf = SeriesBuffer(step, start)
+                    self._buffers[key] = buf
+                self._buffers.move_to_end(key)
+                buf.trim(start)
+                buffers[name] = buf
+                if buf.fetched_until < end:
+                    plan[name] = max(start, buf.fetched_until
+                                     - (TELEMETRY_REFETCH_STEPS - 1) * step)
+                else:
+                    self._stats["served_cached"] += 1
+            while len(self._buffers) > self.max_series:
+                self._buffers.popitem(last=False)
+                self._stats["evictions"] += 1
+
+        errors = {}
+        if plan:
+            graph = FetchGraph(fetch, len(plan))
+            for name, first in plan.items():
+                graph.fetch(name, f"{TELEMETRY_API}/query_range?query="
+                                  f"{urllib.parse.quote(queries[name])}"
+                                  f"&start={first}&end={end}&step={step}")
+            graph.wait()
+            errors = {e["name"]: e.get("error") for e in graph.errors}
+            with self._lock:
+                self._stats["upstream_queries"] += len(plan)
+                for name, first in plan.items():
+                    body = graph.results.get(name)
+                    if name in errors or body is None:
+                        continue
+                    result = (body.get("data") or {}).get("result") or []
+                    samples = (result[0].get("values") or []) if result else []
+                    buffers[name].merge(first, end, samples)
+                    self._stats["samples_fetched"] += len(samples)
+
+        with self._lock:
+            series = {name: buf.window(start, end) for name, buf in buffers.items()}
+            self._stats["samples_served"] += sum(
+                sum(v is not None for v in values) for values in series.values()
+            )
+        return {"start": start, "end": end, "step": step, "series": series,
+                "errors": errors, "upstreamQueries": len(plan)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["series"] = len(self._buffers)
+        stats["max_series"] = self.max_series
+        return stats
+
+
+class BillingRollup:
+    """A contract's billable traffic folded into per-day GB arrays.
+
+    ``dates`` is the shared day axis. Every VDC (from ``/traffic/``) and
+    server (from ``/utilization``) keeps an ``in`` and an ``out`` array of
+    GB per day along it, so a time range is a slice and totals are sums.
+    """
+
+    def __init__(self, traffic: Optional[dict], utilization: Optional[dict],
+                 errors: Optional[list] = None) -> None:
+        self.errors = errors or []
+        self.built_at = time.time()
+        traffic = traffic or {}
+        unit = ((traffic.get("metadata") or {}).get("unit") or "Bytes").lower()
+        scale = 1 / (1024 ** 3) if unit in ("bytes", "b") else 1.0
+        vdc_days: dict = {}
+        names: dict = {}
+        for vdc in (traffic.get("trafficObj") or {}).get("vdc") or []:
+            vdc_id = vdc.get("vdcUUID")
+            if not vdc_id:
+                continue
+            names[vdc_id] = vdc.get("vdcName") or ""
+            days = vdc_days.setdefault(vdc_id, {})
+            for day in vdc.get("dates") or []:
+                date = str(day.get("Date") or day.get("date") or "")[:10]
+                if date:
+                    totals = days.setdefault(date, [0.0, 0.0])
+                    totals[0] += float(day.get("In") or 0) * scale
+                    totals[1] += float(day.get("Out") or 0) * scale
+
+        server_days: dict = {}
+        server_dc: dict = {}
+        for dc in (utilization or {}).get("datacenters") or []:
+            for meter in dc.get("meters") or []:
+                column = BILLING_METERS.get(meter.get("meterId"))
+                date = str(meter.get("from") or "")[:10]
+                if not meter.get("serverId") or column is None or not date:
+                    continue
+                quantity = meter.get("quantity")
+                if isinstance(quantity, dict):  # {"quantity": 0.12, "unit": "1G"}
+                    quantity = quantity.get("quantity")
+                server_dc[meter["serverId"]] = dc.get("id", "")
+                totals = server_days.setdefault(meter["serverId"], {}).setdefault(
+                    date, [0.0, 0.0])
+                totals[column] += float(quantity or 0)
+
+        self.dates = sorted({date for days in (*vdc_days.values(), *server_days.values())
+                             for date in days})
+        index = {date: i for i, date in enumerate(self.dates)}
+
+        def fold(days: dict) -> tuple:
+            values_in = array("d", [0.0]) * len(self.dates)
+            values_out = array("d", [0.0]) * len(self.dates)
+            for date, (gb_in, gb_out) in days.items():
+                values_in[index[date]] = gb_in
+                values_out[index[date]] = gb_out
+            return values_in, values_out
+
+        self.vdcs = {vdc_id: (names[vdc_id], *fold(days))
+                     for vdc_id, days in vdc_days.items()}
+        self.servers = {server_id: (server_dc[server_id], *fold(days))
+                        for server_id, days in server_days.items()}
+
+    def query(self, start: str = "", end: str = "", vdc: str = "",
+              server: str = "", top: int = 0, daily: bool = True) -> dict:
+        """Slice by day range (inclusive ``YYYY-MM-DD``), VDC or server.
+
+        VDCs and servers are sorted by total traffic, largest first, and
+        cut to ``top`` when given. With ``server`` only that server and its
+        VDC are returned. ``daily=False`` leaves out the per-day arrays.
+        """
+        lo = bisect.bisect_left(self.dates, start) if start else 0
+        hi = bisect.bisect_right(self.dates, end) if end else len(self.dates)
+        if server:
+            vdc = vdc or self.servers.get(server, ("",))[0]
+
+        def rows(entries, label: str) -> list:
+            out = []
+            for entry_id, (value, values_in, values_out) in entries:
+                row = {"id": entry_id, label: value,
+                       "totalIn": round(sum(values_in[lo:hi]), 6),
+                       "totalOut": round(sum(values_out[lo:hi]), 6)}
+                if daily:
+                    row["in"] = [round(v, 6) for v in values_in[lo:hi]]
+                    row["out"] = [round(v, 6) for v in values_out[lo:hi]]
+                out.append(row)
+            out.sort(key=lambda r: r["totalIn"] + r["totalOut"], reverse=True)
+            return out[:top] if top > 0 else out
+
+        return {
+            "unit": "GB",
+            "dates": self.dates[lo:hi],
+            "vdcs": rows(((k, v) for k, v in self.vdcs.items()
+                          if not vdc or k == vdc), "name"),
+            "servers": rows(((k, v) for k, v in self.servers.items()
+                             if (not vdc or v[0] == vdc) and (not server or k == server)),
+                            "datacenterId"),
+        }
+
+
+class BillingRollupCache:
+    """Built ``BillingRollup``s keyed by credentials, contract and period.
+
+    Concurrent misses for one key share a single build; rollups with
+    upstream errors are returned but not kept.
+    """
+
+    def __init__(self, ttl: int = BILLING_ROLLUP_TTL,
+                 max_entries: int = BILLING_ROLLUP_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, BillingRollup]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._stats = {"hits": 0, "builds": 0, "evictions": 0}
+
+    def get(self, key: str, build) -> tuple:
+        """Return ``(rollup, state)``; state is HIT, MISS or COALESCED."""
+        with self._lock:
+            rollup = self._entries.get(key)
+            if rollup is not None and time.time() - rollup.built_at < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return rollup, "HIT"
+        rollup, shared = self._flight.do(key, build)
+        if shared:
+            return rollup, "COALESCED"
+        with self._lock:
+            self._stats["builds"] += 1
+            if not rollup.errors:
+                self._entries[key] = rollup
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        return rollup, "MISS"
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+
+def regional_api(service: str, location: str) -> str:
+    """Base URL of a regional service, e.g. ``mariadb`` in ``de/fra``.
+
+    Raises ``ValueError`` for anything that is not an IONOS location, so a
+    crafted value can never steer the request (and its token) elsewhere.
+    """
+    if not LOCATION_RE.match(location or ""):
+        raise ValueError(f"Invalid location: {location!r}")
+    return f"https://{service}.{location.replace('/', '-')}.ionos.com"
+
+
+def location_region(location: str) -> str:
+    """``de/fra/2`` -> ``de/fra`` (same as locationRegion() in the frontend)."""
+    parts = (location or "").split("/")
+    return "/".join(parts[:2]) if len(parts) >= 2 else location or ""
+
+
+class FetchGraph:
+    """Runs a graph of dependent upstream GETs concurrently.
+
+    ``fetch()`` queues a call; its ``then`` callback runs on the worker
+    once the response arrives and may queue follow-up calls, so dependent
+    requests start as soon as their input is ready rather than after a
+    whole tier finishes. Per-call timings are recorded for the caller.
+    """
+
+    def __init__(self, fetch, concurrency: int = BATCH_CONCURRENCY) -> None:
+        self._fetch = fetch
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="hub-snapshot"
+        )
+        self._cond = threading.Condition()
+        self._pending = 0
+        self.started = time.monotonic()
+        self.results: dict = {}
+        self.timings: list = []
+        self.errors: list = []
+
+    def fetch(self, name: str, url: str, then=None) -> None:
+        with self._cond:
+            self._pending += 1
+        self._executor.submit(self._run, name, url, then)
+
+    def fail(self, name: str, error: str) -> None:
+        """Record a call that was never made."""
+        with self._cond:
+            self.errors.append({"name": name, "url": "", "error": error})
+
+    def wait(self, timeout: float = SNAPSHOT_TIMEOUT_SECONDS) -> bool:
+        """Block until every queued call (and its follow-ups) is done."""
+        with self._cond:
+            done = self._cond.wait_for(lambda: self._pending == 0, timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        return done
+
+    def elapsed_ms(self) -> float:
+        return round((time.monotonic() - self.started) * 1000, 1)
+
+    def _run(self, name: str, url: str, then) -> None:
+        start_ms = self.elapsed_ms()
+        try:
+            call = self._fetch(url)
+            with self._cond:
+                self.results[name] = call["body"]
+                self.timings.append({
+                    "name": name, "url": url, "status": call["status"],
+                    "cache": call["cache"], "startMs": start_ms, "ms": call["ms"],
+                })
+                if call["error"] and call["status"] != 404:
+                    self.errors.append({"name": name, "url": url,
+                                        "status": call["status"],
+                                        "error": call["error"]})
+            if then is not None and call["body"] is not None:
+                then(call["body"])
+        except Exception as e:  # keep one bad payload from hanging wait()
+            with self._cond:
+                self.errors.append({"name": name, "url": url, "error": str(e)})
+        finally:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+
+def queue_vdc_calls(graph: FetchGraph, dc_id: str, prefix: str = "") -> None:
+    """Queue the DC-scoped calls of loadVDC(), including the NIC fallback."""
+    dc_url = f"{CLOUD_API}/datacenters/{dc_id}"
+
+    def fill_missing_nics(dc: dict) -> None:
+        for srv in (dc.get("entities") or {}).get("servers", {}).get("items", []):
+            nics = ((srv.get("entities") or {}).get("nics") or {}).get("items") or []
+            if nics and nics[0].get("properties"):
+                continue
+
+            def attach(nic_data: dict, srv: dict = srv) -> None:
+                if nic_data.get("items"):
+                    srv.setdefault("entities", {})["nics"] = nic_data
+
+            graph.fetch(
+                f"{prefix}nics:{srv.get('id')}",
+                f"{dc_url}/servers/{srv.get('id')}/nics?depth=2", then=attach,
+            )
+
+    graph.fetch(f"{prefix}datacenter", f"{dc_url}?depth=5", then=fill_missing_nics)
+    graph.fetch(f"{prefix}natGateways", f"{dc_url}/natgateways?depth=2")
+    graph.fetch(f"{prefix}applicationLoadBalancers",
+                f"{dc_url}/applicationloadbalancers?depth=2")
+    graph.fetch(f"{prefix}networkLoadBalancers",
+                f"{dc_url}/networkloadbalancers?depth=2")
+
+
+def queue_shared_calls(graph: FetchGraph, location: str) -> None:
+    """Queue the global and regional managed-service calls of loadVDC()."""
+    node_pools: list = []
+    graph.results["k8sNodePools"] = node_pools
+
+    def fetch_node_pools(k8s: dict) -> None:
+        for cluster in k8s.get("items", []):
+            cluster_id = cluster.get("id")
+            cluster_name = (cluster.get("properties") or {}).get("name") or cluster_id
+
+            def collect(pools: dict, cluster_id=cluster_id,
+                        cluster_name=cluster_name) -> None:
+                for pool in pools.get("items", []):
+                    node_pools.append({"clusterId": cluster_id,
+                                       "clusterName": cluster_name, "pool": pool})
+
+            graph.fetch(f"nodepools:{cluster_id}",
+                        f"{CLOUD_API}/k8s/{cluster_id}/nodepools?depth=1",
+                        then=collect)
+
+    graph.fetch("postgresClusters", f"{DBAAS_PG_API}/clusters")
+    graph.fetch("mongoClusters", f"{DBAAS_MONGO_API}/clusters")
+    graph.fetch("mysqlClusters", f"{DBAAS_MYSQL_API}/clusters")
+    graph.fetch("k8sClusters", f"{CLOUD_API}/k8s?depth=0", then=fetch_node_pools)
+    graph.fetch("k8sLabels",
+                f"{CLOUD_API}/labels?depth=2&filter.key=managedexternally")
+    graph.fetch("nfs:global", f"{NFS_API}/clusters")
+    if location and not LOCATION_RE.match(location):
+        # Locations also come from upstream DC properties; never trust them
+        # as a hostname fragment.
+        graph.fail("regional", f"Invalid location: {location!r}")
+    elif location:
+        graph.fetch("mariadbClusters", f"{regional_api('mariadb', location)}/clusters")
+        graph.fetch("nfs:regional", f"{regional_api('nfs', location)}/clusters")
+        vpn = regional_api("vpn", location)
+        graph.fetch("vpn:wireguard", f"{vpn}/wireguardgateways")
+        graph.fetch("vpn:ipsec", f"{vpn}/ipsecgateways")
+        graph.fetch("kafkaClusters", f"{regional_api('kafka', location)}/clusters")
+
+
+def shared_services(results: dict) -> dict:
+    """Shape the shared-service results the way buildGraph() receives them."""
+    k8s_managed = {}
+    for item in (results.get("k8sLabels") or {}).get("items", []):
+        props = item.get("properties") or {}
+        if props.get("value") == "k8s" and props.get("resourceId"):
+            k8s_managed[props["resourceId"]] = {
+                "resourceType": props.get("resourceType"), "value": props["value"],
+            }
+    return {
+        "postgresClusters": results.get("postgresClusters"),
+        "mongoClusters": results.get("mongoClusters"),
+        "mysqlClusters": results.get("mysqlClusters"),
+        "mariadbClusters": results.get("mariadbClusters"),
+        "k8sClusters": results.get("k8sClusters"),
+        "k8sNodePools": results.get("k8sNodePools", []),
+        "nfsClusters": results.get("nfs:regional") or results.get("nfs:global"),
+        "vpnGateways": {"wireguard": results.get("vpn:wireguard"),
+                        "ipsec": results.get("vpn:ipsec")},
+        "kafkaClusters": results.get("kafkaClusters"),
+        "k8sManagedResources": k8s_managed,
+    }
+
+
+def vdc_entry(results: dict, prefix: str = "") -> dict:
+    return {
+        "datacenter": results.get(f"{prefix}datacenter"),
+        "natGateways": results.get(f"{prefix}natGateways"),
+        "applicationLoadBalancers": results.get(f"{prefix}applicationLoadBalancers"),
+        "networkLoadBalancers": results.get(f"{prefix}networkLoadBalancers"),
+    }
+
+
+def build_vdc_snapshot(fetch, dc_id: str, location: str = "",
+                       concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Everything loadVDC() fetches for one data center, in one payload."""
+    graph = FetchGraph(fetch, concurrency)
+    if location:
+        queue_shared_calls(graph, location)
+    else:
+        # The regional hosts are keyed on the DC's location; a depth=0 call
+        # learns it without waiting behind the heavy depth=5 fetch.
+        graph.fetch(
+            "location", f"{CLOUD_API}/datacenters/{dc_id}?depth=0",
+            then=lambda dc: queue_shared_calls(
+                graph, (dc.get("properties") or {}).get("location", "")
+            ),
+        )
+    queue_vdc_calls(graph, dc_id)
+    complete = graph.wait()
+    results = graph.results
+    if not location:
+        location = ((results.get("location") or {}).get("properties") or {}).get(
+            "location", ""
+        )
+    return {
+        "id": dc_id, "location": location, **vdc_entry(results),
+        **shared_services(results), "complete": complete,
+        "timings": sorted(graph.timings, key=lambda t: t["startMs"]),
+        "errors": graph.errors, "elapsedMs": graph.elapsed_ms(),
+    }
+
+
+def build_location_snapshot(fetch, location: str,
+                            concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Everything loadLocation() fetches for all VDCs in a metro region."""
+    graph = FetchGraph(fetch, concurrency)
+    datacenters: list = []
+
+    def queue_datacenters(listing: dict) -> None:
+        for dc in listing.get("items", []):
+            dc_location = (dc.get("properties") or {}).get("location", "")
+            if location_region(dc_location) == location or dc_location == location:
+                datacenters.append(dc)
+                queue_vdc_calls(graph, dc["id"], prefix=f"{dc['id']}:")
+        if datacenters:
+            first = (datacenters[0].get("properties") or {}).get("location", "")
+            queue_shared_calls(graph, first)
+
+    graph.fetch("datacenters", f"{CLOUD_API}/datacenters?depth=1",
+                then=queue_datacenters)
+    complete = graph.wait()
+    results = graph.results
+    return {
+        "location": location,
+        "vdcs": [{"dc": dc, **vdc_entry(results, f"{dc['id']}:")}
+                 for dc in datacenters],
+        **shared_services(results), "complete": complete,
+        "timings": sorted(graph.timings, key=lambda t: t["startMs"]),
+        "errors": graph.errors, "elapsedMs": graph.elapsed_ms(),
+    }
+
+class VdcWatcher:
+    """Works out what changed in one VDC between polls.
+
+    Each poll lists the watched collections at depth=1 and compares every
+    item's ``metadata.etag`` (or ``lastModifiedDate``) with the previous
+    poll; only new or changed items are then fetched at the depth
+    loadVDC() uses. The first poll, and every ``reconcile_every``-th one,
+    fetches whole collections at full depth instead, which also catches
+    edits that leave the parent's etag alone (a NIC's IPs, say). Items are
+    compared by a digest of their JSON, so a delta lists real changes only.
+    """
+
+    # (collection, depth of one item as loadVDC() sees it)
+    COLLECTIONS = (
+        ("servers", 3), ("lans", 3), ("natgateways", 1),
+        ("applicationloadbalancers", 1), ("networkloadbalancers", 1),
+    )
+
+    def __init__(self, fetch, dc_id: str,
+                 concurrency: int = BATCH_CONCURRENCY,
+                 reconcile_every: int = WATCH_RECONCILE_POLLS) -> None:
+        self.fetch = fetch
+        self.dc_url = f"{CLOUD_API}/datacenters/{dc_id}"
+        self.concurrency = concurrency
+        self.reconcile_every = max(1, reconcile_every)
+        self.polls = 0
+        self.known: dict = {}  # collection -> {id: (version, digest)}
+
+    @staticmethod
+    def version(item: dict) -> str:
+        meta = item.get("metadata") or {}
+        return meta.get("etag") or meta.get("lastModifiedDate") or ""
+
+    @staticmethod
+    def digest(item: dict) -> str:
+        return hashlib.sha1(json.dumps(item, sort_keys=True).encode()).hexdigest()
+
+    def poll(self) -> dict:
+        """Poll once; returns the per-collection ``added``/``changed``/``removed``."""
+        full = self.polls % self.reconcile_every == 0
+        self.polls += 1
+        graph = FetchGraph(self.fetch, self.concurrency)
+        listed: dict = {}   # collection -> {id: version}
+        fetched: dict = {name: {} for name, _ in self.COLLECTIONS}
+
+        def fill_nics(server: dict) -> None:
+            nics = ((server.get("entities") or {}).get("nics") or {}).get("items") or []
+            if nics and nics[0].get("properties"):
+                return
+
+            def attach(nic_data: dict) -> None:
+                if nic_data.get("items"):
+                    server.setdefault("entities", {})["nics"] = nic_data
+
+            graph.fetch(f"nics:{server['id']}",
+                        f"{self.dc_url}/servers/{server['id']}/nics?depth=2",
+                        then=attach)
+
+        def store(name: str, item: dict) -> None:
+            fetched[name][item["id"]] = item
+            if name == "servers":
+                fill_nics(item)
+
+        def on_listing(name: str, depth: int, listing: dict) -> None:
+            items = [i for i in listing.get("items", []) if i.get("id")]
+            listed[name] = {i["id"]: self.version(i) for i in items}
+            known = self.known.get(name, {})
+            for item in items:
+                version = self.version(item)
+                if full:
+                    store(name, item)
+                elif not version or known.get(item["id"], ("",))[0] != version:
+                    graph.fetch(
+                        f"{name}:{item['id']}",
+                        f"{self.dc_url}/{name}/{item['id']}?depth={depth}",
+                        then=lambda body, name=name: store(name, body),
+                    )
+
+        for name, depth in self.COLLECTIONS:
+            graph.fetch(
+                name, f"{self.dc_url}/{name}?depth={depth + 1 if full else 1}",
+                then=lambda body, name=name, depth=depth: on_listing(name, depth, body),
+            )
+        complete = graph.wait()
+
+        changes = {}
+        for name, _ in self.COLLECTIONS:
+            if name not in listed:
+                continue  # listing failed: keep what we knew and try again
+            known = self.known.get(name)
+            current, added, changed = {}, [], []
+            for item_id, version in listed[name].items():
+                item = fetched[name].get(item_id)
+                if item is None:
+                    # Unchanged, or its fetch failed and it is retried next poll.
+                    if known and item_id in known:
+                        current[item_id] = known[item_id]
+                    continue
+                digest = self.digest(item)
+                current[item_id] = (version, digest)
+                if known is None:
+                    continue
+                if item_id not in known:
+                    added.append(item)
+                elif known[item_id][1] != digest:
+                    changed.append(item)
+            removed = ([] if known is None
+                       else [i for i in known if i not in listed[name]])
+            self.known[name] = current
+            if added or changed or removed:
+                changes[name] = {"added": added, "changed": changed,
+                                 "removed": removed}
+        return {
+            "changes": changes, "full": full, "complete": complete,
+            "calls": len(graph.timings), "errors": graph.errors,
+            "elapsedMs": graph.elapsed_ms(),
+            "counts": {name: len(ids) for name, ids in self.known.items()},
+        }
+
+
+class PrefetchSession:
+    """One browser's credentials and the VDCs it wants kept warm."""
+
+    def __init__(self, token: str, contract: str) -> None:
+        self.token = token
+        self.contract = contract
+        self.datacenters: dict = {}   # id -> (rank, location, name)
+        self.crawled: dict = {}       # id -> last crawl summary
+        self.generation = 0
+        self.seen = time.monotonic()
+
+
+class PrefetchCrawler:
+    """Keeps every VDC of the registered contracts warm in the response cache.
+
+    The browser registers after connecting, and again as the user moves
+    around, naming the open VDC, its favourites and the current location.
+    One daemon thread takes due VDCs from a priority queue in that order,
+    then the rest, and runs ``build_vdc_snapshot`` for each in the
+    background lane. Each VDC is walked again every ``refresh_seconds``,
+    well before its cached calls leave the stale window, so ``loadVDC()``
+    through ``/proxy`` is answered from memory instead of waiting on the
+    depth=5 call. Calls are paced one by one across all sessions: each
+    starts at least ``1 / rate`` seconds after the previous one, and a call
+    answered from the cache hands its slot straight back, so upstream sees
+    at most ``rate`` calls per second. A session is dropped once its browser has
+    not checked in for ``idle_seconds``, or when its token is rejected.
+    """
+
+    def __init__(self, fetch, rate: float = PREFETCH_RATE,
+                 refresh_seconds: float = PREFETCH_REFRESH_SECONDS,
+                 idle_seconds: float = PREFETCH_IDLE_SECONDS,
+                 concurrency: int = PREFETCH_CONCURRENCY) -> None:
+        self._fetch = fetch  # fetch_json(url, token, contract, priority)
+        self.rate = rate
+        self.refresh_seconds = refresh_seconds
+        self.idle_seconds = idle_seconds
+        self.concurrency = concurrency
+        self._cond = threading.Condition()
+        self._sessions: dict = {}
+        self._ready: list = []    # (rank, due, seq, key, dc_id, generation)
+        self._waiting: list = []  # (due, rank, seq, key, dc_id, generation)
+        self._seq = itertools.count()
+        self._pace = threading.Condition()
+        self._next_call_at = 0.0
+        self._stats = {"registrations": 0, "crawls": 0, "upstream_calls": 0,
+                       "cached_calls": 0, "crawl_errors": 0,
+                       "sessions_expired": 0, "sessions_rejected": 0}
+
+    def register(self, key: str, token: str, contract: str, datacenters: list,
+                 favorites=(), location: str = "", current: str = "") -> dict:
+        """(Re)rank a session's VDCs and queue them; returns its status.
+
+        ``datacenters`` is the contract's depth=1 listing. Ranks: the open
+        VDC, then favourites, then VDCs in ``location``'s region, then the
+        rest. VDCs still warm from an earlier crawl keep their due time.
+        """
+        favorites = set(favorites)
+        region = location_region(location) if location else ""
+        with self._cond:
+            self._stats["registrations"] += 1
+            session = self._sessions.get(key)
+            if session is None:
+                if len(self._sessions) >= PREFETCH_MAX_SESSIONS:
+                    oldest = min(self._sessions, key=lambda k: self._sessions[k].seen)
+                    del self._sessions[oldest]
+                    self._stats["sessions_expired"] += 1
+                session = self._sessions[key] = PrefetchSession(token, contract)
+            session.seen = time.monotonic()
+            session.generation += 1
+            session.datacenters = {}
+            for dc in datacenters:
+                props = dc.get("properties") or {}
+                dc_location = props.get("location", "")
+                if dc.get("id") == current:
+                    rank = 0
+                elif dc.get("id") in favorites:
+                    rank = 1
+                elif region and location_region(dc_location) == region:
+                    rank = 2
+                else:
+                    rank = 3
+                session.datacenters[dc["id"]] = (rank, dc_location,
+                                                 props.get("name", ""))
+            for dc_id in list(session.crawled):
+                if dc_id not in session.datacenters:
+                    del session.crawled[dc_id]
+            for dc_id, (rank, _, _) in session.datacenters.items():
+                crawled = session.crawled.get(dc_id)
+                due = crawled["due"] if crawled else session.seen
+                heapq.heappush(self._waiting, (due, rank, next(self._seq), key,
+                                               dc_id, session.generation))
+            self._cond.notify()
+            return self._status(session)
+
+    def unregister(self, key: str) -> bool:
+        with self._cond:
+            return self._sessions.pop(key, None) is not None
+
+    def start(self) -> None:
+        threading.Thread(target=self._crawl_loop, name="hub-prefetch",
+                         daemon=True).start()
+
+    def _next_job(self):
+        """Block until a VDC is due; returns ``(key, session, dc_id)``."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._waiting and self._waiting[0][0] <= now:
+                    due, rank, seq, key, dc_id, generation = heapq.heappop(self._waiting)
+                    heapq.heappush(self._ready, (rank, due, seq, key, dc_id, generation))
+                while self._ready:
+                    _, _, _, key, dc_id, generation = heapq.heappop(self._ready)
+                    session = self._sessions.get(key)
+                    if session is None or session.generation != generation:
+                        continue  # superseded by a newer registration
+                    if now - session.seen > self.idle_seconds:
+                        del self._sessions[key]
+                        self._stats["sessions_expired"] += 1
+                        continue
+                    return key, session, dc_id
+                self._cond.wait(self._waiting[0][0] - now if self._waiting else None)
+
+    def _paced_fetch(self, url: str, session: PrefetchSession) -> dict:
+        """One background call, started no earlier than the rate allows."""
+        step = 1 / self.rate
+        with self._pace:
+            while True:
+                now = time.monotonic()
+                if self._next_call_at <= now:
+                    break
+                self._pace.wait(self._next_call_at - now)
+            self._next_call_at = now + step
+        call = self._fetch(url, session.token, session.contract, PRIORITY_BACKGROUND)
+        if call["cache"] not in ("MISS", "STALE"):
+            with self._pace:
+                self._next_call_at -= step  # nothing went upstream
+                self._pace.notify()
+        return call
+
+    def _crawl_loop(self) -> None:
+        while True:
+            key, session, dc_id = self._next_job()
+            rank, location, name = session.datacenters.get(dc_id, (3, "", ""))
+            try:
+                snapshot = build_vdc_snapshot(
+                    lambda url: self._paced_fetch(url, session),
+                    dc_id, location, self.concurrency,
+                )
+            except Exception as e:  # the crawler thread must survive anything
+                sys.stderr.write(f"  [Prefetch] {name or dc_id} failed: {e}\n")
+                snapshot = {"timings": [], "errors": [{"error": str(e)}],
+                            "elapsedMs": 0}
+            upstream = sum(t["cache"] in ("MISS", "STALE") for t in snapshot["timings"])
+            now = time.monotonic()
+            with self._cond:
+                self._stats["crawls"] += 1
+                self._stats["upstream_calls"] += upstream
+                self._stats["cached_calls"] += len(snapshot["timings"]) - upstream
+                self._stats["crawl_errors"] += len(snapshot["errors"])
+                # Only a rejected read of the DC itself means the token is
+                # bad; a 403 on one managed service is just a missing grant.
+                if any(e.get("status") in (401, 403)
+                       and e.get("name") in ("datacenter", "location")
+                       for e in snapshot["errors"]):
+                    if self._sessions.get(key) is session:
+                        del self._sessions[key]
+                        self._stats["sessions_rejected"] += 1
+                    sys.stderr.write("  [Prefetch] Token rejected; session dropped\n")
+                    continue
+                due = now + self.refresh_seconds
+                session.crawled[dc_id] = {
+                    "at": time.time(), "due": due, "ms": snapshot["elapsedMs"],
+                    "upstream": upstream, "errors": len(snapshot["errors"]),
+                }
+                if self._sessions.get(key) is session and dc_id in session.datacenters:
+                    heapq.heappush(self._waiting, (due, rank, next(self._seq), key,
+                                                   dc_id, session.generation))
+            if upstream:
+                sys.stderr.write(
+                    f"  [Prefetch] {name or dc_id}: {upstream} upstream / "
+                    f"{len(snapshot['timings'])} calls in {snapshot['elapsedMs']:.0f} ms\n"
+                )
+
+    def _status(self, session: PrefetchSession) -> dict:
+        now = time.time()
+        ranks = Counter(rank for rank, _, _ in session.datacenters.values())
+        return {
+            "datacenters": len(session.datacenters),
+            "warm": sum(now - c["at"] < self.refresh_seconds + CACHE_STALE_SECONDS
+                        for c in session.crawled.values()),
+            "current": ranks[0], "favorites": ranks[1], "location": ranks[2],
+            "refreshSeconds": self.refresh_seconds, "rate": self.rate,
+        }
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+            stats["queued"] = len(self._ready) + len(self._waiting)
+        stats["rate"] = self.rate
+        return stats
+
+
+class ComplianceEngine:
+    """Evaluates the compliance audit rules directly against VDC snapshots.
+
+    Each snapshot is indexed once (LANs by id, NAT-covered LAN ids, the
+    managed databases connected to this VDC), so every rule is a pass
+    over servers or databases with constant-time lookups. The result has
+    the same shape as ``parseComplianceReport()`` in the frontend. Rules
+    score 100 when met, and lose points in proportion to the resources
+    that fail (full weight) or warn (half weight). Reports are kept per
+    VDC with a digest of their inputs, so re-evaluating an unchanged VDC
+    returns the stored report.
+    """
+
+    def __init__(self, max_reports: int = COMPLIANCE_REPORTS) -> None:
+        self.max_reports = max_reports
+        self._reports: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"evaluations": 0, "unchanged": 0, "servers_checked": 0}
+
+    def evaluate(self, key: str, snapshot: dict,
+                 transfer_out: Optional[dict] = None) -> dict:
+        """Report for one ``build_vdc_snapshot`` result.
+
+        ``transfer_out`` maps server ids to billed outbound GB (CST-02);
+        without it that rule has nothing to compare and passes.
+        """
+        inputs = {name: snapshot.get(name) for name in (
+            "datacenter", "natGateways", *(db for db, _, _ in COMPLIANCE_DB_VERSIONS)
+        )}
+        inputs["transferOut"] = transfer_out
+        digest = VdcWatcher.digest(inputs)
+        with self._lock:
+            cached = self._reports.get(key)
+            if cached is not None and cached[0] == digest:
+                self._reports.move_to_end(key)
+                self._stats["unchanged"] += 1
+                return cached[1]
+
+        report = self._evaluate(snapshot, transfer_out or {})
+        with self._lock:
+            self._stats["evaluations"] += 1
+            self._stats["servers_checked"] += report["servers"]
+            self._reports[key] = (digest, report)
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return report
+
+    def _evaluate(self, snapshot: dict, transfer_out: dict) -> dict:
+        dc = snapshot.get("datacenter") or {}
+        dc_id = dc.get("id") or snapshot.get("id", "")
+        entities = dc.get("entities") or {}
+        servers = (entities.get("servers") or {}).get("items") or []
+        lans = {str(lan.get("id")): lan
+                for lan in (entities.get("lans") or {}).get("items") or []}
+        nat_lans = {str(lan.get("id"))
+                    for gw in (snapshot.get("natGateways") or {}).get("items") or []
+                    for lan in (gw.get("properties") or {}).get("lans") or []}
+        databases = []  # (cluster, version property, minimum major, lan ids here)
+        for name, version_key, minimum in COMPLIANCE_DB_VERSIONS:
+            for cluster in (snapshot.get(name) or {}).get("items") or []:
+                lan_ids = [str(conn.get("lanId"))
+                           for conn in (cluster.get("properties") or {}).get("connections") or []
+                           if conn.get("datacenterId") == dc_id]
+                if lan_ids:
+                    databases.append((cluster, version_key, minimum, lan_ids))
+
+        # rule id -> {"pass": n, "warn": [names], "fail": [names]}
+        outcomes = {rule_id: {"pass": 0, "warn": [], "fail": []}
+                    for rule_id, _, _, _ in COMPLIANCE_RULES}
+
+        def record(rule_id: str, status: Optional[str], name: str) -> None:
+            if status == "pass":
+                outcomes[rule_id]["pass"] += 1
+            elif status is not None:
+                outcomes[rule_id][status].append(name)
+
+        served_lans = set()
+        for srv in servers:
+            props = srv.get("properties") or {}
+            name = props.get("name") or srv.get("id", "")
+            nics = ((srv.get("entities") or {}).get("nics") or {}).get("items") or []
+            firewall = any((nic.get("properties") or {}).get("firewallActive") for nic in nics)
+            groups = bool(((srv.get("entities") or {}).get("securitygroups") or {}).get("items")) or any(
+                ((nic.get("entities") or {}).get("securitygroups") or {}).get("items") for nic in nics
+            )
+            cores, ram = props.get("cores"), props.get("ram")
+            served_lans.update(str((nic.get("properties") or {}).get("lan")) for nic in nics)
+
+            record("NET-01", "pass" if firewall or groups else "fail", name)
+            if nics:
+                record("NET-02", "pass" if all(
+                    ((nic.get("entities") or {}).get("flowlogs") or {}).get("items") for nic in nics
+                ) else "warn", name)
+            if firewall or groups:
+                record("ACC-01", "pass" if groups else "warn", name)
+            if cores and cores >= 2:
+                record("ACC-02", "pass" if props.get("nicMultiQueue") else "warn", name)
+            record("AUD-01", "warn" if props.get("vmState") == "SHUTOFF" and (
+                (srv.get("metadata") or {}).get("state") == "AVAILABLE") else "pass", name)
+            record("AUD-02", "warn" if GENERIC_NAME_RE.match(props.get("name") or "")
+                   or UUID_RE.match(props.get("name") or "") else "pass", name)
+            if cores is not None or ram is not None:
+                record("CST-01", "warn" if (cores is not None and cores <= 1)
+                       or (ram is not None and ram <= 1024) else "pass", name)
+
+        for lan_id in served_lans & lans.keys():
+            lan_props = lans[lan_id].get("properties") or {}
+            if not lan_props.get("public"):
+                record("NET-04", "pass" if lan_id in nat_lans else "warn",
+                       lan_props.get("name") or f"LAN {lan_id}")
+
+        billed = {(srv.get("properties") or {}).get("name") or srv.get("id", ""):
+                  transfer_out[srv.get("id")]
+                  for srv in servers if transfer_out.get(srv.get("id"))}
+        if billed:
+            limit = max(COMPLIANCE_TRANSFER_FACTOR * statistics.median(billed.values()),
+                        COMPLIANCE_TRANSFER_MIN_GB)
+            for name, gb in billed.items():
+                record("CST-02", "warn" if gb > limit else "pass", name)
+
+        for cluster, version_key, minimum, lan_ids in databases:
+            props = cluster.get("properties") or {}
+            name = props.get("displayName") or props.get("name") or cluster.get("id", "")
+            record("NET-03", "fail" if any(
+                (lans.get(lan_id, {}).get("properties") or {}).get("public") for lan_id in lan_ids
+            ) else "pass", name)
+            major = re.match(r"\d+", str(props.get(version_key) or ""))
+            if major:
+                record("DAT-01", "pass" if int(major.group()) >= minimum else "warn", name)
+            if props.get("instances") is not None:
+                record("DAT-02", "pass" if props["instances"] > 1 else "warn", name)
+
+        categories: dict = {}
+        for rule_id, category, pass_text, issue_text in COMPLIANCE_RULES:
+            result = outcomes[rule_id]
+            total = result["pass"] + len(result["warn"]) + len(result["fail"])
+            issues = result["fail"] or result["warn"]
+            score = 100 if not total else round(
+                100 * (result["pass"] + len(result["warn"]) / 2) / total
+            )
+            status = "fail" if result["fail"] else "warn" if result["warn"] else "pass"
+            text = issue_text if issues else pass_text
+            categories.setdefault(category, []).append((score, {
+                "status": status, "ruleId": rule_id,
+                "description": text.format(count=len(issues), total=total)
+                if total else "Nothing to check in this VDC",
+                "resources": sorted(result["fail"] + result["warn"]),
+            }))
+        scores = [score for findings in categories.values() for score, _ in findings]
+        return {
+            "overallScore": round(statistics.fmean(scores)),
+            "categories": [
+                {"name": name, "score": round(statistics.fmean(s for s, _ in findings)),
+                 "findings": [finding for _, finding in findings]}
+                for name, findings in categories.items()
+            ],
+            "servers": len(servers),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["reports"] = len(self._reports)
+        return stats
+
+
+FLOWLOG_FILE_RE = re.compile(r"^([0-9a-f-]{36})-(\d+)\.log")
+PROTO_NAMES = {1: "ICMP", 6: "TCP", 17: "UDP", 47: "GRE", 50: "ESP", 58: "ICMPv6"}
+UINT32_MAX = 0xFFFFFFFF
+FLOWLOG_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+FLOWLOG_GROUPS_MAX = 100000
+FLOWLOG_MAX_STORES = 64  # idle archived (or empty) stores kept open at once
+FLOWLOG_SEGMENT_MAGIC = b"HUBFLOW\x01"
+
+
+def flowlog_key(name: str) -> str:
+    """Archive identity of a flow log file: ``<nic-uuid>-<timestamp>``.
+
+    Falls back to the file name (made filesystem-safe) for files that do
+    not follow the IONOS naming scheme.
+    """
+    match = FLOWLOG_FILE_RE.match(name)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    stem = re.sub(r"\.log\.gz$|\.gz$|\.log$", "", name)
+    return re.sub(r"[^\w.-]", "_", stem) or "unnamed"
+
+
+def pack_ipv4(addr: str) -> Optional[int]:
+    """Dotted IPv4 address as an int, or None for anything else."""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, addr), "big")
+    except (OSError, ValueError):
+        return None
+
+
+def unpack_ipv4(value: int) -> str:
+    return socket.inet_ntop(socket.AF_INET, value.to_bytes(4, "big"))
+
+
+def _uint(text: str, limit: int) -> int:
+    """``parseInt(text) || 0`` for unsigned columns, clamped to ``limit``."""
+    return min(int(text), limit) if text.isdigit() else 0
+
+
+class FlowSegment:
+    """Flow records from one log file, stored column-wise in typed arrays.
+
+    Addresses are packed IPv4 ints (the rare non-IPv4 address is kept in a
+    per-column side table keyed by row), ports are uint16, counters and
+    timestamps uint32, and account, NIC, action, and log status are indexes
+    into small per-segment dictionaries. A record costs ~36 bytes instead
+    of a 14-field object.
+    """
+
+    COLUMNS = (
+        ("version", "B"), ("account", "H"), ("nic", "H"),
+        ("src", "I"), ("dst", "I"), ("srcport", "H"), ("dstport", "H"),
+        ("protocol", "B"), ("packets", "I"), ("bytes", "I"),
+        ("start", "I"), ("end", "I"), ("action", "B"), ("status", "B"),
+    )
+    DICTIONARIES = ("account", "nic", "action", "status")
+
+    def __init__(self, name: str) -> None:
+        match = FLOWLOG_FILE_RE.match(name)
+        self.name = name
+        self.key = flowlog_key(name)
+        self.nic_id = match.group(1) if match else re.sub(r"\.log\.gz$|\.gz$|\.log$", "", name)
+        self.timestamp = int(match.group(2)) if match else None
+        self.columns = {col: array(code) for col, code in self.COLUMNS}
+        self.values = {col: [] for col in self.DICTIONARIES}
+        self.other_addrs = {"src": {}, "dst": {}}
+        self._codes = {col: {} for col in self.DICTIONARIES}
+        self._mapped: Optional[mmap.mmap] = None
+
+    def close(self) -> None:
+        """Unmap an opened segment; it reads as empty afterwards.
+
+        The caller must make sure no query is still reading its columns.
+        """
+        if self._mapped is None:
+            return
+        views, self.columns = self.columns, {col: array(code) for col, code in self.COLUMNS}
+        for view in views.values():
+            view.release()
+        self._mapped.close()
+        self._mapped = None
+
+    def __len__(self) -> int:
+        return len(self.columns["start"])
+
+    # On-disk format: magic, little-endian header length, JSON header
+    # (file metadata, dictionaries, side tables, column offsets), then each
+    # column's raw native-endian array bytes at an 8-byte aligned offset.
+
+    def save(self, path: Path) -> None:
+        """Write the segment atomically (temp file + rename).
+
+        The temp file is unique, so two uploads of the same file never
+        write into each other's copy.
+        """
+        offsets, offset = [], 0
+        for col, code in self.COLUMNS:
+            offsets.append([col, code, offset])
+            offset += -(-len(self.columns[col]) * self.columns[col].itemsize // 8) * 8
+        header = {
+            "name": self.name, "rows": len(self), "byteorder": sys.byteorder,
+            "values": self.values,
+            "other_addrs": {c: {str(r): a for r, a in rows.items()}
+                            for c, rows in self.other_addrs.items()},
+            "columns": offsets,
+        }
+        blob = json.dumps(header).encode()
+        start = -(-(len(FLOWLOG_SEGMENT_MAGIC) + 4 + len(blob)) // 8) * 8
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.stem + ".",
+                                         suffix=".tmp", delete=False) as f:
+            try:
+                f.write(FLOWLOG_SEGMENT_MAGIC + len(blob).to_bytes(4, "little") + blob)
+                for col, _, col_offset in offsets:
+                    f.seek(start + col_offset)
+                    f.write(self.columns[col].tobytes())
+                f.truncate(start + offset)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    @classmethod
+    def open(cls, path: Path) -> "FlowSegment":
+        """Map a saved segment read-only; columns become memoryviews over it.
+
+        Nothing is decoded up front, so opening costs a header parse and the
+        OS pages column data in as queries touch it.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic_len = len(FLOWLOG_SEGMENT_MAGIC)
+        if mapped[:magic_len] != FLOWLOG_SEGMENT_MAGIC:
+            raise ValueError("not a flow log segment")
+        header_len = int.from_bytes(mapped[magic_len:magic_len + 4], "little")
+        header = json.loads(mapped[magic_len + 4:magic_len + 4 + header_len])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"written on a {header['byteorder']}-endian host")
+        start = -(-(magic_len + 4 + header_len) // 8) * 8
+        seg = cls(header["name"])
+        seg._mapped = mapped
+        seg.values = header["values"]
+        seg.other_addrs = {c: {int(r): a for r, a in rows.items()}
+                           for c, rows in header["other_addrs"].items()}
+        view = memoryview(mapped)
+        for col, code, offset in header["columns"]:
+            size = header["rows"] * seg.columns[col].itemsize
+            seg.columns[col] = view[start + offset:start + offset + size].cast(code)
+        return seg
+
+    def _encode(self, column: str, value: str) -> int:
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[column])
+            self.values[column].append(value)
+        return code
+
+    def _append_addr(self, column: str, addr: str) -> None:
+        packed = pack_ipv4(addr)
+        if packed is None:
+            self.other_addrs[column][len(self.columns[column])] = addr
+            packed = 0
+        self.columns[column].append(packed)
+
+    def append_line(self, line: str) -> bool:
+        """Parse one ``version account-id interface-id srcaddr ...`` line."""
+        parts = line.split()
+        if len(parts) < 14 or not parts[0].isdigit():
+            return False  # header or malformed
+        (version, account, iface, src, dst, srcport, dstport, protocol,
+         packets, nbytes, start, end, action, status) = parts[:14]
+        cols = self.columns
+        cols["version"].append(min(int(version), 255))
+        cols["account"].append(self._encode("account", account))
+        cols["nic"].append(self._encode("nic", iface if iface != "-" else self.nic_id))
+        self._append_addr("src", src)
+        self._append_addr("dst", dst)
+        cols["srcport"].append(_uint(srcport, 0xFFFF))
+        cols["dstport"].append(_uint(dstport, 0xFFFF))
+        cols["protocol"].append(_uint(protocol, 255))
+        cols["packets"].append(_uint(packets, UINT32_MAX))
+        cols["bytes"].append(_uint(nbytes, UINT32_MAX))
+        cols["start"].append(_uint(start, UINT32_MAX))
+        cols["end"].append(_uint(end, UINT32_MAX))
+        cols["action"].append(self._encode("action", action))
+        cols["status"].append(self._encode("status", status))
+        return True
+
+    def addr(self, column: str, row: int) -> str:
+        other = self.other_addrs[column].get(row)
+        return other if other is not None else unpack_ipv4(self.columns[column][row])
+
+    def record(self, row: int) -> dict:
+        """One row in the browser's flow record shape."""
+        cols, values = self.columns, self.values
+        return {
+            "version": cols["version"][row],
+            "accountId": values["account"][cols["account"][row]],
+            "interfaceId": values["nic"][cols["nic"][row]],
+            "srcaddr": self.addr("src", row),
+            "dstaddr": self.addr("dst", row),
+            "srcport": cols["srcport"][row],
+            "dstport": cols["dstport"][row],
+            "protocol": cols["protocol"][row],
+            "packets": cols["packets"][row],
+            "bytes": cols["bytes"][row],
+            "start": cols["start"][row],
+            "end": cols["end"][row],
+            "action": values["action"][cols["action"][row]],
+            "logStatus": values["status"][cols["status"][row]],
+        }
+
+    def info(self) -> dict:
+        return {"name": self.name, "key": self.key, "nicId": self.nic_id,
+                "timestamp": self.timestamp, "recordCount": len(self)}
+
+    # Column predicates. Each returns a ``row -> bool`` test, or None when
+    # no row of this segment can match.
+
+    def addr_test(self, column: str, needle: str):
+        col, other = self.columns[column], self.other_addrs[column]
+        hits = {v for v in set(col) if needle in unpack_ipv4(v)}
+        extra = {row for row, text in other.items() if needle in text.lower()}
+        if not hits and not extra:
+            return None
+        if not other:
+            return lambda i: col[i] in hits
+        return lambda i: (i in extra) if i in other else col[i] in hits
+
+    def code_test(self, column: str, accept) -> Optional[set]:
+        """Dictionary codes of ``column`` whose value satisfies ``accept``."""
+        codes = {code for code, value in enumerate(self.values[column]) if accept(value)}
+        return codes or None
+
+    def sort_key(self, field: str):
+        cols = self.columns
+        if field in ("srcaddr", "dstaddr"):
+            column = field[:3]
+            col, other = cols[column], self.other_addrs[column]
+            if other:
+                return lambda i: UINT32_MAX + 1 if i in other else col[i]
+            return col.__getitem__
+        if field in ("action", "interfaceId"):
+            column = "action" if field == "action" else "nic"
+            labels = [v.lower() for v in self.values[column]]
+            col = cols[column]
+            return lambda i: labels[col[i]]
+        return cols[field].__getitem__
+
+    def group_key(self, field: str):
+        """``row -> label`` for group-by; labels are comparable across segments."""
+        cols = self.columns
+        if field in ("srcaddr", "dstaddr"):
+            column = field[:3]
+            return lambda i: self.addr(column, i)
+        if field in ("action", "interfaceId"):
+            column = "action" if field == "action" else "nic"
+            values, col = self.values[column], cols[column]
+            return lambda i: values[col[i]]
+        return cols[field].__getitem__
+
+
+class PrefixIndex:
+    """Longest-prefix match from IPv4 CIDRs to values, as a binary trie.
+
+    Trie nodes live in flat lists (child-0, child-1, value), so a lookup
+    is at most 32 list hops. Non-IPv4 keys (IPv6) match exactly.
+    """
+
+    def __init__(self) -> None:
+        self._zero = [0]
+        self._one = [0]
+        self._value: list = [None]
+        self._exact: dict = {}
+
+    def insert(self, cidr: str, value) -> None:
+        """Map ``a.b.c.d/len`` (or a bare address, as /32) to ``value``.
+
+        A prefix inserted twice keeps its first value, as the browser's
+        index does when several nodes share an address.
+        """
+        addr, _, length = cidr.strip().partition("/")
+        packed = pack_ipv4(addr)
+        if packed is None:
+            self._exact.setdefault(addr.lower(), value)
+            return
+        bits = int(length) if length else 32
+        if not 0 <= bits <= 32:
+            raise ValueError(f"Invalid prefix length in {cidr!r}")
+        node = 0
+        for shift in range(31, 31 - bits, -1):
+            branch = self._one if packed >> shift & 1 else self._zero
+            if not branch[node]:
+                branch[node] = len(self._value)
+                self._zero.append(0)
+                self._one.append(0)
+                self._value.append(None)
+            node = branch[node]
+        if self._value[node] is None:
+            self._value[node] = value
+
+    def lookup(self, packed: int):
+        """Value of the longest prefix containing a packed IPv4 address."""
+        zero, one, values = self._zero, self._one, self._value
+        node, best = 0, values[0]
+        for shift in range(31, -1, -1):
+            node = (one if packed >> shift & 1 else zero)[node]
+            if not node:
+                break
+            if values[node] is not None:
+                best = values[node]
+        return best
+
+    def lookup_text(self, addr: str):
+        packed = pack_ipv4(addr)
+        return self._exact.get(addr.lower()) if packed is None else self.lookup(packed)
+
+    def lookup_many(self, packed_values) -> dict:
+        """Resolve each distinct packed address once: ``{address: value}``."""
+        return {v: self.lookup(v) for v in set(packed_values)}
+
+
+class FlowLogFilter:
+    """The Flow Log Explorer's filter bar as a server-side row filter.
+
+    ``search`` matches, case-insensitively, any of source/destination
+    address, either port, action, protocol name, or NIC.
+    """
+
+    def __init__(self, params: dict) -> None:
+        def get(key: str) -> str:
+            return (params.get(key, [""])[0] or "").strip()
+
+        self.action = get("action")
+        self.proto = int(get("proto")) if get("proto") else None
+        self.src = get("src").lower()
+        self.dst = get("dst").lower()
+        self.port = int(get("port")) if get("port") else None
+        self.nic = get("nic")
+        self.search = get("search").lower()
+
+    def rows(self, seg: FlowSegment) -> list:
+        """Indexes of ``seg`` rows that pass every active filter."""
+        cols = seg.columns
+        rows = range(len(seg))
+        if self.action:
+            codes = seg.code_test("action", lambda v: v == self.action)
+            if codes is None:
+                return []
+            col = cols["action"]
+            rows = [i for i in rows if col[i] in codes]
+        if self.nic:
+            codes = seg.code_test("nic", lambda v: v == self.nic)
+            if codes is None:
+                return []
+            col = cols["nic"]
+            rows = [i for i in rows if col[i] in codes]
+        if self.proto is not None:
+            col = cols["protocol"]
+            rows = [i for i in rows if col[i] == self.proto]
+        if self.port is not None:
+            sport, dport, port = cols["srcport"], cols["dstport"], self.port
+            rows = [i for i in rows if sport[i] == port or dport[i] == port]
+        for column, needle in (("src", self.src), ("dst", self.dst)):
+            if needle:
+                test = seg.addr_test(column, needle)
+                if test is None:
+                    return []
+                rows = [i for i in rows if test(i)]
+        if self.search:
+            test = self._search_test(seg)
+            rows = [i for i in rows if test(i)]
+        return rows if isinstance(rows, list) else list(rows)
+
+    def _search_test(self, seg: FlowSegment):
+        needle, cols = self.search, seg.columns
+        tests = [t for t in (seg.addr_test("src", needle), seg.addr_test("dst", needle)) if t]
+        ports = {p for p in set(cols["srcport"]) | set(cols["dstport"]) if needle in str(p)}
+        protos = {p for p in set(cols["protocol"])
+                  if needle in str(PROTO_NAMES.get(p, p)).lower()}
+        actions = seg.code_test("action", lambda v: needle in v.lower()) or set()
+        nics = seg.code_test("nic", lambda v: needle in v.lower()) or set()
+        sport, dport, proto = cols["srcport"], cols["dstport"], cols["protocol"]
+        action, nic = cols["action"], cols["nic"]
+        return lambda i: (
+            sport[i] in ports or dport[i] in ports or proto[i] in protos
+            or action[i] in actions or nic[i] in nics or any(t(i) for t in tests)
+        )
+
+
+class FlowLogStore:
+    """Flow log segments with paged filter, sort, and group-by.
+
+    Segments are immutable once ingested, so queries work on a snapshot of
+    the segment list without holding the lock. With a ``directory`` every
+    segment is also saved there as ``<key>.seg`` and served from a
+    read-only memory map, so the archive survives restarts and reopens
+    without re-parsing anything. The directory is created on first ingest.
+    Removed segments are unmapped once no query is reading them.
+    """
+
+    SORT_FIELDS = ("start", "end", "srcaddr", "dstaddr", "srcport", "dstport",
+                   "protocol", "packets", "bytes", "action", "interfaceId")
+    GROUP_FIELDS = ("srcaddr", "dstaddr", "srcport", "dstport",
+                    "protocol", "action", "interfaceId")
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = directory
+        self.segments: list = []
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._retired: list = []  # removed while a query was reading
+        if directory is not None and directory.is_dir():
+            for path in sorted(directory.glob("*.seg")):
+                try:
+                    self.segments.append(FlowSegment.open(path))
+                except (OSError, ValueError, KeyError) as e:
+                    sys.stderr.write(f"  [FlowLogs] Skipping {path.name}: {e}\n")
+
+    def find(self, name: str) -> Optional[FlowSegment]:
+        """The ingested segment for a file name, matched by archive key."""
+        key = flowlog_key(name)
+        return next((seg for seg in self.segments if seg.key == key), None)
+
+    def ingest(self, name: str, chunks) -> FlowSegment:
+        """Parse a ``.log`` / ``.log.gz`` body from an iterable of byte chunks.
+
+        Gzip members are inflated incrementally, so the decompressed file
+        is never held in memory. A file whose archive key was already
+        ingested is not parsed again; the existing segment is returned.
+        A truncated gzip stream raises ``zlib.error`` and a file without a
+        single flow record raises ``ValueError``; neither is stored, so the
+        complete file can still be uploaded under the same key.
+        """
+        seen = self.find(name)
+        if seen is not None:
+            for _ in chunks:
+                pass
+            return seen
+        seg = FlowSegment(name)
+        inflater = None
+        pending = b""
+        for chunk in chunks:
+            if inflater is None:
+                gzipped = chunk[:2] == b"\x1f\x8b"
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else False
+            if inflater:
+                data = inflater.decompress(chunk)
+                while inflater.eof and inflater.unused_data:  # concatenated members
+                    rest = inflater.unused_data
+                    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    data += inflater.decompress(rest)
+            else:
+                data = chunk
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                seg.append_line(line.decode("utf-8", "replace"))
+        if inflater and not inflater.eof:
+            raise zlib.error("gzip stream ends early (truncated file?)")
+        if pending:
+            seg.append_line(pending.decode("utf-8", "replace"))
+        if not len(seg):
+            raise ValueError("no flow log records found")
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{seg.key}.seg"
+            seg.save(path)
+            seg = FlowSegment.open(path)
+        with self._lock:
+            kept = self.find(name)
+            if kept is None:
+                self.segments = self.segments + [seg]
+        if kept is not None:
+            # A concurrent upload of the same file won; drop our mapping.
+            self._retire([seg])
+            return kept
+        return seg
+
+    def files(self) -> list:
+        segments = self._read()
+        try:
+            return [seg.info() for seg in segments]
+        finally:
+            self._done()
+
+    def total(self) -> int:
+        segments = self._read()
+        try:
+            return sum(len(seg) for seg in segments)
+        finally:
+            self._done()
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            kept = [s for s in self.segments if s.name != name]
+            dropped = [s for s in self.segments if s.name == name]
+            self.segments = kept
+        self._unlink(dropped)
+        return bool(dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            dropped, self.segments = self.segments, []
+        self._unlink(dropped)
+
+    def close(self) -> None:
+        """Let go of every segment, keeping the files; unmapped after the last query."""
+        with self._lock:
+            dropped, self.segments = self.segments, []
+        self._retire(dropped)
+
+    def _unlink(self, segments: list) -> None:
+        self._retire(segments)
+        if self.directory is None:
+            return
+        for seg in segments:
+            try:
+                (self.directory / f"{seg.key}.seg").unlink()
+            except OSError as e:
+                sys.stderr.write(f"  [FlowLogs] Could not delete {seg.key}.seg: {e}\n")
+
+    # Queries read a snapshot of the segment list without the lock; these
+    # count them so a removed segment is unmapped only after the last one.
+
+    def _read(self) -> list:
+        with self._lock:
+            self._readers += 1
+            return self.segments
+
+    def _done(self) -> None:
+        with self._lock:
+            self._readers -= 1
+            retired = self._retired if not self._readers else []
+            if retired:
+                self._retired = []
+        for seg in retired:
+            seg.close()
+
+    def _retire(self, segments: list) -> None:
+        with self._lock:
+            if self._readers:
+                self._retired.extend(segments)
+                return
+        for seg in segments:
+            seg.close()
+
+    def query(self, flt: FlowLogFilter, sort: str = "start", descending: bool = True,
+              offset: int = 0, limit: int = 500) -> dict:
+        """One sorted page of matching records plus match counts."""
+        if sort not in self.SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort!r}")
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        wanted = offset + limit
+        candidates = []
+        matched = accepts = rejects = total_bytes = 0
+        segments = self._read()
+        try:
+            for seg in segments:
+                rows = flt.rows(seg)
+                if not rows:
+                    continue
+                matched += len(rows)
+                total_bytes += sum(map(seg.columns["bytes"].__getitem__, rows))
+                counts = Counter(map(seg.columns["action"].__getitem__, rows))
+                for code, value in enumerate(seg.values["action"]):
+                    if value == "ACCEPT":
+                        accepts += counts[code]
+                    elif value == "REJECT":
+                        rejects += counts[code]
+                key = seg.sort_key(sort)
+                top = pick(wanted, rows, key=key) if wanted < len(rows) else rows
+                candidates.extend((key(i), seg, i) for i in top)
+            page = pick(wanted, candidates, key=lambda c: c[0])[offset:wanted]
+            return {
+                "total": self.total(), "matched": matched,
+                "accepts": accepts, "rejects": rejects, "bytes": total_bytes,
+                "offset": offset, "records": [seg.record(i) for _, seg, i in page],
+            }
+        finally:
+            self._done()
+
+    def attribute(self, index: PrefixIndex, nics: dict) -> dict:
+        """Join every record to topology nodes and total traffic per node and link.
+
+        A record's source is the node owning its NIC (``nics``), else the
+        longest-prefix match of its source address; its destination is the
+        match of the destination address. Distinct addresses are looked up
+        once per segment, then rows are joined in a single pass.
+        """
+        nodes: dict = {}
+        links: dict = {}
+        matched = 0
+
+        def bump(table: dict, key: str, nbytes: int, npackets: int, accepted: bool):
+            st = table.get(key)
+            if st is None:
+                st = table[key] = {"bytes": 0, "packets": 0, "accepted": 0, "rejected": 0}
+            st["bytes"] += nbytes
+            st["packets"] += npackets
+            st["accepted" if accepted else "rejected"] += 1
+
+        segments = self._read()
+        try:
+            for seg in segments:
+                cols = seg.columns
+                nic_node = [nics.get(v) for v in seg.values["nic"]]
+                accept = [v == "ACCEPT" for v in seg.values["action"]]
+                src_node = index.lookup_many(cols["src"])
+                dst_node = index.lookup_many(cols["dst"])
+                other_src, other_dst = seg.other_addrs["src"], seg.other_addrs["dst"]
+                nic, src, dst = cols["nic"], cols["src"], cols["dst"]
+                nbytes, packets, action = cols["bytes"], cols["packets"], cols["action"]
+                for i in range(len(seg)):
+                    s = nic_node[nic[i]] or (
+                        index.lookup_text(other_src[i]) if i in other_src else src_node[src[i]]
+                    )
+                    d = index.lookup_text(other_dst[i]) if i in other_dst else dst_node[dst[i]]
+                    if not s and not d:
+                        continue
+                    matched += 1
+                    b, p, ok = nbytes[i], packets[i], accept[action[i]]
+                    if s:
+                        bump(nodes, s, b, p, ok)
+                    if d:
+                        bump(nodes, d, b, p, ok)
+                    if s and d and s != d:
+                        bump(links, "|".join(sorted((s, d))), b, p, ok)
+            return {"total": self.total(), "matched": matched, "nodes": nodes, "links": links}
+        finally:
+            self._done()
+
+    def aggregate(self, flt: FlowLogFilter, by: tuple = ("srcaddr", "dstaddr"),
+                  limit: int = 100, order: str = "bytes") -> dict:
+        """Records, packets, and bytes per group, largest ``order`` first.
+
+        ``by`` names one or more fields; with several, each group key is a
+        list of their values in that order.
+        """
+        rank = {"records": 0, "packets": 1, "bytes": 2}.get(order)
+        if rank is None:
+            raise ValueError(f"Cannot order by {order!r}")
+        for field in by:
+            if field not in self.GROUP_FIELDS:
+                raise ValueError(f"Cannot group by {field!r}")
+        groups: dict = {}
+        matched = 0
+        segments = self._read()
+        try:
+            for seg in segments:
+                rows = flt.rows(seg)
+                matched += len(rows)
+                if len(by) == 1:
+                    key = seg.group_key(by[0])
+                else:
+                    parts = [seg.group_key(field) for field in by]
+                    key = lambda i, parts=parts: tuple(part(i) for part in parts)
+                cols = seg.columns
+                packets, nbytes, action = cols["packets"], cols["bytes"], cols["action"]
+                actions = seg.values["action"]
+                for i in rows:
+                    k = key(i)
+                    g = groups.get(k)
+                    if g is None:
+                        g = groups[k] = [0, 0, 0, 0, 0]
+                    g[0] += 1
+                    g[1] += packets[i]
+                    g[2] += nbytes[i]
+                    verdict = actions[action[i]]
+                    if verdict == "ACCEPT":
+                        g[3] += 1
+                    elif verdict == "REJECT":
+                        g[4] += 1
+            top = heapq.nlargest(limit, groups.items(), key=lambda kv: kv[1][rank])
+            return {
+                "total": self.total(), "matched": matched, "groups": len(groups),
+                "by": list(by),
+                "items": [
+                    {"key": list(k) if isinstance(k, tuple) else k, "records": g[0], "packets": g[1], "bytes": g[2],
+                     "accepts": g[3], "rejects": g[4]}
+                    for k, g in top
+                ],
+            }
+        finally:
+            self._done()
+
+
+def iter_sse_data(resp, limit: int = MAX_RESPONSE_BYTES):
+    """Yield the ``data`` payload of each SSE event as it arrives.
+
+    Lines are split out of ``read1`` chunks so the caller can stop as soon
+    as the frame it wants has been seen, without buffering the rest of
+    the stream.
+    """
+    pending = b""
+    data_lines: list = []
+    received = 0
+    while True:
+        chunk = resp.read1(STREAM_CHUNK_BYTES)
+        if not chunk:
+            break
+        received += len(chunk)
+        if received > limit:
+            raise ValueError("event stream exceeds size limit")
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if not line:
+                if data_lines:
+                    yield b"\n".join(data_lines)
+                    data_lines = []
+            elif line.startswith(b"data:"):
+                data_lines.append(line[5:].lstrip(b" "))
+    if pending.startswith(b"data:"):
+        data_lines.append(pending[5:].strip())
+    if data_lines:
+        yield b"\n".join(data_lines)
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a docs search query."""
+    return " ".join(str(query).lower().split())
+
+
+class FlowLogStores:
+    """One ``FlowLogStore`` per client, keyed like the response cache.
+
+    Uploaded flow logs belong to the token and contract that sent them.
+    With a ``directory`` each client's segments live in a subdirectory
+    named after a hash of its key, reopened on that client's first
+    request after a restart. Beyond ``max_stores`` the least recently
+    used stores are let go, but only idle ones: an archived store is
+    unmapped and reopens from disk, and an in-memory store is dropped only
+    while it holds nothing, since its logs exist nowhere else. A store is
+    in use from ``get()`` until ``release()``, so no request can hold one
+    that a newer copy has replaced on the same directory.
+    """
+
+    def __init__(self, directory: Optional[Path] = None,
+                 max_stores: int = FLOWLOG_MAX_STORES) -> None:
+        self.directory = directory
+        self.max_stores = max_stores
+        self._stores: OrderedDict = OrderedDict()
+        self._users: Counter = Counter()  # key -> requests holding the store
+        self._lock = threading.Lock()
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> FlowLogStore:
+        """The client's store, held by the caller until ``release(key)``."""
+        with self._lock:
+            self._users[key] += 1
+            store = self._stores.get(key)
+            if store is not None:
+                self._stores.move_to_end(key)
+                return store
+            path = None
+            if self.directory is not None:
+                path = self.directory / hashlib.sha256(key.encode()).hexdigest()[:32]
+            store = self._stores[key] = FlowLogStore(path)
+            evicted = []
+            excess = len(self._stores) - self.max_stores
+            for old_key, old in list(self._stores.items()):
+                if excess <= 0:
+                    break
+                if self._users[old_key] or (self.directory is None and old.segments):
+                    continue
+                del self._stores[old_key]
+                evicted.append(old)
+                excess -= 1
+        for old in evicted:
+            old.close()
+        return store
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._users[key] -= 1
+            if self._users[key] <= 0:
+                del self._users[key]
+
+    def archives(self) -> int:
+        """Client archives in ``directory`` (0 when in memory)."""
+        if self.directory is None:
+            return 0
+        return sum(1 for path in self.directory.iterdir() if path.is_dir())
+
+
+class McpError(Exception):
+    """An MCP endpoint answered with an HTTP error."""
+
+    def __init__(self, status: int, detail: str = "") -> None:
+        super().__init__(f"MCP endpoint returned {status}")
+        self.status = status
+        self.detail = detail
+
+
+class McpSession:
+    """A long-lived Streamable HTTP session with one GitBook MCP endpoint.
+
+    The session is opened lazily (``initialize``, then
+    ``notifications/initialized``) and the ``initialize`` and
+    ``tools/list`` results are kept for the lifetime of the session. When
+    the endpoint forgets the session id (404, or a 400 that names the
+    session) the session is re-opened once and the call retried. Any other
+    400 is the request's own fault and is passed back as is.
+    """
+
+    PROTOCOL_VERSION = "2025-03-26"
+
+    def __init__(self, pool: UpstreamPool, url: str) -> None:
+        self.pool = pool
+        self.url = url
+        self.session_id = ""
+        self.server_info: Optional[dict] = None
+        self.tools: Optional[dict] = None
+        self.opened_at = 0.0
+        self.reinitialized = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _post(self, message: dict, session_id: str) -> tuple:
+        """Send one JSON-RPC message.
+
+        Returns ``(response, session id the endpoint assigned)``; the
+        response is None for notifications. A reply that is not a JSON-RPC
+        object, or a stream that ends without one, raises ``McpError(502)``.
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/event-stream",
+            "User-Agent": USER_AGENT,
+        }
+        if session_id:
+            headers["Mcp-Session-Id"] = session_id
+        body = json.dumps(message).encode()
+        with self.pool.request("POST", self.url, headers=headers,
+                               body=body) as resp:
+            if resp.status >= 400:
+                detail = resp.read(2048).decode("utf-8", errors="replace")
+                raise McpError(resp.status, detail[:500])
+            new_id = resp.headers.get("Mcp-Session-Id", "")
+            if "id" not in message:
+                resp.read(STREAM_CHUNK_BYTES)
+                return None, new_id
+            content_type = resp.headers.get("Content-Type", "")
+            if "text/event-stream" not in content_type:
+                try:
+                    reply = json.loads(resp.read(MAX_RESPONSE_BYTES))
+                except ValueError:
+                    raise McpError(502, "Reply is not valid JSON") from None
+                if not isinstance(reply, dict):
+                    raise McpError(502, "Reply is not a JSON-RPC object")
+                return reply, new_id
+            for data in iter_sse_data(resp):
+                try:
+                    reply = json.loads(data)
+                except ValueError:
+                    continue
+                if isinstance(reply, dict) and reply.get("id") == message["id"]:
+                    return reply, new_id
+            raise McpError(502, "Event stream ended without a reply")
+
+    def _request(self, method: str, params: dict, session_id: str) -> dict:
+        message = {"jsonrpc": "2.0", "id": next(self._ids),
+                   "method": method, "params": params}
+        return self._post(message, session_id)[0]
+
+    def _open(self) -> None:
+        """Run the ``initialize`` handshake; called with ``_lock`` held."""
+        self.session_id = ""
+        self.tools = None
+        reply, session_id = self._post({
+            "jsonrpc": "2.0", "id": next(self._ids), "method": "initialize",
+            "params": {
+                "protocolVersion": self.PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": "ionos-cloud-network-hub",
+                               "version": USER_AGENT.rsplit("/", 1)[-1]},
+            },
+        }, "")
+        if "result" not in reply:
+            raise McpError(502, json.dumps(reply.get("error", reply))[:500])
+        self.session_id = session_id
+        self._post({"jsonrpc": "2.0", "method": "notifications/initialized"},
+                   session_id)
+        self.server_info = reply["result"]
+        self.opened_at = time.time()
+
+    def _ensure_open(self, stale: str = None) -> str:
+        """Open the session if needed (or if ``stale`` is still current)."""
+        with self._lock:
+            if self.server_info is None or (stale is not None
+                                            and self.session_id == stale):
+                if self.server_info is not None:
+                    self.reinitialized += 1
+                    sys.stderr.write(f"  [MCP] session expired, re-initializing "
+                                     f"{self.url}\n")
+                self.server_info = None
+                self._open()
+            return self.session_id
+
+    def initialize(self) -> dict:
+        self._ensure_open()
+        return self.server_info
+
+    def call(self, method: str, params: dict) -> dict:
+        """Run a JSON-RPC request inside the session, reopening it if expired."""
+        session_id = self._ensure_open()
+        try:
+            return self._request(method, params, session_id)
+        except McpError as e:
+            expired = e.status == 404 or (
+                e.status == 400 and "session" in e.detail.lower()
+            )
+            if not expired:
+                raise
+        session_id = self._ensure_open(stale=session_id)
+        return self._request(method, params, session_id)
+
+    def list_tools(self) -> dict:
+        if self.tools is None:
+            reply = self.call("tools/list", {})
+            if "result" in reply:
+                self.tools = reply
+            return reply
+        return self.tools
+
+    def info(self) -> dict:
+        return {
+            "url": self.url,
+            "open": self.server_info is not None,
+            "age_seconds": (round(time.time() - self.opened_at)
+                            if self.server_info is not None else None),
+            "reinitialized": self.reinitialized,
+        }
+
+
+class McpSessionPool:
+    """One ``McpSession`` per MCP endpoint URL, created on first use."""
+
+    def __init__(self, pool: UpstreamPool) -> None:
+        self.pool = pool
+        self._sessions: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> McpSession:
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None:
+                session = self._sessions[url] = McpSession(self.pool, url)
+            return session
+
+    def stats(self) -> list:
+        with self._lock:
+            return [s.info() for s in self._sessions.values()]
+
+
+class SearchCache:
+    """Entry-bounded LRU of docs search results with a fixed lifetime.
+
+    Keys are ``(endpoint, tool, normalized query)`` so that repeated
+    questions about the same topic, whatever their spacing or case, are
+    answered without another round trip to the docs MCP server.
+    """
+
+    def __init__(self, max_entries: int = MCP_CACHE_ENTRIES,
+                 ttl: int = MCP_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(url: str, tool: str, arguments: dict) -> Optional[tuple]:
+        """Cache key for a ``tools/call``, or None if it is not a plain search."""
+        query = arguments.get("query") if isinstance(arguments, dict) else None
+        if not isinstance(query, str) or len(arguments) != 1:
+            return None
+        return (url, tool, normalize_query(query))
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: tuple, result: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries),
+                        max_entries=self.max_entries)
+
+
+class PriceListError(Exception):
+    """The price list page answered with an HTTP error."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class PageTextParser(html.parser.HTMLParser):
+    """Single-pass extraction of the text sources on a GitBook page.
+
+    Meant to be fed the page as it downloads. One pass collects the
+    ``__NEXT_DATA__`` JSON blob, the rows of every table (cells joined
+    with `` | ``) and the visible text outside script/style/svg blocks,
+    with character references already decoded.
+    """
+
+    SKIP_TAGS = frozenset(("script", "style", "noscript", "svg", "template"))
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.next_data: list = []
+        self.rows: list = []
+        self.text: list = []
+        self.tables = 0
+        self._skip = 0  # depth inside SKIP_TAGS elements
+        self._in_next_data = False
+        self._row: Optional[list] = None
+        self._cell: Optional[list] = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+            if tag == "script" and ("id", "__NEXT_DATA__") in attrs:
+                self._in_next_data = True
+            return
+        self.text.append(" ")
+        if tag == "table":
+            self.tables += 1
+        elif tag == "tr":
+            self._end_row()
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._end_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            self._in_next_data = False
+            return
+        self.text.append(" ")
+        if tag in ("td", "th"):
+            self._end_cell()
+        elif tag in ("tr", "table"):
+            self._end_row()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_next_data:
+            self.next_data.append(data)
+        elif not self._skip:
+            self.text.append(data)
+            if self._cell is not None:
+                self._cell.append(data)
+
+    def _end_cell(self) -> None:
+        if self._cell is not None and self._row is not None:
+            self._row.append("".join(self._cell).strip())
+        self._cell = None
+
+    def _end_row(self) -> None:
+        self._end_cell()
+        if self._row and any(self._row):
+            self.rows.append(" | ".join(self._row))
+        self._row = None
+
+
+class PriceListCache:
+    """The extracted IONOS price list text, refreshed in the background.
+
+    Readers never wait on the docs site once a copy exists: an expired
+    copy is served while one refresh runs, and from the first ``get()``
+    on a daemon thread refreshes ahead of expiry with jitter so several
+    instances don't hit the site together. Only a cold start with nothing on disk fetches inline, and
+    concurrent callers share that one fetch. Each good copy is written to
+    ``path`` so it survives restarts.
+    """
+
+    def __init__(self, pool: UpstreamPool, url: str = PRICE_LIST_URL,
+                 path: Optional[Path] = None,
+                 ttl: int = PRICE_LIST_TTL) -> None:
+        self.pool = pool
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.text: Optional[str] = None
+        self.source = ""
+        self.fetched_at = 0.0
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._started = False
+        if path is not None:
+            self._load()
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def get(self) -> tuple:
+        """Return ``(text, state)``; state is fresh, stale or fetched.
+
+        Raises the fetch error only when there is no copy at all.
+        """
+        self.start()
+        if self.text is None:
+            text, shared = self._flight.do("price-list", self.refresh)
+            return text, "fresh" if shared else "fetched"
+        if self.age() >= self.ttl:
+            self.refresh_in_background()
+            return self.text, "stale"
+        return self.text, "fresh"
+
+    def refresh(self) -> str:
+        """Download and parse the page, then publish and persist the text."""
+        parser = PageTextParser()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        received = 0
+        started = time.monotonic()
+        with self.pool.request(
+            "GET", self.url,
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html"},
+        ) as resp:
+            if resp.status >= 400:
+                raise PriceListError(resp.status,
+                                     f"Price list fetch failed: {resp.status}")
+            while received < PRICE_LIST_MAX_HTML_BYTES:
+                chunk = resp.read1(min(STREAM_CHUNK_BYTES,
+                                       PRICE_LIST_MAX_HTML_BYTES - received))
+                if not chunk:
+                    break
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+
+        text, source = self.extract(parser)
+        if len(text) > PRICE_LIST_MAX_CHARS:
+            text = (text[:PRICE_LIST_MAX_CHARS]
+                    + '\n\n[Price list truncated — see full list at '
+                    + self.url + ']')
+        sys.stderr.write(
+            f"  [PriceList] {received} bytes HTML → {len(text)} chars from "
+            f"{source} in {(time.monotonic() - started) * 1000:.0f} ms\n"
+        )
+        with self._lock:
+            self.text, self.source, self.fetched_at = text, source, time.time()
+        self._save()
+        return text
+
+    @staticmethod
+    def extract(parser: PageTextParser) -> tuple:
+        """Pick the best text source: ``__NEXT_DATA__``, tables, then all text."""
+        if parser.next_data:
+            try:
+                text = ProxyHandler._extract_gitbook_content(
+                    json.loads("".join(parser.next_data))
+                )
+                if text:
+                    return text, "__NEXT_DATA__"
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                sys.stderr.write(f"  [PriceList] __NEXT_DATA__ parse failed: {e}\n")
+        if parser.rows:
+            return "\n".join(parser.rows), f"{parser.tables} HTML tables"
+        text = re.sub(r"[ \t]+", " ", "".join(parser.text))
+        return re.sub(r"\n{3,}", "\n\n", text).strip(), "page text"
+
+    def _refresh_shared(self) -> None:
+        """Refresh, joining one already in flight; failures are only logged."""
+        try:
+            self._flight.do("price-list", self.refresh)
+        except (OSError, http.client.HTTPException, PriceListError) as e:
+            sys.stderr.write(f"  [PriceList] Refresh failed: {e}\n")
+
+    def refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run() -> None:
+            try:
+                self._refresh_shared()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="hub-price-list", daemon=True).start()
+
+    def start(self) -> None:
+        """Keep the copy fresh from a daemon thread, refreshing ahead of expiry.
+
+        Only the first call starts the thread; an instance nobody asks for a
+        price list never contacts the docs site.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._refresh_loop, name="hub-price-list",
+                         daemon=True).start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            due = self.ttl * random.uniform(1 - PRICE_LIST_JITTER, 1)
+            delay = self.fetched_at + due - time.time() if self.text else 0
+            if delay > 0:
+                time.sleep(delay)
+            fetched_at = self.fetched_at
+            self._refresh_shared()
+            if self.fetched_at == fetched_at:  # failed: back off, then retry
+                time.sleep(PRICE_LIST_RETRY_SECONDS
+                           * random.uniform(1, 1 + PRICE_LIST_JITTER))
+
+    def _load(self) -> None:
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"  [PriceList] Ignoring {self.path}: {e}\n")
+            return
+        if saved.get("url") == self.url and isinstance(saved.get("text"), str):
+            self.text = saved["text"]
+            self.source = saved.get("source", "")
+            self.fetched_at = float(saved.get("fetched_at", 0))
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({
+                "url": self.url, "fetched_at": self.fetched_at,
+                "source": self.source, "text": self.text,
+            }), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            sys.stderr.write(f"  [PriceList] Could not save {self.path}: {e}\n")
+
+    def stats(self) -> dict:
+        return {
+            "chars": len(self.text) if self.text is not None else 0,
+            "source": self.source,
+            "age_seconds": round(self.age()) if self.text is not None else None,
+            "refreshing": self._refreshing,
+            "persisted_to": str(self.path) if self.path is not None else None,
+        }
+
+
+class StaticAsset:
+    """One static file held in memory with its precompressed variants."""
+
+    __slots__ = ("etag", "mtime_ns", "size", "variants")
+
+    def __init__(self, data: bytes, mtime_ns: int) -> None:
+        self.etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+        self.mtime_ns = mtime_ns
+        self.size = len(data)
+        self.variants = {"identity": data, "gzip": gzip.compress(data, 9)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(data)
+
+
+class StaticAssetCache:
+    """Serves text assets from memory, compressed once instead of per request.
+
+    Each asset carries a content-hash ETag so unchanged files revalidate
+    with a 304. A file is re-read and recompressed when its mtime or size
+    changes, so editing the HTML during development still shows up on reload.
+    Only the shipped ``files`` are held, so whatever else sits under the
+    root cannot grow the cache.
+    """
+
+    def __init__(self, root: Path, files: tuple = STATIC_CACHED) -> None:
+        self.root = root
+        self._files = {(root / name).resolve() for name in files}
+        self._assets: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, rel_path: str) -> Optional[StaticAsset]:
+        """Return the asset for a request path, or None if not served here."""
+        path = (self.root / rel_path.lstrip("/")).resolve()
+        if path not in self._files:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if not path.is_file():
+            return None
+
+        asset = self._assets.get(path)
+        if (asset is not None and asset.mtime_ns == st.st_mtime_ns
+                and asset.size == st.st_size):
+            return asset
+        with self._lock:
+            asset = self._assets.get(path)
+            if (asset is None or asset.mtime_ns != st.st_mtime_ns
+                    or asset.size != st.st_size):
+                asset = StaticAsset(path.read_bytes(), st.st_mtime_ns)
+                self._assets[path] = asset
+        return asset
+
+
+class SplitBundle:
+    """The page served as a slim shell plus chunks loaded on first use.
+
+    Script regions between ``// @lazy <name>`` and ``// @end-lazy`` move
+    into ``/chunks/<name>.<hash>.js``. Functions in a chunk that the rest
+    of the page mentions are replaced by stubs that load the chunk and
+    call the real function (``callLazy()`` in the page). Deferred library
+    scripts tagged ``data-lazy="<name>"`` become dependencies of that
+    chunk. The translation table keeps English, which ``t()`` falls back
+    to, plus one locale per page variant; the other locales become
+    ``i18n-<lang>`` chunks.
+
+    A chunk whose top-level ``let``/``const`` bindings are read outside
+    it cannot move, since the shell would throw before it loads; it stays
+    inline and a warning is logged. Like ``StaticAssetCache``, the split
+    is redone when the HTML file changes. Chunks from earlier builds keep
+    being served, so an open tab can still load them.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.mtime_ns = -1
+        self.size = -1
+        self.pages: dict = {}     # locale -> StaticAsset
+        self.chunks: dict = {}    # "/chunks/<name>.<hash>.js" -> StaticAsset
+        self.manifest: dict = {}  # chunk name -> {"src", "deps"}
+        self.warnings: list = []
+        self.builds = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Re-split the page if the file changed since the last build."""
+        st = self.path.stat()
+        if st.st_mtime_ns == self.mtime_ns and st.st_size == self.size:
+            return
+        with self._lock:
+            if st.st_mtime_ns != self.mtime_ns or st.st_size != self.size:
+                try:
+                    self._build(self.path.read_text(encoding="utf-8"))
+                except ValueError as e:
+                    if not self.pages:
+                        raise
+                    sys.stderr.write(f"  [Split] Keeping the previous split: {e}\n")
+                self.mtime_ns, self.size = st.st_mtime_ns, st.st_size
+
+    def page(self, locales: list) -> StaticAsset:
+        """The page for the first of ``locales`` that has one, else English."""
+        self.refresh()
+        return next((self.pages[lang] for lang in locales if lang in self.pages),
+                    self.pages["en"])
+
+    def chunk(self, path: str) -> Optional[StaticAsset]:
+        self.refresh()
+        return self.chunks.get(path)
+
+    def _add_chunk(self, name: str, source: str, deps: list) -> None:
+        data = source.encode("utf-8")
+        src = f"{CHUNK_PREFIX}{name}.{hashlib.sha256(data).hexdigest()[:12]}.js"
+        self.chunks[src] = StaticAsset(data, 0)
+        self.manifest[name] = {"src": src, "deps": deps}
+
+    def _build(self, html: str) -> None:
+        regions: dict = {}  # name -> [(start, end, body)]
+        for start in LAZY_START_RE.finditer(html):
+            end = LAZY_END_RE.search(html, start.end())
+            if end is None:
+                raise ValueError(f"// @lazy {start.group(1)} has no // @end-lazy")
+            regions.setdefault(start.group(1), []).append(
+                (start.start(), end.end(), html[start.end():end.start()])
+            )
+        deps: dict = {}
+        for tag in LAZY_SCRIPT_RE.finditer(html):
+            deps.setdefault(tag.group(1), []).append(tag.group(2))
+
+        # Everything a chunk's top level declares, and who else mentions it.
+        bodies = {name: "".join(body for _, _, body in spans)
+                  for name, spans in regions.items()}
+        warnings, inline = [], set()
+        while True:
+            outside = {
+                name: self._identifiers(self._without(html, regions[name]))
+                for name in regions if name not in inline
+            }
+            unsafe = {
+                name: sorted(set(TOP_LEVEL_BINDING_RE.findall(bodies[name])) & seen)
+                for name, seen in outside.items()
+            }
+            unsafe = {name: names for name, names in unsafe.items() if names}
+            if not unsafe:
+                break
+            for name, names in unsafe.items():
+                warnings.append(f"{name} kept inline: the page reads {', '.join(names[:5])}")
+                inline.add(name)
+
+        self.manifest = {}
+        stubs: dict = {}
+        for name, seen in outside.items():
+            self._add_chunk(name, f"// {name}: loaded on first use (serve.py --split-modules)\n"
+                            + bodies[name], deps.get(name, []))
+            stubs[name] = "".join(
+                f"function {fn}() {{ return callLazy('{name}', '{fn}', this, arguments); }}\n"
+                for fn in dict.fromkeys(TOP_LEVEL_FUNCTION_RE.findall(bodies[name]))
+                if fn in seen
+            )
+
+        # Splice stubs over the regions (from the end, so offsets hold) and
+        # drop the library tags that now load with their chunk.
+        shell = html
+        spans = sorted(((start, end, name) for name, parts in regions.items()
+                        for start, end, _ in parts), reverse=True)
+        first = {name: parts[0][0] for name, parts in regions.items()}
+        for start, end, name in spans:
+            if name in inline:
+                continue
+            shell = shell[:start] + (stubs[name] if start == first[name] else "") + shell[end:]
+        shell = LAZY_SCRIPT_RE.sub(
+            lambda tag: "" if tag.group(1) in self.manifest else tag.group(0), shell
+        )
+
+        translations = TRANSLATIONS_RE.search(shell)
+        locales = {}
+        if translations is None:
+            warnings.append("no TRANSLATIONS table found; all locales stay inline")
+        else:
+            locales = {block.group(1): block.group(0)
+                       for block in LOCALE_BLOCK_RE.finditer(translations.group(1))}
+            for lang, block in locales.items():
+                if lang != "en":
+                    self._add_chunk(f"i18n-{lang}", f"TRANSLATIONS.{lang} = {{\n"
+                                    + block.split("\n", 1)[1].rstrip(",\n") + ";\n", [])
+
+        manifest = f"const HUB_CHUNKS = {json.dumps(self.manifest, indent=1)};"
+        shell = shell.replace("const HUB_CHUNKS = {};", manifest, 1)
+        self.pages = {}
+        for lang in locales or {"en": ""}:
+            page = shell
+            if translations is not None:
+                table = "".join(block for code, block in locales.items()
+                                if code in ("en", lang))
+                page = TRANSLATIONS_RE.sub(
+                    lambda _: f"const TRANSLATIONS = {{\n{table}}};\n", shell, count=1
+                )
+            self.pages[lang] = StaticAsset(page.encode("utf-8"), 0)
+        self.warnings = warnings
+        self.builds += 1
+
+    @staticmethod
+    def _without(html: str, spans: list) -> str:
+        """The page with one chunk's regions cut out."""
+        parts, pos = [], 0
+        for start, end, _ in spans:
+            parts.append(html[pos:start])
+            pos = end
+        parts.append(html[pos:])
+        return "".join(parts)
+
+    @staticmethod
+    def _identifiers(text: str) -> set:
+        return set(IDENTIFIER_RE.findall(text))
+
+    def stats(self) -> dict:
+        return {
+            "builds": self.builds,
+            "shell_bytes": self.pages["en"].size if self.pages else 0,
+            "chunks": len(self.manifest),
+            "chunk_bytes": sum(self.chunks[c["src"]].size for c in self.manifest.values()),
+            "warnings": len(self.warnings),
+        }
+
+
+class ProxyHandler(http.server.SimpleHTTPRequestHandler):
+    """HTTP handler that serves static files and proxies IONOS API calls."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive and chunked streaming
+    timeout = KEEPALIVE_TIMEOUT_SECONDS  # drop idle kept-alive connections
+    server_port: int = PORT  # set at runtime from main()
+    max_response_bytes: int = MAX_RESPONSE_BYTES
+    batch_concurrency: int = BATCH_CONCURRENCY
+    metrics: Metrics = Metrics()
+    upstream_pool: UpstreamPool = UpstreamPool(metrics=metrics)
+    response_cache: ResponseCache = ResponseCache()
+    inflight: SingleFlight = SingleFlight()
+    static_assets: StaticAssetCache = StaticAssetCache(SCRIPT_DIR)
+    flowlogs: FlowLogStores = FlowLogStores()
+    mcp_sessions: McpSessionPool = McpSessionPool(upstream_pool)
+    docs_search_cache: SearchCache = SearchCache()
+    price_list: PriceListCache = PriceListCache(upstream_pool)
+    telemetry_cache: TelemetryCache = TelemetryCache()
+    prefetch: Optional[PrefetchCrawler] = None  # set by --prefetch
+    billing_rollups: BillingRollupCache = BillingRollupCache()
+    compliance: ComplianceEngine = ComplianceEngine()
+    split_bundle: Optional[SplitBundle] = None  # set by --split-modules
+    watches: Counter = Counter()  # open /watch streams per token and contract
+    watches_lock = threading.Lock()
+    _revalidatable = False  # per request: static asset with an ETag
+    _route: Optional[str] = None  # per request: metrics label, once parsed
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=str(SCRIPT_DIR), **kwargs)
+
+    # ── Instrumentation ──────────────────────────────────────────────
+
+    def setup(self) -> None:
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def handle(self) -> None:
+        """Serve one request per turn.
+
+        The pool re-queues a kept-alive connection afterwards. The
+        single-threaded server (``--workers 0``) closes it instead, since
+        an idle browser connection would otherwise hold its only thread
+        until the keep-alive timeout.
+        """
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+        except Exception:
+            self.close_connection = True
+            raise
+        if not isinstance(self.server, PooledHTTPServer):
+            self.close_connection = True
+
+    def finish(self) -> None:
+        """Hand a kept-alive connection back to the server between requests."""
+        if (not self.close_connection and isinstance(self.server, PooledHTTPServer)
+                and self.server.park(self)):
+            return
+        super().finish()
+
+    def parse_request(self) -> bool:
+        """Start the per-request clock once the request line is known."""
+        if not super().parse_request():
+            return False
+        self._route = route_label(urllib.parse.urlsplit(self.path).path)
+        self._status = 0
+        self._started = time.monotonic()
+        self._bytes_before = self.wfile.bytes
+        self._upstream_timer = UpstreamTimer()
+        UpstreamTimer.bind(self._upstream_timer)
+        self.metrics.inc("hub_requests_in_flight", (("route", self._route),))
+        return True
+
+    def handle_one_request(self) -> None:
+        self._route = None
+        self._flowlog_key = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self._flowlog_key is not None:
+                self.flowlogs.release(self._flowlog_key)
+            if self._route is not None:
+                self._record_request()
+                UpstreamTimer.bind(None)
+
+    def _record_request(self) -> None:
+        route = (("route", self._route),)
+        metrics = self.metrics
+        metrics.inc("hub_requests_in_flight", route, -1)
+        metrics.inc("hub_requests_total", route + (
+            ("method", self.command or ""), ("status", str(self._status or 0)),
+        ))
+        metrics.observe("hub_request_duration_seconds", route,
+                        time.monotonic() - self._started)
+        metrics.inc("hub_response_bytes_total", route,
+                    self.wfile.bytes - self._bytes_before)
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code
+        if code == 413 and self._route is not None:
+            self.metrics.inc("hub_response_limit_exceeded_total",
+                             (("route", self._route),))
+        super().send_response(code, message)
+
+    def _server_timing(self) -> str:
+        """``Server-Timing`` value: upstream wait vs. time spent in the proxy."""
+        total = (time.monotonic() - self._started) * 1000
+        upstream = min(self._upstream_timer.elapsed() * 1000, total)
+        return (f'upstream;dur={upstream:.1f};desc="IONOS upstream", '
+                f'proxy;dur={total - upstream:.1f};desc="Proxy"')
+
+    # ── Routing ──────────────────────────────────────────────────────
+
+    def do_GET(self) -> None:
+        """Route GET requests to the proxy, health endpoint, or static files."""
+        parsed = urllib.parse.urlparse(self.path)
+        self._revalidatable = False
+
+        if parsed.path == "/proxy":
+            self._handle_proxy(parsed)
+        elif parsed.path == "/price-list":
+            self._handle_price_list()
+        elif parsed.path == "/health":
+            self._send_json_response(200, {"status": "ok"})
+        elif parsed.path == "/stats":
+            pooled = isinstance(self.server, PooledHTTPServer)
+            self._send_json_response(200, {
+                "server": self.server.stats() if pooled else None,
+                "upstream_pool": self.upstream_pool.stats(),
+                "upstream_hosts": self.upstream_pool.host_stats(),
+                "response_cache": self.response_cache.stats(),
+                "coalescing": self.inflight.stats(),
+                "mcp_sessions": self.mcp_sessions.stats(),
+                "docs_search_cache": self.docs_search_cache.stats(),
+                "price_list": self.price_list.stats(),
+                "telemetry_cache": self.telemetry_cache.stats(),
+                "billing_rollups": self.billing_rollups.stats(),
+                "prefetch": self.prefetch.stats() if self.prefetch else None,
+                "compliance": self.compliance.stats(),
+                "split_bundle": self.split_bundle.stats() if self.split_bundle else None,
+            })
+        elif parsed.path == "/metrics":
+            self._handle_metrics()
+        elif parsed.path.startswith("/api/flowlogs"):
+            self._handle_flowlogs_get(parsed)
+        elif parsed.path.startswith("/api/"):
+            self._route_api_get(parsed)
+        elif self.split_bundle and parsed.path in ("/", "", f"/{HTML_FILE}"):
+            self._serve_split_page()
+        elif self.split_bundle and parsed.path.startswith(CHUNK_PREFIX):
+            self._serve_chunk(parsed.path)
+        elif parsed.path in ("/", ""):
+            self._serve_static(f"/{HTML_FILE}")
+        else:
+            self._serve_static(urllib.parse.unquote(parsed.path))
+
+    def end_headers(self) -> None:
+        """Add no-cache headers for static files to prevent stale content.
+
+        Non-static responses also get a ``Server-Timing`` header.
+        """
+        if not self.path.startswith("/proxy") and not self._revalidatable:
+            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+            self.send_header("Pragma", "no-cache")
+            self.send_header("Expires", "0")
+        if self._route not in (None, "static"):
+            self.send_header("Server-Timing", self._server_timing())
+        if not isinstance(self.server, PooledHTTPServer):
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def do_POST(self) -> None:
+        """Route POST requests to the proxy or MCP docs endpoint."""
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == "/proxy":
+            self._handle_proxy(parsed, method="POST")
+        elif parsed.path == "/proxy/batch":
+            self._handle_proxy_batch()
+        elif parsed.path == "/api/telemetry/idle-scan":
+            self._handle_idle_scan()
+        elif parsed.path == "/api/prefetch":
+            self._handle_prefetch_register()
+        elif parsed.path == "/api/flowlogs":
+            self._handle_flowlog_upload(parsed)
+        elif parsed.path == "/api/flowlogs/attribute":
+            self._handle_flowlog_attribute()
+        elif parsed.path == "/mcp-docs":
+            self._handle_mcp_docs(self.MCP_DOCS_URL)
+        elif parsed.path == "/mcp-docs-support":
+            self._handle_mcp_docs(self.MCP_DOCS_SUPPORT_URL)
+        elif parsed.path == "/mcp-docs-tutorials":
+            self._handle_mcp_docs(self.MCP_DOCS_TUTORIALS_URL)
+        else:
+            self.close_connection = True  # request body was never read
+            self._send_json_error(501, f"Unsupported POST path: {parsed.path}")
+
+    def do_PUT(self) -> None:
+        """Forward a PUT through ``/proxy``."""
+        self._route_proxy_write("PUT")
+
+    def do_PATCH(self) -> None:
+        """Forward a PATCH through ``/proxy``."""
+        self._route_proxy_write("PATCH")
+
+    def _route_proxy_write(self, method: str) -> None:
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == "/proxy":
+            self._handle_proxy(parsed, method=method)
+        else:
+            self.close_connection = True  # request body was never read
+            self._send_json_error(501, f"Unsupported {method} path: {parsed.path}")
+
+    def do_DELETE(self) -> None:
+        """Proxy a DELETE, or drop one uploaded flow log file (``?name=``) or all."""
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == "/proxy":
+            self._handle_proxy(parsed, method="DELETE")
+            return
+        if parsed.path == "/api/prefetch":
+            self._handle_prefetch_unregister()
+            return
+        if parsed.path != "/api/flowlogs":
+            self._send_json_error(404, f"Unknown path: {parsed.path}")
+            return
+        store = self._flowlog_store()
+        if store is None:
+            return
+        name = urllib.parse.parse_qs(parsed.query).get("name", [""])[0]
+        if name:
+            if not store.remove(name):
+                self._send_json_error(404, f"No flow log file named {name!r}")
+                return
+        else:
+            store.clear()
+        self._send_json_response(200, self._flowlog_listing(store))
+
+    def do_OPTIONS(self) -> None:
+        """Handle CORS preflight requests."""
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self._add_cors_headers()
+        self.end_headers()
+
+    # ── Static files ─────────────────────────────────────────────────
+
+    def _serve_static(self, path: str) -> None:
+        """Serve a text asset from memory, compressed and ETag-validated."""
+        asset = self.static_assets.get(path)
+        if asset is None:
+            self.path = path
+            super().do_GET()
+            return
+        # Revalidate on every load, but unchanged files cost only a 304.
+        self._send_asset(asset, self.guess_type(path))
+
+    def _serve_split_page(self) -> None:
+        """The --split-modules shell, with the visitor's locale inlined.
+
+        The locale comes from the ``hub-locale`` cookie that ``setLocale()``
+        sets, else from ``Accept-Language``; English when neither matches.
+        """
+        cookie = re.search(r"(?:^|;\s*)hub-locale=(\w+)", self.headers.get("Cookie", ""))
+        wanted = [cookie.group(1)] if cookie else []
+        wanted += [part.split(";")[0].strip()[:2].lower()
+                   for part in self.headers.get("Accept-Language", "").split(",")]
+        self._send_asset(self.split_bundle.page(wanted), "text/html",
+                         vary="Accept-Encoding, Accept-Language, Cookie")
+
+    def _serve_chunk(self, path: str) -> None:
+        """A content-hashed chunk; its URL changes with its content."""
+        asset = self.split_bundle.chunk(path)
+        if asset is None:
+            self._send_json_error(404, f"Unknown chunk: {path}")
+            return
+        self._send_asset(asset, "text/javascript", cache_control=CHUNK_CACHE_CONTROL)
+
+    def _send_asset(self, asset: StaticAsset, content_type: str,
+                    cache_control: str = "no-cache",
+                    vary: str = "Accept-Encoding") -> None:
+        """Send an in-memory asset in the best encoding, or a 304."""
+        self._revalidatable = True
+        if asset.etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Vary", vary)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+
+        encoding = next(
+            (e for e in ("br", "gzip")
+             if e in asset.variants and self._client_accepts(e)),
+            "identity",
+        )
+        body = asset.variants[encoding]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", asset.etag)
+        self.send_header("Vary", vary)
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ── Proxy ────────────────────────────────────────────────────────
+
+    def _handle_proxy(self, parsed: urllib.parse.ParseResult, method: str = "GET") -> None:
+        """Forward a request to the IONOS API and relay the response."""
+        # Consume the body up front so an early rejection cannot leave it
+        # in the socket and corrupt the next request on a kept-alive connection.
+        post_data = None
+        if method != "GET":
+            content_length = int(self.headers.get("Content-Length", 0))
+            if content_length > 0:
+                post_data = self.rfile.read(content_length)
+
+        params = urllib.parse.parse_qs(parsed.query)
+        target_url = params.get("url", [""])[0].strip()
+
+        rejection = self._check_proxy_target(target_url)
+        if rejection:
+            self._send_json_error(*rejection)
+            return
+
+        # Read auth token from header (never from URL)
+        token = self.headers.get("X-Token", "")
+        contract = self.headers.get("X-Contract-Number", "")
+        if not token:
+            self._send_json_error(401, "Missing X-Token header")
+            return
+
+        priority = self._request_priority()
+        paginate = params.get("paginate", [""])[0].lower() in ("1", "true", "yes")
+        fields = [f.strip() for f in params.get("fields", [""])[0].split(",")
+                  if f.strip()]
+        if method == "GET" and (paginate or fields):
+            try:
+                page_size = int(params.get("pageSize", [PAGE_SIZE])[0])
+            except ValueError:
+                page_size = PAGE_SIZE
+            self._proxy_collection(
+                target_url, token, contract, paginate,
+                field_tree(fields), max(1, min(page_size, PAGE_SIZE_MAX)),
+                priority,
+            )
+            return
+
+        # Let upstream compress and pass the encoded bytes straight through.
+        encodings = [e for e in ("gzip", "deflate") if self._client_accepts(e)]
+        upstream_headers = self._upstream_headers(token, contract, ", ".join(encodings))
+
+        try:
+            if method != "GET" and self._wants_event_stream(post_data):
+                self._proxy_event_stream(method, target_url, upstream_headers, post_data)
+                return
+            if method != "GET":
+                outcome = self._proxy_upstream(
+                    method, target_url, upstream_headers, post_data,
+                    priority=priority,
+                )
+                if outcome.result is None or outcome.result.status < 400:
+                    # The write changed what later GETs of this API return.
+                    self.response_cache.invalidate(token, contract, target_url)
+                self._deliver(outcome)
+                return
+
+            key = ResponseCache.make_key(token, contract, target_url)
+            if self.response_cache.ttl_for(target_url):
+                self._proxy_cached_get(key, target_url, upstream_headers, priority)
+                return
+
+            # Uncacheable GETs (telemetry) can still share an in-flight call.
+            outcome, shared = self.inflight.do(
+                key,
+                lambda: self._proxy_upstream("GET", target_url, upstream_headers,
+                                             priority=priority),
+            )
+            if shared and outcome.result is None:
+                outcome = self._proxy_upstream("GET", target_url, upstream_headers,
+                                               priority=priority)
+            self._deliver(outcome)
+        except socket.timeout:
+            self._send_json_error(504, "API request timed out")
+        except (OSError, http.client.HTTPException) as e:
+            self._send_json_error(502, f"Could not reach IONOS API: {e}")
+
+    @staticmethod
+    def _check_proxy_target(target_url: str):
+        """Return ``(status, message)`` if the URL may not be proxied, else None."""
+        if not target_url:
+            return 400, "Missing 'url' query parameter"
+
+        # Validate URL scheme (prevent file://, gopher://, etc.)
+        try:
+            target_parsed = urllib.parse.urlparse(target_url)
+            target_parsed.port  # raises for a non-numeric or out-of-range port
+        except ValueError as e:
+            return 400, f"Invalid URL: {e}"
+        if target_parsed.scheme not in ("http", "https"):
+            return 400, "Only HTTP/HTTPS URLs are allowed"
+
+        # Validate the target is an IONOS API endpoint
+        target_host = (target_parsed.hostname or "").lower()
+        allowed_hosts = ["api.ionos.com"]
+        is_allowed = any(
+            target_host == h or target_host.endswith(f".{h}")
+            for h in allowed_hosts
+        )
+        is_ionos_regional = target_host.endswith(".ionos.com")
+
+        if not (is_allowed or is_ionos_regional):
+            return 403, f"Proxy blocked: {target_host} is not an IONOS endpoint"
+        return None
+
+    def _wants_revalidation(self) -> bool:
+        """True when the client sent ``Cache-Control: no-cache`` (a forced refresh)."""
+        return "no-cache" in self.headers.get("Cache-Control", "").lower()
+
+    def _request_priority(self) -> int:
+        """Upstream priority lane from the RFC 9218 ``Priority`` header.
+
+        Urgency ``u=0``..``u=3`` (3 is the default) is interactive; the
+        frontend sends ``u=5`` for prefetches and other background work.
+        """
+        for param in self.headers.get("Priority", "").split(","):
+            name, _, value = param.strip().partition("=")
+            if name == "u" and value.isdigit():
+                return PRIORITY_BACKGROUND if int(value) > 3 else PRIORITY_INTERACTIVE
+        return PRIORITY_INTERACTIVE
+
+    @staticmethod
+    def _upstream_headers(token: str, contract: str,
+                          accept_encoding: str = "") -> dict:
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+        }
+        if contract:
+            headers["X-Contract-Number"] = contract
+        if accept_encoding:
+            headers["Accept-Encoding"] = accept_encoding
+        return headers
+
+    @classmethod
+    def fetch_json(cls, url: str, token: str, contract: str,
+                   priority: int = PRIORITY_INTERACTIVE,
+                   revalidate: bool = False,
+                   timer: Optional[UpstreamTimer] = None) -> dict:
+        """GET an upstream URL for server-side use: cached, coalesced, parsed.
+
+        Shares the response cache and in-flight calls with ``/proxy``.
+        With ``revalidate`` a cached copy is always checked upstream
+        (conditionally, so an unchanged one costs a 304). Returns
+        ``{"url", "status", "body", "error", "cache", "ms"}`` and never
+        raises for upstream failures. URLs off the IONOS allow-list are
+        refused exactly as ``/proxy`` would refuse them. Pass the handler's
+        ``timer`` when calling from an executor thread so the upstream
+        time still counts toward the request's ``Server-Timing``.
+        """
+        if timer is not None and timer is not UpstreamTimer.current():
+            previous = UpstreamTimer.bind(timer)
+            try:
+                return cls.fetch_json(url, token, contract, priority, revalidate)
+            finally:
+                UpstreamTimer.bind(previous)
+        started = time.monotonic()
+        call = {"url": url, "status": 0, "body": None, "error": None, "cache": None}
+        rejected = cls._check_proxy_target(url)
+        if rejected:
+            call.update(status=rejected[0], error=rejected[1], ms=0.0)
+            return call
+        headers = cls._upstream_headers(token, contract, "gzip")
+        cache = cls.response_cache
+        key = cache.make_key(token, contract, url)
+        try:
+            if cache.ttl_for(url):
+                entry, state = cache.lookup(key)
+                if revalidate:
+                    state = "expired"
+                if entry is not None and state == "stale":
+                    if cache.claim_revalidation(entry):
+                        cache.refresh_in_background(
+                            cls.upstream_pool, key, url, headers, entry,
+                            cls.max_response_bytes,
+                        )
+                if entry is not None and state in ("fresh", "stale"):
+                    call["cache"] = "HIT" if state == "fresh" else "STALE"
+                    outcome = ProxyOutcome(None, entry)
+                else:
+                    outcome, shared = cls.inflight.do(
+                        key,
+                        lambda: ProxyOutcome(*cache.refresh(
+                            cls.upstream_pool, key, url, headers, entry,
+                            priority, cls.max_response_bytes,
+                        )),
+                    )
+                    call["cache"] = "COALESCED" if shared else "MISS"
+            else:
+                outcome, shared = cls.inflight.do(
+                    key,
+                    lambda: ProxyOutcome(fetch_upstream(
+                        cls.upstream_pool, "GET", url, headers,
+                        limit=cls.max_response_bytes, priority=priority,
+                    )),
+                )
+                call["cache"] = "COALESCED" if shared else "BYPASS"
+            if outcome.entry is None and outcome.result is None:
+                # The coalesced leader streamed a huge body; fetch our own copy.
+                outcome = ProxyOutcome(fetch_upstream(
+                    cls.upstream_pool, "GET", url, headers,
+                    limit=cls.max_response_bytes, priority=priority,
+                ))
+        except socket.timeout:
+            call.update(status=504, error="API request timed out")
+        except (OSError, http.client.HTTPException) as e:
+            call.update(status=502, error=f"Could not reach IONOS API: {e}")
+        else:
+            if outcome.entry is not None:
+                status, body = 200, outcome.entry.body
+                encoding = outcome.entry.content_encoding
+            else:
+                status, body = outcome.result.status, outcome.result.body
+                encoding = outcome.result.headers.get("Content-Encoding", "")
+            call["status"] = status
+            text = decode_body(body, encoding).decode("utf-8", errors="replace")
+            if outcome.entry is None and outcome.result.oversized:
+                call.update(status=413, error=(
+                    f"Response exceeds "
+                    f"{cls.max_response_bytes // (1024*1024)} MB limit"
+                ))
+            elif status >= 400:
+                call["error"] = f"IONOS API returned {status}: {text[:500]}"
+            else:
+                try:
+                    call["body"] = json.loads(text) if text.strip() else None
+                except ValueError:
+                    call["error"] = "Upstream returned invalid JSON"
+        call["ms"] = round((time.monotonic() - started) * 1000, 1)
+        return call
+
+    def _handle_proxy_batch(self) -> None:
+        """Fan a list of GETs out upstream and stream results back as NDJSON.
+
+        Body: ``{"requests": [{"id": "...", "url": "..."}, ...],
+        "concurrency": 8}`` (bare URL strings are accepted too). Each
+        result is written as one JSON line as soon as it completes, in
+        completion order, tagged with the caller's ``id``.
+        """
+        content_length = int(self.headers.get("Content-Length", 0))
+        if content_length > 1024 * 1024:
+            self.close_connection = True
+            self._send_json_error(413, "Request body too large")
+            return
+        raw = self.rfile.read(content_length) if content_length else b""
+
+        token = self.headers.get("X-Token", "")
+        contract = self.headers.get("X-Contract-Number", "")
+        if not token:
+            self._send_json_error(401, "Missing X-Token header")
+            return
+        try:
+            payload = json.loads(raw or b"{}")
+            items = payload.get("requests", [])
+            concurrency = int(payload.get("concurrency", self.batch_concurrency))
+        except (ValueError, TypeError, AttributeError):
+            self._send_json_error(400, "Body must be a JSON object with 'requests'")
+            return
+        if not isinstance(items, list) or not items:
+            self._send_json_error(400, "'requests' must be a non-empty list")
+            return
+        if len(items) > BATCH_MAX_REQUESTS:
+            self._send_json_error(
+                400, f"At most {BATCH_MAX_REQUESTS} requests per batch"
+            )
+            return
+        concurrency = max(1, min(concurrency, self.batch_concurrency))
+        priority = self._request_priority()
+        revalidate = self._wants_revalidation()
+
+        # Check every item before the stream starts; a bad one becomes its
+        # own error record instead of failing the batch.
+        calls = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {"url": item}
+            if not isinstance(item, dict):
+                item = {}
+            url = str(item.get("url", "")).strip()
+            calls.append((item.get("id", index), url, self._check_proxy_target(url)))
+
+        chunked = self._start_stream(200, "application/x-ndjson")
+        executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="hub-batch"
+        )
+        try:
+            futures = {}
+            for call_id, url, rejection in calls:
+                if rejection:
+                    status, error = rejection
+                    self._write_ndjson(
+                        {"id": call_id, "url": url, "status": status,
+                         "body": None, "error": error},
+                        chunked,
+                    )
+                    continue
+                future = executor.submit(
+                    self.fetch_json, url, token, contract, priority, revalidate,
+                    self._upstream_timer,
+                )
+                futures[future] = call_id
+            for future in as_completed(futures):
+                self._write_ndjson({"id": futures[future], **future.result()}, chunked)
+            self._end_stream(chunked)
+        except OSError:
+            # Browser navigated away; don't start calls nobody will read.
+            self.close_connection = True
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _write_ndjson(self, record: dict, chunked: bool) -> None:
+        self._write_chunk(json.dumps(record).encode() + b"\n", chunked)
+
+    def _proxy_collection(self, target_url: str, token: str, contract: str,
+                          paginate: bool, fields: dict, page_size: int,
+                          priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Serve a GET with server-side pagination and/or field projection.
+
+        With ``paginate`` the upstream collection is walked with
+        ``limit``/``offset``: after the first page, the next pages are
+        requested concurrently and their items are streamed out in order
+        as one merged collection. ``fields`` drops everything except the
+        listed dotted paths from each item (or from a non-collection body).
+        The closing object reports ``itemCount`` and ``pages``, plus
+        ``incomplete`` and ``error`` when a later page failed.
+        """
+        if paginate:
+            offset = int(dict(urllib.parse.parse_qsl(
+                urllib.parse.urlsplit(target_url).query
+            )).get("offset", 0) or 0)
+            first_url = with_query(target_url, offset=offset, limit=page_size)
+        else:
+            first_url = target_url
+        revalidate = self._wants_revalidation()
+        first = self.fetch_json(first_url, token, contract, priority, revalidate)
+        if first["error"]:
+            status = first["status"] or 502
+            self._send_json_response(status, {"error": first["error"]})
+            return
+        body = first["body"]
+        is_collection = isinstance(body, dict) and isinstance(body.get("items"), list)
+        if not paginate or not is_collection:
+            if is_collection:
+                body = {**body, "items": project(body["items"], fields)}
+            else:
+                body = project(body, fields)
+            self._send_json_response(first["status"], body)
+            return
+
+        limit = body.get("limit") or page_size
+        total = body.get("total")
+        # Offset just past the last item, when the API reports a total.
+        end = offset + total if isinstance(total, int) else None
+
+        def is_last(page: dict) -> bool:
+            return (len(page.get("items", [])) < limit
+                    or not (page.get("_links") or {}).get("next"))
+
+        chunked = self._start_stream(200, "application/json")
+        header = {k: v for k, v in body.items()
+                  if k not in ("items", "_links", "offset", "limit")}
+        items_written = 0
+        pages = 1
+        error = None
+
+        def write_items(page: dict) -> None:
+            nonlocal items_written
+            items = [json.dumps(project(item, fields))
+                     for item in page.get("items", [])]
+            if items:
+                prefix = "," if items_written else ""
+                self._write_chunk((prefix + ",".join(items)).encode(), chunked)
+                items_written += len(items)
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.batch_concurrency, thread_name_prefix="hub-pages"
+        )
+        try:
+            opening = json.dumps(header)[:-1]
+            opening += (", " if header else "") + '"items": ['
+            self._write_chunk(opening.encode(), chunked)
+            write_items(body)
+            if not is_last(body):
+                # Keep a few pages in flight. Without a total the walk only
+                # ends at the first short page, and every page requested
+                # past it is a wasted upstream call, so the window is small.
+                pending = deque()
+                next_offset = offset + limit
+                window = min(PAGE_WINDOW, self.batch_concurrency)
+                while True:
+                    while len(pending) < window and (end is None or next_offset < end):
+                        page_url = with_query(target_url, offset=next_offset,
+                                              limit=limit)
+                        pending.append(executor.submit(
+                            self.fetch_json, page_url, token, contract, priority,
+                            revalidate, self._upstream_timer,
+                        ))
+                        next_offset += limit
+                    if not pending:
+                        break
+                    page = pending.popleft().result()
+                    if page["error"]:
+                        error = page["error"]
+                        break
+                    pages += 1
+                    write_items(page["body"] or {})
+                    if is_last(page["body"] or {}):
+                        break
+            tail = {"offset": offset, "itemCount": items_written, "pages": pages}
+            if error:
+                tail.update(incomplete=True, error=error)
+            self._write_chunk(("], " + json.dumps(tail)[1:]).encode(), chunked)
+            self._end_stream(chunked)
+        except OSError:
+            self.close_connection = True
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _proxy_cached_get(self, key: str, target_url: str,
+                          upstream_headers: dict,
+                          priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Serve a GET from the response cache, refreshing it as needed."""
+        cache = self.response_cache
+        entry, state = cache.lookup(key)
+        bypass = self._wants_revalidation()
+
+        if entry is not None and not bypass:
+            if state == "fresh":
+                self._send_cache_entry(entry, "HIT")
+                return
+            if state == "stale":
+                if cache.claim_revalidation(entry):
+                    cache.refresh_in_background(
+                        self.upstream_pool, key, target_url,
+                        upstream_headers, entry, self.max_response_bytes,
+                    )
+                self._send_cache_entry(entry, "STALE")
+                return
+
+        outcome, shared = self.inflight.do(
+            key,
+            lambda: self._proxy_upstream(
+                "GET", target_url, upstream_headers,
+                cache_key=key, previous=entry, priority=priority,
+            ),
+        )
+        if shared and outcome.result is None:
+            # The leader streamed a response too big to share; fetch our own.
+            outcome = self._proxy_upstream("GET", target_url, upstream_headers,
+                                           priority=priority)
+        if outcome.entry is not None and not (outcome.delivered and not shared):
+            if shared:
+                state = "COALESCED"
+            elif outcome.result.status == 304:
+                state = "REVALIDATED"
+            else:
+                state = "MISS"
+            self._send_cache_entry(outcome.entry, state)
+            return
+        self._deliver(outcome, shared)
+
+    def _proxy_upstream(self, method: str, url: str, headers: dict,
+                        body: Optional[bytes] = None,
+                        cache_key: Optional[str] = None,
+                        previous: Optional[CacheEntry] = None,
+                        priority: int = PRIORITY_INTERACTIVE) -> ProxyOutcome:
+        """Call upstream; buffer small responses and stream large ones.
+
+        Responses up to BUFFER_THRESHOLD_BYTES are returned buffered so they
+        can be cached and shared with coalesced callers. Anything larger is
+        streamed to this client as it arrives, with the byte limit enforced
+        on the fly.
+        """
+        cache = self.response_cache
+        limit = self.max_response_bytes
+        headers = {**headers, **cache.conditional_headers(previous)}
+        try:
+            resp = self.upstream_pool.request(method, url, headers=headers,
+                                              body=body, priority=priority)
+        finally:
+            if previous is not None:
+                previous.revalidating = False
+
+        with resp:
+            if resp.status == 304 and previous is not None:
+                cache.mark_revalidated(previous)
+                return ProxyOutcome(
+                    UpstreamResult(304, resp.headers, b""), previous
+                )
+            length = resp.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > limit:
+                return ProxyOutcome(
+                    UpstreamResult(resp.status, resp.headers, b"", True)
+                )
+
+            threshold = min(BUFFER_THRESHOLD_BYTES, limit)
+            prefix = resp.read(threshold + 1)
+            if len(prefix) <= threshold or resp.status >= 400:
+                result = UpstreamResult(resp.status, resp.headers, prefix[:threshold])
+                entry = cache.store_result(cache_key, url, result) if cache_key else None
+                return ProxyOutcome(result, entry)
+
+            capture = cache.max_entry_bytes if cache_key and resp.status == 200 else 0
+            captured = self._stream_response(resp, prefix, limit, capture)
+
+        if captured is None:
+            return ProxyOutcome(None, delivered=True)
+        result = UpstreamResult(resp.status, resp.headers, captured)
+        return ProxyOutcome(
+            result, cache.store_result(cache_key, url, result), delivered=True
+        )
+
+    @staticmethod
+    def _wants_event_stream(body: Optional[bytes]) -> bool:
+        """True for a JSON request body asking for ``"stream": true``."""
+        if not body or b'"stream"' not in body:
+            return False
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return False
+        return isinstance(payload, dict) and payload.get("stream") is True
+
+    def _proxy_event_stream(self, method: str, url: str, headers: dict,
+                            body: bytes) -> None:
+        """Relay a streamed (server-sent events) response as it is produced.
+
+        Used for ``"stream": true`` requests such as AI chat completions:
+        every upstream read is written and flushed at once, uncompressed,
+        so tokens reach the browser as the model emits them. If the
+        browser goes away the upstream connection is dropped instead of
+        drained, which cancels the generation.
+        """
+        headers = {k: v for k, v in headers.items() if k != "Accept-Encoding"}
+        headers["Accept"] = "text/event-stream"
+        started = time.monotonic()
+        with self.upstream_pool.request(method, url, headers=headers,
+                                        body=body) as resp:
+            content_type = resp.headers.get("Content-Type", "")
+            if resp.status >= 400 or "text/event-stream" not in content_type:
+                limit = self.max_response_bytes
+                data = resp.read(limit + 1)
+                self._relay_upstream_result(UpstreamResult(
+                    resp.status, resp.headers, data[:limit], len(data) > limit
+                ))
+                return
+            first = resp.read1(STREAM_CHUNK_BYTES)
+            sys.stderr.write(
+                f"  [Proxy] Event stream: first bytes after "
+                f"{(time.monotonic() - started) * 1000:.0f} ms\n"
+            )
+            self._stream_response(resp, first, self.max_response_bytes)
+
+    def _stream_response(self, resp: PooledResponse, prefix: bytes,
+                         limit: int, capture: int = 0) -> Optional[bytes]:
+        """Relay an upstream body to the client in chunks as it arrives.
+
+        Up to ``capture`` bytes are also kept so the response can be cached;
+        returns them if the whole body fit, else None. If the body grows
+        past ``limit`` the connection is cut, since the status line is gone.
+        """
+        extra = {}
+        if resp.headers.get("Content-Encoding"):
+            extra["Content-Encoding"] = resp.headers["Content-Encoding"]
+        chunked = self._start_stream(
+            resp.status, resp.headers.get("Content-Type", "application/json"),
+            extra,
+        )
+
+        captured: Optional[list] = [] if capture else None
+        total = 0
+        chunk = prefix
+        try:
+            while chunk:
+                total += len(chunk)
+                if total > limit:
+                    sys.stderr.write(
+                        f"  [Proxy] Aborted stream after {total} bytes: "
+                        f"exceeds {limit // (1024*1024)} MB limit\n"
+                    )
+                    self.close_connection = True
+                    self.metrics.inc("hub_response_limit_exceeded_total",
+                                     (("route", self._route or ""),))
+                    return None
+                if captured is not None:
+                    captured = captured if total <= capture else None
+                    if captured is not None:
+                        captured.append(chunk)
+                self._write_chunk(chunk, chunked)
+                chunk = resp.read1(STREAM_CHUNK_BYTES)
+            self._end_stream(chunked)
+        except (OSError, http.client.HTTPException) as e:
+            # Either side went away mid-body; nothing sensible left to send.
+            sys.stderr.write(f"  [Proxy] Stream interrupted: {e}\n")
+            self.close_connection = True
+            return None
+        return b"".join(captured) if captured is not None else None
+
+    def _start_stream(self, status: int, content_type: str,
+                      extra_headers: Optional[dict] = None) -> bool:
+        """Send headers for a body of unknown length; True if chunked.
+
+        HTTP/1.0 clients can't do chunked encoding, so for them the body
+        is simply terminated by closing the connection.
+        """
+        chunked = self.request_version != "HTTP/1.0"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.close_connection = True
+        self._add_cors_headers()
+        self.end_headers()
+        return chunked
+
+    def _start_event_stream(self) -> Optional[bool]:
+        """``_start_stream`` for server-sent events, which may stay open for long.
+
+        The stream moves off the worker pool so it does not hold a worker
+        for its whole life. Returns None after a 503 when too many streams
+        are open already, or when there is no pool (``--workers 0``): there
+        the stream would hold the server's only thread.
+        """
+        if not isinstance(self.server, PooledHTTPServer):
+            self._send_json_error(503, "Event streams need the worker pool (--workers > 0)")
+            return None
+        if not self.server.detach_worker():
+            self._send_json_error(503, "Too many open event streams; try again later")
+            return None
+        return self._start_stream(200, "text/event-stream")
+
+    def _write_chunk(self, data: bytes, chunked: bool) -> None:
+        if chunked:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        else:
+            self.wfile.write(data)
+        self.wfile.flush()
+
+    def _end_stream(self, chunked: bool) -> None:
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _deliver(self, outcome: ProxyOutcome, shared: bool = False) -> None:
+        """Send a buffered outcome unless it was already streamed to us."""
+        if outcome.delivered and not shared:
+            return
+        self._relay_upstream_result(outcome.result)
+
+    def _send_cache_entry(self, entry: CacheEntry, state: str) -> None:
+        body, encoding = self._encode_for_client(entry.body, entry.content_encoding)
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Cache", state)
+        self.send_header("Age", str(int(entry.age())))
+        self._add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _relay_upstream_result(self, result: UpstreamResult) -> None:
+        """Relay a buffered upstream response, mapping errors to JSON."""
+        encoding = result.headers.get("Content-Encoding", "")
+        if result.status >= 400:
+            error_body = decode_body(result.body[:2048], encoding)
+            error_body = error_body.decode("utf-8", errors="replace")
+            self._send_json_response(result.status, {
+                "error": f"IONOS API returned {result.status}",
+                "detail": error_body[:500],
+            })
+            return
+        if result.oversized:
+            self._send_json_error(
+                413, f"Response exceeds {self.max_response_bytes // (1024*1024)} MB limit"
+            )
+            return
+        body, encoding = self._encode_for_client(result.body, encoding)
+        self.send_response(result.status)
+        content_type = result.headers.get("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self._add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _client_accepts(self, encoding: str) -> bool:
+        accepted = self.headers.get("Accept-Encoding", "").lower()
+        return any(
+            part.split(";")[0].strip() == encoding
+            and not part.replace(" ", "").endswith(";q=0")
+            for part in accepted.split(",")
+        )
+
+    def _encode_for_client(self, body: bytes, encoding: str):
+        """Pass encoded bodies through, decoding only if the client can't."""
+        if encoding and not self._client_accepts(encoding.strip().lower()):
+            return decode_body(body, encoding), ""
+        return body, encoding
+
+    # ── Server-side API ──────────────────────────────────────────────
+
+    VDC_SNAPSHOT_ROUTE = re.compile(r"^/api/vdc/([\w-]+)/snapshot$")
+    VDC_WATCH_ROUTE = re.compile(r"^/api/vdc/([\w-]+)/watch$")
+    VDC_COMPLIANCE_ROUTE = re.compile(r"^/api/vdc/([\w-]+)/compliance$")
+    LOCATION_SNAPSHOT_ROUTE = re.compile(r"^/api/location/([a-z]{2}/[a-z]+(?:/\d+)?)/snapshot$")
+    TELEMETRY_NETWORK_ROUTE = re.compile(r"^/api/telemetry/server/([0-9a-fA-F-]{36})/network$")
+
+    def _route_api_get(self, parsed: urllib.parse.ParseResult) -> None:
+        """Dispatch ``/api/...`` GETs, which run upstream work on the server."""
+        token = self.headers.get("X-Token", "")
+        contract = self.headers.get("X-Contract-Number", "")
+        if not token:
+            self._send_json_error(401, "Missing X-Token header")
+            return
+        params = urllib.parse.parse_qs(parsed.query)
+        priority = self._request_priority()
+        # ``Cache-Control: no-cache`` checks every cached listing upstream,
+        # e.g. when the page re-scores a VDC after a live change.
+        revalidate = self._wants_revalidation()
+
+        def fetch(url: str) -> dict:
+            return self.fetch_json(url, token, contract, priority, revalidate,
+                                   self._upstream_timer)
+
+        if parsed.path == "/api/billing/rollup":
+            self._handle_billing_rollup(params, fetch, token, contract)
+            return
+        if parsed.path == "/api/compliance":
+            self._handle_compliance_all(fetch, token, contract)
+            return
+        match = self.VDC_COMPLIANCE_ROUTE.match(parsed.path)
+        if match:
+            location = params.get("location", [""])[0]
+            if location and not LOCATION_RE.match(location):
+                self._send_json_error(400, "Invalid 'location' parameter")
+                return
+            report = self._vdc_compliance(
+                fetch, token, contract, match.group(1), location,
+                self._billed_transfer_out(fetch, token, contract),
+            )
+            if report.get("error"):
+                self._send_json_error(report["status"] or 502, report["error"])
+                return
+            self._send_json_response(200, report)
+            return
+        match = self.VDC_SNAPSHOT_ROUTE.match(parsed.path)
+        if match:
+            location = params.get("location", [""])[0]
+            if location and not LOCATION_RE.match(location):
+                self._send_json_error(400, "Invalid 'location' parameter")
+                return
+            self._send_json_response(200, build_vdc_snapshot(
+                fetch, match.group(1), location, self.batch_concurrency
+            ))
+            return
+        match = self.LOCATION_SNAPSHOT_ROUTE.match(parsed.path)
+        if match:
+            self._send_json_response(200, build_location_snapshot(
+                fetch, match.group(1), self.batch_concurrency
+            ))
+            return
+        match = self.VDC_WATCH_ROUTE.match(parsed.path)
+        if match:
+            try:
+                interval = float(params.get("interval", [WATCH_INTERVAL_SECONDS])[0])
+            except ValueError:
+                interval = WATCH_INTERVAL_SECONDS
+            self._handle_vdc_watch(
+                match.group(1), token, contract,
+                min(max(interval, WATCH_INTERVAL_MIN), WATCH_INTERVAL_MAX),
+            )
+            return
+        match = self.TELEMETRY_NETWORK_ROUTE.match(parsed.path)
+        if match:
+            try:
+                window = int(params.get("minutes", ["60"])[0]) * 60
+                step = int(params.get("step", ["60"])[0])
+            except ValueError:
+                self._send_json_error(400, "minutes and step must be integers")
+                return
+            uuid = match.group(1).lower()
+            self._send_json_response(200, self.telemetry_cache.query(
+                fetch, ResponseCache.make_key(token, contract, "telemetry"),
+                {name: f'irate({metric}{{uuid="{uuid}"}}[4m])'
+                 for name, metric in NETWORK_METRICS},
+                min(max(step, 15), 3600),
+                min(max(window, 300), TELEMETRY_MAX_WINDOW),
+            ))
+            return
+        self._send_json_error(404, f"Unknown API path: {parsed.path}")
+
+    def _handle_billing_rollup(self, params: dict, fetch, token: str,
+                               contract: str) -> None:
+        """Serve a slice of the contract's per-VDC/per-server daily traffic.
+
+        Both billing payloads are fetched once per contract and period and
+        folded into a ``BillingRollup``; ``from``/``to`` (``YYYY-MM-DD``),
+        ``vdc``, ``server``, ``top`` and ``daily=0`` pick what is returned.
+        """
+        if not contract:
+            self._send_json_error(400, "Missing X-Contract-Number header")
+            return
+        period = params.get("period", [""])[0]
+        if period and not re.fullmatch(r"\d{4}-\d{2}", period):
+            self._send_json_error(400, "period must be YYYY-MM")
+            return
+        try:
+            top = int(params.get("top", ["0"])[0])
+        except ValueError:
+            self._send_json_error(400, "top must be an integer")
+            return
+        rollup, state = self._billing_rollup(fetch, token, contract, period)
+        period = period or time.strftime("%Y-%m", time.gmtime())
+        if rollup.errors and not rollup.vdcs and not rollup.servers:
+            error = rollup.errors[0]
+            self._send_json_error(error.get("status") or 502, error["error"])
+            return
+        self._send_json_response(200, {
+            "period": period,
+            **rollup.query(
+                params.get("from", [""])[0], params.get("to", [""])[0],
+                params.get("vdc", [""])[0], params.get("server", [""])[0],
+                top, params.get("daily", ["1"])[0] not in ("0", "false", "no"),
+            ),
+            "cache": state, "ageSeconds": round(time.time() - rollup.built_at),
+            "errors": rollup.errors,
+        })
 
-    def do_GET(self) -> None:
-        """Route GET requests to the proxy, health endpoint, or static files."""
-        parsed = urllib.parse.urlparse(self.path)
+    def _billing_rollup(self, fetch, token: str, contract: str,
+                        period: str = "") -> tuple:
+        """The contract's ``BillingRollup`` for a period, and its cache state."""
+        base = f"{BILLING_API}/{urllib.parse.quote(contract, safe='')}"
+        suffix = f"&period={period}" if period else ""
 
-        if parsed.path == "/proxy":
-            self._handle_proxy(parsed)
-        elif parsed.path == "/price-list":
-            self._handle_price_list()
-        elif parsed.path == "/health":
-            self._send_json_response(200, {"status": "ok"})
-        elif parsed.path in ("/", ""):
-            self.path = f"/{HTML_FILE}"
-            super().do_GET()
-        else:
-            super().do_GET()
+        def build() -> BillingRollup:
+            graph = FetchGraph(fetch, 2)
+            graph.fetch("traffic", f"{base}/traffic/?output=all{suffix}")
+            graph.fetch("utilization", f"{base}/utilization?type=traffic{suffix}")
+            graph.wait()
+            return BillingRollup(graph.results.get("traffic"),
+                                 graph.results.get("utilization"), graph.errors)
 
-    def end_headers(self) -> None:
-        """Add no-cache headers for static files to prevent stale content."""
-        if not self.path.startswith("/proxy"):
-            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-            self.send_header("Pragma", "no-cache")
-            self.send_header("Expires", "0")
-        super().end_headers()
+        period = period or time.strftime("%Y-%m", time.gmtime())
+        return self.billing_rollups.get(
+            ResponseCache.make_key(token, contract, f"billing-rollup:{period}"), build
+        )
 
-    def do_POST(self) -> None:
-        """Route POST requests to the proxy or MCP docs endpoint."""
-        parsed = urllib.parse.urlparse(self.path)
-        if parsed.path == "/proxy":
-            self._handle_proxy(parsed, method="POST")
-        elif parsed.path == "/mcp-docs":
-            self._handle_mcp_docs(self.MCP_DOCS_URL)
-        elif parsed.path == "/mcp-docs-support":
-            self._handle_mcp_docs(self.MCP_DOCS_SUPPORT_URL)
-        elif parsed.path == "/mcp-docs-tutorials":
-            self._handle_mcp_docs(self.MCP_DOCS_TUTORIALS_URL)
-        else:
-            self._send_json_error(501, f"Unsupported POST path: {parsed.path}")
+    def _billed_transfer_out(self, fetch, token: str, contract: str) -> Optional[dict]:
+        """Outbound GB per server this month, for CST-02; None without billing."""
+        if not contract:
+            return None
+        rollup, _ = self._billing_rollup(fetch, token, contract)
+        if not rollup.servers:
+            return None
+        return {server_id: round(sum(out), 3)
+                for server_id, (_, _, out) in rollup.servers.items()}
 
-    def do_OPTIONS(self) -> None:
-        """Handle CORS preflight requests."""
-        self.send_response(200)
-        self._add_cors_headers()
-        self.end_headers()
+    def _vdc_compliance(self, fetch, token: str, contract: str, dc_id: str,
+                        location: str, transfer_out: Optional[dict]) -> dict:
+        """Snapshot one VDC and run the compliance rules over it.
 
-    # ── Proxy ────────────────────────────────────────────────────────
+        Returns the report, or ``{"error", "status"}`` when the VDC itself
+        could not be read or its location is not a valid IONOS location.
+        """
+        if location and not LOCATION_RE.match(location):
+            return {"id": dc_id, "error": "Invalid 'location' parameter", "status": 400}
+        snapshot = build_vdc_snapshot(fetch, dc_id, location, self.batch_concurrency)
+        if snapshot["datacenter"] is None:
+            error = next((e for e in snapshot["errors"] if e["name"] == "datacenter"),
+                         {"error": f"VDC {dc_id} not found", "status": 404})
+            return {"id": dc_id, "error": error["error"], "status": error["status"]}
+        started = time.monotonic()
+        report = self.compliance.evaluate(
+            ResponseCache.make_key(token, contract, f"compliance:{dc_id}"),
+            snapshot, transfer_out,
+        )
+        return {
+            "id": dc_id,
+            "name": (snapshot["datacenter"].get("properties") or {}).get("name", ""),
+            **report,
+            "complete": snapshot["complete"],
+            "errors": snapshot["errors"],
+            "fetchMs": snapshot["elapsedMs"],
+            "evaluateMs": round((time.monotonic() - started) * 1000, 2),
+        }
 
-    def _handle_proxy(self, parsed: urllib.parse.ParseResult, method: str = "GET") -> None:
-        """Forward a request to the IONOS API and relay the response."""
-        params = urllib.parse.parse_qs(parsed.query)
-        target_url = params.get("url", [""])[0].strip()
+    def _handle_compliance_all(self, fetch, token: str, contract: str) -> None:
+        """Audit every VDC of the contract, streamed as server-sent events.
 
-        if not target_url:
-            self._send_json_error(400, "Missing 'url' query parameter")
+        Sends ``start`` with the VDC count, one ``vdc`` event per report as
+        each VDC finishes (several are snapshotted at once), then ``done``
+        with the contract-wide score. Shared listings come from the
+        response cache, so only the per-VDC calls scale with the VDC count.
+        """
+        listing = fetch(f"{CLOUD_API}/datacenters?depth=1")
+        if listing["error"]:
+            self._send_json_error(listing["status"] or 502, listing["error"])
+            return
+        datacenters = [dc for dc in (listing["body"] or {}).get("items", []) if dc.get("id")]
+        transfer_out = self._billed_transfer_out(fetch, token, contract)
+        started = time.monotonic()
+        chunked = self._start_event_stream()
+        if chunked is None:
             return
+        executor = ThreadPoolExecutor(
+            max_workers=COMPLIANCE_VDC_CONCURRENCY, thread_name_prefix="hub-compliance"
+        )
+        try:
+            self._write_sse("start", {"total": len(datacenters)}, chunked)
+            futures = [
+                executor.submit(
+                    self._vdc_compliance, fetch, token, contract, dc["id"],
+                    (dc.get("properties") or {}).get("location", ""), transfer_out,
+                )
+                for dc in datacenters
+            ]
+            scores, failed = [], []
+            for future in as_completed(futures):
+                report = future.result()
+                if report.get("error"):
+                    failed.append(report["id"])
+                else:
+                    scores.append(report["overallScore"])
+                self._write_sse("vdc", report, chunked)
+            self._write_sse("done", {
+                "overallScore": round(statistics.fmean(scores)) if scores else None,
+                "audited": len(scores), "failed": sorted(failed),
+                "elapsedMs": round((time.monotonic() - started) * 1000, 1),
+            }, chunked)
+            self._end_stream(chunked)
+            sys.stderr.write(f"  [Compliance] {len(scores)} VDCs audited, "
+                             f"{len(failed)} failed\n")
+        except OSError:
+            self.close_connection = True
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        # Validate URL scheme (prevent file://, gopher://, etc.)
-        target_parsed = urllib.parse.urlparse(target_url)
-        if target_parsed.scheme not in ("http", "https"):
-            self._send_json_error(400, "Only HTTP/HTTPS URLs are allowed")
+    def _handle_vdc_watch(self, dc_id: str, token: str, contract: str,
+                          interval: float) -> None:
+        """Stream a VDC's changes as server-sent events until the client leaves.
+
+        Sends ``ready`` once the first poll has recorded the current state,
+        then a ``delta`` (see ``VdcWatcher.poll``) whenever a poll finds
+        added, changed or removed servers, LANs, NAT gateways or load
+        balancers, and a comment line after quiet polls so a closed tab is
+        noticed. Polls run in the background lane and revalidate cached
+        listings, so an unchanged VDC mostly costs 304s. A client may hold
+        ``WATCH_MAX_PER_CLIENT`` watches at once; all of them end when the
+        server shuts down.
+        """
+        key = ResponseCache.make_key(token, contract, "watch")
+        with self.watches_lock:
+            if self.watches[key] >= WATCH_MAX_PER_CLIENT:
+                refused = True
+            else:
+                refused = False
+                self.watches[key] += 1
+        if refused:
+            self._send_json_error(429, f"At most {WATCH_MAX_PER_CLIENT} live watches "
+                                       f"per token; close another tab first")
             return
+        try:
+            self._watch_vdc(dc_id, token, contract, interval)
+        finally:
+            with self.watches_lock:
+                self.watches[key] -= 1
+                if not self.watches[key]:
+                    del self.watches[key]
 
-        # Validate the target is an IONOS API endpoint
-        target_host = (target_parsed.hostname or "").lower()
-        allowed_hosts = ["api.ionos.com"]
-        is_allowed = any(
-            target_host == h or target_host.endswith(f".{h}")
-            for h in allowed_hosts
+    def _watch_vdc(self, dc_id: str, token: str, contract: str,
+                   interval: float) -> None:
+        stopping = getattr(self.server, "stopping", None) or threading.Event()
+        watcher = VdcWatcher(
+            lambda url: self.fetch_json(url, token, contract,
+                                        PRIORITY_BACKGROUND, revalidate=True),
+            dc_id, self.batch_concurrency,
         )
-        is_ionos_regional = target_host.endswith(".ionos.com")
-
-        if not (is_allowed or is_ionos_regional):
-            self._send_json_error(
-                403, f"Proxy blocked: {target_host} is not an IONOS endpoint"
-            )
+        chunked = self._start_event_stream()
+        if chunked is None:
             return
+        try:
+            while True:
+                started = time.monotonic()
+                result = watcher.poll()
+                if watcher.polls == 1:
+                    if not result["counts"]:
+                        # Nothing could be listed (bad token, unknown VDC).
+                        self._write_sse("error", {"errors": result["errors"]},
+                                        chunked)
+                        self._end_stream(chunked)
+                        return
+                    self._write_sse("ready", {
+                        "counts": result["counts"], "interval": interval,
+                        "elapsedMs": result["elapsedMs"],
+                    }, chunked)
+                elif result["changes"]:
+                    self._write_sse("delta", result, chunked)
+                    sys.stderr.write(
+                        f"  [Watch] {dc_id}: "
+                        + ", ".join(f"{name} +{len(c['added'])} ~{len(c['changed'])} "
+                                    f"-{len(c['removed'])}"
+                                    for name, c in result["changes"].items())
+                        + f" ({result['calls']} calls)\n"
+                    )
+                else:
+                    self._write_chunk(b": no changes\n\n", chunked)
+                if stopping.wait(max(0.0, interval - (time.monotonic() - started))):
+                    self.close_connection = True
+                    self._end_stream(chunked)
+                    return
+        except OSError:
+            self.close_connection = True  # tab closed or live mode switched off
 
-        # Read auth token from header (never from URL)
+    def _handle_prefetch_register(self) -> None:
+        """Ask the background crawler to keep this contract's VDCs warm.
+
+        Body: ``{"favorites": [...], "location": "de/fra", "current": "<id>"}``.
+        The VDCs are listed with the caller's token, which also checks the
+        token before the crawler holds on to it. Registering again re-ranks
+        the queue and keeps the session alive.
+        """
+        payload = self._read_json_body()
+        if payload is None:
+            return
+        if self.prefetch is None:
+            self._send_json_error(404, "Prefetch is off; start serve.py with --prefetch")
+            return
         token = self.headers.get("X-Token", "")
         contract = self.headers.get("X-Contract-Number", "")
         if not token:
             self._send_json_error(401, "Missing X-Token header")
             return
+        favorites = payload.get("favorites") or []
+        location = payload.get("location") or ""
+        current = payload.get("current") or ""
+        if (not isinstance(favorites, list) or not isinstance(location, str)
+                or not isinstance(current, str)):
+            self._send_json_error(400, "Invalid prefetch parameters")
+            return
+        listing = self.fetch_json(f"{CLOUD_API}/datacenters?depth=1", token, contract)
+        if listing["error"]:
+            self._send_json_error(listing["status"] or 502, listing["error"])
+            return
+        self._send_json_response(200, self.prefetch.register(
+            ResponseCache.make_key(token, contract, "prefetch"), token, contract,
+            [dc for dc in (listing["body"] or {}).get("items", []) if dc.get("id")],
+            [f for f in favorites if isinstance(f, str)], location, current,
+        ))
 
-        # Build the upstream request
-        post_data = None
-        if method == "POST":
-            content_length = int(self.headers.get("Content-Length", 0))
-            if content_length > 0:
-                post_data = self.rfile.read(content_length)
+    def _handle_prefetch_unregister(self) -> None:
+        """Stop crawling for the caller's token and contract (on disconnect)."""
+        token = self.headers.get("X-Token", "")
+        contract = self.headers.get("X-Contract-Number", "")
+        stopped = bool(self.prefetch and token and self.prefetch.unregister(
+            ResponseCache.make_key(token, contract, "prefetch")
+        ))
+        self._send_json_response(200, {"stopped": stopped})
 
-        req = urllib.request.Request(target_url, method=method, data=post_data)
-        req.add_header("Authorization", f"Bearer {token}")
-        req.add_header("Content-Type", "application/json")
-        req.add_header("User-Agent", "IONOS-Cloud-Network-Hub/1.1")
-        if contract:
-            req.add_header("X-Contract-Number", contract)
+    def _handle_idle_scan(self) -> None:
+        """Find idle running servers with a few grouped telemetry queries.
+
+        Body: ``{"uuids": [...], "threshold": 100, "hours": 1, "step": 300}``.
+        Server UUIDs are packed into ``uuid=~"a|b|c"`` matchers sized to stay
+        under the query-length limit, the in/out queries for all groups run
+        concurrently, and progress is streamed as server-sent events. The
+        final ``done`` event carries per-UUID averages and the idle verdict.
+        """
+        payload = self._read_json_body()
+        if payload is None:
+            return
+        token = self.headers.get("X-Token", "")
+        contract = self.headers.get("X-Contract-Number", "")
+        priority = self._request_priority()
+        if not token:
+            self._send_json_error(401, "Missing X-Token header")
+            return
+        try:
+            uuids = list(dict.fromkeys(
+                u.lower() for u in payload.get("uuids", []) if UUID_RE.match(str(u))
+            ))
+            threshold = float(payload.get("threshold", IDLE_THRESHOLD_BYTES_PER_SEC))
+            hours = min(max(float(payload.get("hours", 1)), 0.1), 24)
+            step = min(max(int(payload.get("step", 300)), 15), 3600)
+        except (TypeError, ValueError, AttributeError):
+            self._send_json_error(400, "Invalid idle-scan parameters")
+            return
 
-        ctx = ssl.create_default_context()
+        end = int(time.time())
+        time_params = f"&start={end - int(hours * 3600)}&end={end}&step={step}"
+        chunks = chunk_uuids(uuids)
+        metrics = {"in": "instance_network_in_bytes",
+                   "out": "instance_network_out_bytes"}
+        averages = {direction: {} for direction in metrics}
+        failed: set = set()
+        remaining = {i: len(metrics) for i in range(len(chunks))}
+        scanned = 0
 
+        chunked = self._start_event_stream()
+        if chunked is None:
+            return
+        executor = ThreadPoolExecutor(
+            max_workers=self.batch_concurrency, thread_name_prefix="hub-telemetry"
+        )
         try:
-            with urllib.request.urlopen(
-                req, context=ctx, timeout=REQUEST_TIMEOUT_SECONDS
-            ) as resp:
-                body = resp.read(MAX_RESPONSE_BYTES + 1)
-                if len(body) > MAX_RESPONSE_BYTES:
-                    self._send_json_error(
-                        413, f"Response exceeds {MAX_RESPONSE_BYTES // (1024*1024)} MB limit"
+            self._write_sse("progress", {"scanned": 0, "total": len(uuids),
+                                         "queries": len(chunks) * len(metrics)},
+                            chunked)
+            futures = {}
+            for index, chunk in enumerate(chunks):
+                for direction, metric in metrics.items():
+                    query = urllib.parse.quote(idle_scan_query(metric, chunk))
+                    url = f"{TELEMETRY_API}/query_range?query={query}{time_params}"
+                    future = executor.submit(
+                        self.fetch_json, url, token, contract, priority,
+                        timer=self._upstream_timer,
                     )
-                    return
-                self.send_response(resp.status)
-                content_type = resp.headers.get("Content-Type", "application/json")
-                self.send_header("Content-Type", content_type)
-                self._add_cors_headers()
-                self.end_headers()
-                self.wfile.write(body)
-
-        except urllib.error.HTTPError as e:
-            try:
-                error_body = e.read(2048).decode("utf-8", errors="replace")
-            except Exception:
-                error_body = "(unable to read error response)"
-            self.send_response(e.code)
-            self.send_header("Content-Type", "application/json")
-            self._add_cors_headers()
-            self.end_headers()
-            self.wfile.write(
-                json.dumps({
-                    "error": f"IONOS API returned {e.code}",
-                    "detail": error_body[:500],
-                }).encode()
-            )
-        except urllib.error.URLError as e:
-            self._send_json_error(502, f"Could not reach IONOS API: {e.reason}")
-        except socket.timeout:
-            self._send_json_error(504, "API request timed out")
-        except OSError as e:
-            self._send_json_error(502, f"Network error: {e}")
+                    futures[future] = (index, direction)
+            for future in as_completed(futures):
+                index, direction = futures[future]
+                call = future.result()
+                if call["error"]:
+                    failed.update(chunks[index])
+                else:
+                    averages[direction].update(series_means(call["body"]))
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    scanned += len(chunks[index])
+                    self._write_sse("progress", {"scanned": scanned,
+                                                 "total": len(uuids)}, chunked)
 
-    # ── Price List (direct page fetch + cache) ──────────────────────
+            results = {}
+            for uuid in uuids:
+                if uuid in failed:
+                    continue
+                avg_in = averages["in"].get(uuid, 0.0)
+                avg_out = averages["out"].get(uuid, 0.0)
+                results[uuid] = {
+                    "avgBytesIn": avg_in, "avgBytesOut": avg_out,
+                    "idle": avg_in <= threshold and avg_out <= threshold,
+                }
+            self._write_sse("done", {"results": results, "failed": sorted(failed),
+                                     "threshold": threshold}, chunked)
+            self._end_stream(chunked)
+        except OSError:
+            self.close_connection = True
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    PRICE_LIST_URL = (
-        "https://docs.ionos.com/cloud/support/general-information/"
-        "price-list/ionos-cloud-se-en"
-    )
-    _price_list_cache: Optional[str] = None
-    _price_list_cache_ts: float = 0
-    PRICE_LIST_CACHE_TTL = 3600  # 1 hour
+    def _read_json_body(self, max_bytes: int = 1024 * 1024) -> Optional[dict]:
+        """Read and parse a JSON object body; sends the error and returns None on failure."""
+        content_length = int(self.headers.get("Content-Length", 0))
+        if content_length > max_bytes:
+            self.close_connection = True
+            self._send_json_error(413, "Request body too large")
+            return None
+        raw = self.rfile.read(content_length) if content_length else b""
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            self._send_json_error(400, "Request body must be a JSON object")
+            return None
+        return payload
 
-    def _handle_price_list(self) -> None:
-        """Fetch the IONOS price list page, extract content, cache, return text."""
-        now = time.time()
-        # Return cached version if fresh
-        cls = type(self)
-        if (cls._price_list_cache
-                and (now - cls._price_list_cache_ts) < cls.PRICE_LIST_CACHE_TTL):
-            self._send_json_response(200, {
-                "text": cls._price_list_cache, "cached": True
-            })
-            return
+    def _write_sse(self, event: str, data, chunked: bool) -> None:
+        self._write_chunk(
+            f"event: {event}\ndata: {json.dumps(data)}\n\n".encode(), chunked
+        )
 
-        try:
-            req = urllib.request.Request(
-                self.PRICE_LIST_URL,
-                method="GET",
-            )
-            req.add_header("User-Agent", "IONOS-Cloud-Network-Hub/1.1")
-            req.add_header("Accept", "text/html")
-            ctx = ssl.create_default_context()
+    # ── Flow logs ────────────────────────────────────────────────────
+
+    def _flowlog_store(self) -> Optional[FlowLogStore]:
+        """The caller's own flow log store, or None after sending a 401."""
+        token = self.headers.get("X-Token", "")
+        if not token:
+            self.close_connection = True  # a request body may be unread
+            self._send_json_error(401, "Missing X-Token header")
+            return None
+        contract = self.headers.get("X-Contract-Number", "")
+        self._flowlog_key = ResponseCache.make_key(token, contract, "flowlogs")
+        return self.flowlogs.get(self._flowlog_key)  # released after the request
+
+    def _handle_flowlog_upload(self, parsed: urllib.parse.ParseResult) -> None:
+        """Ingest one raw ``.log`` / ``.log.gz`` file sent as the request body."""
+        store = self._flowlog_store()
+        if store is None:
+            return
+        name = urllib.parse.parse_qs(parsed.query).get("name", [""])[0]
+        content_length = int(self.headers.get("Content-Length", 0))
+        if not name:
+            self.close_connection = True
+            self._send_json_error(400, "Missing ?name= (the flow log file name)")
+            return
+        if content_length > FLOWLOG_MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            self._send_json_error(413, "Flow log file too large")
+            return
 
-            with urllib.request.urlopen(
-                req, context=ctx, timeout=REQUEST_TIMEOUT_SECONDS
-            ) as resp:
-                html = resp.read(512 * 1024).decode("utf-8", errors="replace")
+        def body_chunks():
+            remaining = content_length
+            while remaining > 0:
+                chunk = self.rfile.read(min(STREAM_CHUNK_BYTES, remaining))
+                if not chunk:
+                    raise ConnectionError("client closed during upload")
+                remaining -= len(chunk)
+                yield chunk
 
+        started = time.monotonic()
+        seen = store.find(name) is not None
+        try:
+            seg = store.ingest(name, body_chunks())
+        except zlib.error as e:
+            self.close_connection = True
+            self._send_json_error(400, f"Cannot decompress {name}: {e}")
+            return
+        except ValueError as e:
+            self._send_json_error(400, f"Cannot parse {name}: {e}")
+            return
+        except OSError:
+            self.close_connection = True
+            return
+        elapsed = time.monotonic() - started
+        if not seen:
             sys.stderr.write(
-                f"  [PriceList] Fetched {len(html)} bytes HTML\n"
+                f"  [FlowLogs] {name}: {len(seg)} records in {elapsed * 1000:.0f} ms\n"
             )
+        self._send_json_response(200, {"file": seg.info(), "skipped": seen,
+                                       "total": store.total()})
 
-            text = ""
+    def _handle_flowlog_attribute(self) -> None:
+        """Per-node and per-link traffic for the heatmap.
 
-            # ── Strategy 1: Extract from __NEXT_DATA__ JSON (GitBook/Next.js) ──
-            # GitBook renders pages via JS. The actual content is embedded in a
-            # <script id="__NEXT_DATA__"> JSON blob as pre-rendered markdown.
-            next_data_match = re.search(
-                r'<script\s+id="__NEXT_DATA__"[^>]*>(.*?)</script>',
-                html, re.DOTALL
-            )
-            if next_data_match:
-                try:
-                    nd = json.loads(next_data_match.group(1))
-                    # GitBook embeds page content at various paths in the JSON.
-                    # Walk the tree to find markdown/text content.
-                    text = self._extract_gitbook_content(nd)
-                    if text:
-                        sys.stderr.write(
-                            f"  [PriceList] Extracted {len(text)} chars "
-                            f"from __NEXT_DATA__\n"
-                        )
-                except (json.JSONDecodeError, KeyError, TypeError) as e:
-                    sys.stderr.write(
-                        f"  [PriceList] __NEXT_DATA__ parse failed: {e}\n"
-                    )
+        Body: ``{"prefixes": [["10.0.0.0/24", "lan-1"], ...],
+        "nics": {"<nic-uuid>": "srv-..."}}`` — the browser's topology index.
+        """
+        store = self._flowlog_store()
+        if store is None:
+            return
+        payload = self._read_json_body(max_bytes=16 * 1024 * 1024)
+        if payload is None:
+            return
+        index = PrefixIndex()
+        try:
+            for cidr, node_id in payload.get("prefixes", []):
+                index.insert(str(cidr), str(node_id))
+            nics = {str(k): str(v) for k, v in (payload.get("nics") or {}).items()}
+        except (TypeError, ValueError, AttributeError):
+            self._send_json_error(400, "'prefixes' must be [cidr, nodeId] pairs")
+            return
+        self._send_json_response(200, store.attribute(index, nics))
 
-            # ── Strategy 2: Look for structured data in page (JSON-LD, tables) ──
-            if not text:
-                # Try to extract table data specifically (pricing is usually in tables)
-                tables = re.findall(
-                    r'<table[^>]*>(.*?)</table>', html,
-                    flags=re.DOTALL | re.IGNORECASE
-                )
-                if tables:
-                    table_text = []
-                    for tbl in tables:
-                        rows = re.findall(r'<tr[^>]*>(.*?)</tr>', tbl,
-                                          flags=re.DOTALL | re.IGNORECASE)
-                        for row in rows:
-                            cells = re.findall(
-                                r'<t[hd][^>]*>(.*?)</t[hd]>', row,
-                                flags=re.DOTALL | re.IGNORECASE
-                            )
-                            cells = [re.sub(r'<[^>]+>', '', c).strip()
-                                     for c in cells]
-                            if any(cells):
-                                table_text.append(' | '.join(cells))
-                    if table_text:
-                        text = '\n'.join(table_text)
-                        sys.stderr.write(
-                            f"  [PriceList] Extracted {len(text)} chars "
-                            f"from HTML tables ({len(tables)} tables)\n"
-                        )
+    @staticmethod
+    def _flowlog_listing(store: FlowLogStore) -> dict:
+        return {"files": store.files(), "total": store.total(),
+                "persistent": store.directory is not None}
 
-            # ── Strategy 3: Fallback — strip all HTML ──
-            if not text:
-                text = re.sub(
-                    r'<(script|style|noscript|svg|path)[^>]*>.*?</\1>', '',
-                    html, flags=re.DOTALL | re.IGNORECASE
-                )
-                text = re.sub(r'<[^>]+>', ' ', text)
-                # Decode common entities
-                for ent, ch in [('&amp;', '&'), ('&lt;', '<'), ('&gt;', '>'),
-                                ('&quot;', '"'), ('&#39;', "'"), ('&nbsp;', ' '),
-                                ('&#x20AC;', '€'), ('&euro;', '€')]:
-                    text = text.replace(ent, ch)
-                text = re.sub(r'[ \t]+', ' ', text)
-                text = re.sub(r'\n{3,}', '\n\n', text)
-                text = text.strip()
-                sys.stderr.write(
-                    f"  [PriceList] Fallback HTML strip → {len(text)} chars\n"
-                )
+    def _handle_flowlogs_get(self, parsed: urllib.parse.ParseResult) -> None:
+        """``/api/flowlogs`` file list, ``/query`` pages, ``/aggregate`` groups."""
+        params = urllib.parse.parse_qs(parsed.query)
 
-            # Truncate to keep context manageable
-            if len(text) > 16000:
-                text = text[:16000] + '\n\n[Price list truncated — see full list at ' + self.PRICE_LIST_URL + ']'
+        def param(key: str, default: str) -> str:
+            return params.get(key, [default])[0] or default
 
-            # Log a preview so we can debug content quality
-            preview = text[:500].replace('\n', '\\n')
-            sys.stderr.write(f"  [PriceList] Preview: {preview}\n")
+        store = self._flowlog_store()
+        if store is None:
+            return
+        try:
+            if parsed.path == "/api/flowlogs":
+                self._send_json_response(200, self._flowlog_listing(store))
+            elif parsed.path == "/api/flowlogs/query":
+                limit = min(max(int(param("limit", "500")), 1), PAGE_SIZE_MAX)
+                self._send_json_response(200, store.query(
+                    FlowLogFilter(params), sort=param("sort", "start"),
+                    descending=param("dir", "desc") == "desc",
+                    offset=max(int(param("offset", "0")), 0), limit=limit,
+                ))
+            elif parsed.path == "/api/flowlogs/aggregate":
+                limit = min(max(int(param("limit", "100")), 1), FLOWLOG_GROUPS_MAX)
+                by = tuple(f for f in param("by", "srcaddr,dstaddr").split(",") if f)
+                self._send_json_response(200, store.aggregate(
+                    FlowLogFilter(params), by=by, limit=limit,
+                    order=param("order", "bytes"),
+                ))
+            else:
+                self._send_json_error(404, f"Unknown API path: {parsed.path}")
+        except ValueError as e:
+            self._send_json_error(400, str(e))
 
-            cls._price_list_cache = text
-            cls._price_list_cache_ts = now
-            self._send_json_response(200, {
-                "text": text, "cached": False
-            })
+    # ── Price List (direct page fetch + cache) ──────────────────────
+
+    def _handle_price_list(self) -> None:
+        """Return the extracted IONOS price list text.
 
-        except urllib.error.HTTPError as e:
-            self._send_json_error(e.code, f"Price list fetch failed: {e.code}")
-        except urllib.error.URLError as e:
-            self._send_json_error(502, f"Could not reach price list: {e.reason}")
+        Served from ``PriceListCache``: a stale copy is returned at once
+        while it refreshes in the background, so only the very first
+        request without a saved copy waits for the docs site.
+        """
+        try:
+            text, state = self.price_list.get()
+        except PriceListError as e:
+            self._send_json_error(e.status, str(e))
+            return
         except socket.timeout:
             self._send_json_error(504, "Price list request timed out")
-        except OSError as e:
-            self._send_json_error(502, f"Network error: {e}")
+            return
+        except (OSError, http.client.HTTPException) as e:
+            self._send_json_error(502, f"Could not reach price list: {e}")
+            return
+        self._send_json_response(200, {
+            "text": text,
+            "cached": state != "fetched",
+            "stale": state == "stale",
+            "age": round(self.price_list.age()),
+        })
 
     @staticmethod
     def _extract_gitbook_content(nd: dict) -> str:
@@ -413,142 +5727,155 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     # ── MCP Docs (GitBook) ─────────────────────────────────────────
 
     # IONOS docs portal is hosted on GitBook which exposes an MCP server.
-    # We proxy JSON-RPC requests to it so the AI assistant can search docs.
+    # The server keeps one MCP session per docs space so the AI assistant
+    # can search docs without re-initializing from the browser.
     MCP_DOCS_URL = "https://docs.ionos.com/cloud/~gitbook/mcp"
     MCP_DOCS_SUPPORT_URL = "https://docs.ionos.com/cloud/support/~gitbook/mcp"
     MCP_DOCS_TUTORIALS_URL = "https://docs.ionos.com/cloud/tutorials/~gitbook/mcp"
 
     def _handle_mcp_docs(self, upstream_url: str = None) -> None:
-        """Proxy a JSON-RPC request to an IONOS GitBook MCP endpoint.
+        """Answer a JSON-RPC request for an IONOS GitBook MCP endpoint.
 
-        GitBook's built-in MCP uses Streamable HTTP transport, which may
-        return responses as Server-Sent Events (text/event-stream) instead
-        of plain JSON.  We detect this and extract the JSON-RPC message
-        from the SSE `data:` lines so the frontend always receives JSON.
+        The browser's ``initialize`` and ``tools/list`` are answered from
+        the server-owned session, ``notifications/*`` are acknowledged
+        locally, and ``tools/call`` searches go through the docs search
+        cache. Everything else is forwarded inside the session. Responses
+        are always plain JSON carrying the browser's own request id.
         """
         content_length = int(self.headers.get("Content-Length", 0))
         if content_length == 0:
             self._send_json_error(400, "Empty request body")
             return
         if content_length > 64 * 1024:  # 64 KB max
+            self.close_connection = True
             self._send_json_error(413, "Request body too large")
             return
+        try:
+            message = json.loads(self.rfile.read(content_length))
+        except ValueError:
+            self._send_json_error(400, "Invalid JSON body")
+            return
+        if not isinstance(message, dict) or not isinstance(
+                message.get("method"), str):
+            self._send_json_error(400, "Expected a JSON-RPC request")
+            return
 
-        post_data = self.rfile.read(content_length)
+        method = message["method"]
+        params = message.get("params") or {}
+        session = self.mcp_sessions.get(upstream_url or self.MCP_DOCS_URL)
+        if "id" not in message:  # notification: the server session sent its own
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self._add_cors_headers()
+            self.end_headers()
+            return
 
-        # Forward the session ID if we have one
-        mcp_session = self.headers.get("Mcp-Session-Id", "")
+        started = time.monotonic()
+        source = "upstream"
+        try:
+            if method == "initialize":
+                reply = {"result": session.initialize()}
+                source = "session"
+            elif method == "tools/list":
+                reply = session.list_tools()
+            elif method == "tools/call":
+                key = SearchCache.make_key(session.url, params.get("name"),
+                                           params.get("arguments"))
+                reply = self.docs_search_cache.get(key) if key else None
+                if reply is not None:
+                    source = "cache"
+                else:
+                    reply = session.call(method, params)
+                    result = reply.get("result")
+                    if key and isinstance(result, dict) and not result.get("isError"):
+                        self.docs_search_cache.put(key, reply)
+            else:
+                reply = session.call(method, params)
+        except McpError as e:
+            self._send_json_response(e.status, {
+                "error": f"MCP endpoint returned {e.status}",
+                "detail": e.detail,
+            })
+            return
+        except socket.timeout:
+            self._send_json_error(504, "MCP docs request timed out")
+            return
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            self._send_json_error(
+                502, f"Could not reach IONOS docs MCP: {e}"
+            )
+            return
 
-        target_url = upstream_url or self.MCP_DOCS_URL
-        req = urllib.request.Request(
-            target_url,
-            method="POST",
-            data=post_data,
-        )
-        req.add_header("Content-Type", "application/json")
-        req.add_header("Accept", "application/json, text/event-stream")
-        req.add_header(
-            "User-Agent", "IONOS-Cloud-Network-Hub/1.1"
+        sys.stderr.write(
+            f"  [MCP] {method} via {source} in "
+            f"{(time.monotonic() - started) * 1000:.0f} ms\n"
         )
-        if mcp_session:
-            req.add_header("Mcp-Session-Id", mcp_session)
+        body = dict(reply)
+        body["jsonrpc"] = "2.0"
+        body["id"] = message["id"]
+        self._send_json_response(200, body)
 
-        ctx = ssl.create_default_context()
+    # ── Metrics ──────────────────────────────────────────────────────
 
-        try:
-            with urllib.request.urlopen(
-                req, context=ctx, timeout=REQUEST_TIMEOUT_SECONDS
-            ) as resp:
-                raw_body = resp.read(MAX_RESPONSE_BYTES)
-                content_type = resp.headers.get("Content-Type", "")
-                session_id = resp.headers.get("Mcp-Session-Id", "")
-                sys.stderr.write(
-                    f"  [MCP] upstream status={resp.status} "
-                    f"type={content_type} "
-                    f"session={session_id[:20] if session_id else 'none'} "
-                    f"body_len={len(raw_body)}\n"
-                )
-                # Log first 300 chars of body for debugging
-                sys.stderr.write(
-                    f"  [MCP] body preview: "
-                    f"{raw_body[:300].decode('utf-8', errors='replace')}\n"
-                )
-
-                # If the response is SSE, extract JSON-RPC from data: lines
-                if "text/event-stream" in content_type:
-                    body = self._extract_json_from_sse(raw_body)
-                else:
-                    body = raw_body
-
-                self.send_response(resp.status)
-                self.send_header("Content-Type", "application/json")
-                if session_id:
-                    self.send_header("Mcp-Session-Id", session_id)
-                self._add_cors_headers()
-                self.end_headers()
-                self.wfile.write(body)
+    def _handle_metrics(self) -> None:
+        """Serve request/upstream metrics plus the ``/stats`` counters.
 
-        except urllib.error.HTTPError as e:
-            try:
-                error_body = e.read(2048).decode("utf-8", errors="replace")
-            except Exception:
-                error_body = ""
-            self.send_response(e.code)
-            self.send_header("Content-Type", "application/json")
-            self._add_cors_headers()
-            self.end_headers()
-            self.wfile.write(
-                json.dumps({
-                    "error": f"MCP endpoint returned {e.code}",
-                    "detail": error_body[:500],
-                }).encode()
-            )
-        except urllib.error.URLError as e:
-            self._send_json_error(
-                502, f"Could not reach IONOS docs MCP: {e.reason}"
+        The component counters (pool, cache, coalescing, docs search) are
+        exported as ``hub_<component>_<counter>`` gauges, and each upstream
+        host's concurrency window as ``hub_upstream_host_*{host=...}``.
+        """
+        lines = [self.metrics.render()]
+        pooled = isinstance(self.server, PooledHTTPServer)
+        for component, stats in (
+            ("server", self.server.stats() if pooled else {}),
+            ("upstream_pool", self.upstream_pool.stats()),
+            ("response_cache", self.response_cache.stats()),
+            ("coalescing", self.inflight.stats()),
+            ("docs_search_cache", self.docs_search_cache.stats()),
+            ("telemetry_cache", self.telemetry_cache.stats()),
+            ("billing_rollups", self.billing_rollups.stats()),
+            ("prefetch", self.prefetch.stats() if self.prefetch else {}),
+            ("compliance", self.compliance.stats()),
+            ("split_bundle", self.split_bundle.stats() if self.split_bundle else {}),
+        ):
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"hub_{component}_{key}"
+                    lines.append(f"# TYPE {name} gauge\n{name} {Metrics.number(value)}\n")
+        hosts = self.upstream_pool.host_stats()
+        for key in ("window", "active", "throttled", "window_cuts"):
+            name = f"hub_upstream_host_{key}"
+            lines.append(f"# TYPE {name} gauge\n")
+            lines.extend(
+                f"{name}{Metrics._labels((('host', host),))} "
+                f"{Metrics.number(stats[key])}\n"
+                for host, stats in hosts.items()
             )
-        except socket.timeout:
-            self._send_json_error(504, "MCP docs request timed out")
-        except OSError as e:
-            self._send_json_error(502, f"Network error: {e}")
-
-    @staticmethod
-    def _extract_json_from_sse(raw: bytes) -> bytes:
-        """Parse an SSE stream and return the last JSON-RPC message.
-
-        GitBook Streamable HTTP responses look like:
-            event: message
-            data: {"jsonrpc":"2.0","id":1,"result":{...}}
-
-        We collect all `data:` lines, try to parse them as JSON, and
-        return the last valid JSON-RPC response (which is the final
-        result for the request).
-        """
-        text = raw.decode("utf-8", errors="replace")
-        last_json: bytes = b"{}"
-        for line in text.splitlines():
-            stripped = line.strip()
-            if stripped.startswith("data:"):
-                payload = stripped[5:].strip()
-                if not payload:
-                    continue
-                try:
-                    # Validate it's JSON
-                    json.loads(payload)
-                    last_json = payload.encode("utf-8")
-                except (json.JSONDecodeError, ValueError):
-                    pass
-        return last_json
+        body = "".join(lines).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self._add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
 
     # ── Helpers ──────────────────────────────────────────────────────
 
     def _send_json_response(self, code: int, data: dict) -> None:
         """Send a JSON response with the given status code."""
+        body = json.dumps(data).encode()
+        compress = len(body) >= COMPRESS_MIN_BYTES and self._client_accepts("gzip")
+        if compress:
+            body = gzip.compress(body, 5)
         self.send_response(code)
         self.send_header("Content-Type", "application/json")
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
         self._add_cors_headers()
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
 
     def _send_json_error(self, code: int, message: str) -> None:
         """Send a JSON error response."""
@@ -565,11 +5892,14 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
                 "Access-Control-Allow-Origin",
                 f"http://localhost:{ProxyHandler.server_port}",
             )
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Expose-Headers", "Mcp-Session-Id")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, PATCH, DELETE, OPTIONS")
+        self.send_header(
+            "Access-Control-Expose-Headers", "Mcp-Session-Id, X-Cache, Age"
+        )
         self.send_header(
             "Access-Control-Allow-Headers",
-            "Content-Type, X-Token, Authorization, X-Contract-Number, Mcp-Session-Id",
+            "Content-Type, X-Token, Authorization, X-Contract-Number, Mcp-Session-Id, "
+            "Cache-Control",
         )
 
     def log_message(self, format: str, *args) -> None:
@@ -596,7 +5926,86 @@ def main() -> None:
         "--no-browser", action="store_true",
         help="Don't auto-open the browser",
     )
+    parser.add_argument(
+        "--cache-mb", type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+        help=f"Server-side API response cache size in MB "
+             f"(default: {CACHE_MAX_BYTES // (1024 * 1024)}, 0 = disabled)",
+    )
+    parser.add_argument(
+        "--max-response-mb", type=int, default=MAX_RESPONSE_BYTES // (1024 * 1024),
+        help=f"Largest upstream response the proxy will relay in MB "
+             f"(default: {MAX_RESPONSE_BYTES // (1024 * 1024)})",
+    )
+    parser.add_argument(
+        "--batch-concurrency", type=int, default=BATCH_CONCURRENCY,
+        help=f"Upstream calls run in parallel per /proxy/batch request "
+             f"(default: {BATCH_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--flowlog-dir", type=Path, default=None,
+        help="Keep uploaded flow logs in a memory-mapped archive in this "
+             "directory across restarts (default: in memory only)",
+    )
+    parser.add_argument(
+        "--price-list-cache", type=Path,
+        default=CACHE_DIR / "price-list-cache.json",
+        help="File the extracted IONOS price list is saved to so it "
+             "survives restarts (default: price-list-cache.json in "
+             "$XDG_CACHE_HOME/ionos-cloud-network-hub, else ~/.cache/...)",
+    )
+    parser.add_argument(
+        "--upstream-override", type=str, default=None, metavar="URL",
+        help="Send every upstream call to this http(s)://host:port instead, "
+             "keeping the original Host header. The IONOS allow-list still "
+             "applies. For offline benchmarks against bench/mock_ionos.py",
+    )
+    parser.add_argument(
+        "--prefetch", action="store_true",
+        help="Keep every VDC of a connected contract warm in the response "
+             "cache from a background crawler, so switching VDCs is instant",
+    )
+    parser.add_argument(
+        "--prefetch-rate", type=float, default=PREFETCH_RATE, metavar="CALLS",
+        help=f"Upstream calls per second the crawler may make "
+             f"(default: {PREFETCH_RATE:g})",
+    )
+    parser.add_argument(
+        "--split-modules", action="store_true",
+        help="Serve the page as a slim shell plus content-hashed chunks "
+             "(flow logs, AI assistant, exporters, map overlays, other "
+             "locales) that load on first use",
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=DEFAULT_WORKERS,
+        help=f"Concurrent request workers (default: {DEFAULT_WORKERS}, "
+             f"0 = single-threaded)",
+    )
+    parser.add_argument(
+        "--max-streams", type=int, default=DEFAULT_MAX_STREAMS,
+        help=f"Event streams (live mode, idle scans, audits) open at once; each "
+             f"runs on its own thread outside the workers (default: {DEFAULT_MAX_STREAMS})",
+    )
     args = parser.parse_args()
+    if args.workers < 0:
+        parser.error("--workers must be 0 or a positive number")
+    if args.max_streams < 0:
+        parser.error("--max-streams must be 0 or a positive number")
+    if args.batch_concurrency < 1:
+        parser.error("--batch-concurrency must be at least 1")
+    if args.max_response_mb < 1:
+        parser.error("--max-response-mb must be at least 1")
+    if args.prefetch_rate <= 0:
+        parser.error("--prefetch-rate must be positive")
+    if args.upstream_override:
+        override = urllib.parse.urlsplit(args.upstream_override)
+        if override.scheme not in ("http", "https") or not override.hostname:
+            parser.error("--upstream-override must be an http(s)://host:port URL")
+        ProxyHandler.upstream_pool.override = (
+            override.scheme, override.hostname,
+            override.port or (443 if override.scheme == "https" else 80),
+        )
+        print(f"  [Upstream] All upstream calls go to {args.upstream_override}",
+              file=sys.stderr)
 
     html_path = SCRIPT_DIR / HTML_FILE
     if not html_path.exists():
@@ -612,7 +6021,13 @@ def main() -> None:
     server: Optional[http.server.HTTPServer] = None
     for attempt in range(MAX_PORT_RETRIES + 1):
         try:
-            server = http.server.HTTPServer((args.host, port), ProxyHandler)
+            if args.workers:
+                server = PooledHTTPServer(
+                    (args.host, port), ProxyHandler, workers=args.workers,
+                    max_streams=args.max_streams,
+                )
+            else:
+                server = http.server.HTTPServer((args.host, port), ProxyHandler)
             break
         except OSError:
             if attempt < MAX_PORT_RETRIES:
@@ -630,6 +6045,53 @@ def main() -> None:
                 sys.exit(1)
 
     ProxyHandler.server_port = port
+    if args.split_modules:
+        ProxyHandler.split_bundle = SplitBundle(html_path)
+        try:
+            ProxyHandler.split_bundle.refresh()  # split and compress before the first visit
+        except ValueError as e:
+            print(f"ERROR: Cannot split {HTML_FILE}: {e}", file=sys.stderr)
+            sys.exit(1)
+        stats = ProxyHandler.split_bundle.stats()
+        print(f"  [Split] {stats['shell_bytes'] // 1024} KB shell, {stats['chunks']} chunks "
+              f"({stats['chunk_bytes'] // 1024} KB) loaded on first use", file=sys.stderr)
+        for warning in ProxyHandler.split_bundle.warnings:
+            print(f"  [Split] {warning}", file=sys.stderr)
+    else:
+        ProxyHandler.static_assets.get(HTML_FILE)  # compress once, before the first visit
+    ProxyHandler.max_response_bytes = args.max_response_mb * 1024 * 1024
+    ProxyHandler.batch_concurrency = args.batch_concurrency
+    ProxyHandler.response_cache = ResponseCache(
+        max_bytes=max(0, args.cache_mb) * 1024 * 1024
+    )
+    if args.flowlog_dir is not None:
+        try:
+            ProxyHandler.flowlogs = FlowLogStores(args.flowlog_dir)
+            archives = ProxyHandler.flowlogs.archives()
+        except OSError as e:
+            print(f"ERROR: Cannot use --flowlog-dir {args.flowlog_dir}: {e}",
+                  file=sys.stderr)
+            sys.exit(1)
+        print(
+            f"  [FlowLogs] {archives} client archive(s) in {args.flowlog_dir}, "
+            f"each reopened on its first request",
+            file=sys.stderr,
+        )
+    ProxyHandler.price_list = PriceListCache(
+        ProxyHandler.upstream_pool, path=args.price_list_cache
+    )
+    if ProxyHandler.price_list.text is not None:
+        print(
+            f"  [PriceList] Loaded saved copy from {args.price_list_cache} "
+            f"({ProxyHandler.price_list.age() / 60:.0f} min old)",
+            file=sys.stderr,
+        )
+    if args.prefetch:
+        ProxyHandler.prefetch = PrefetchCrawler(ProxyHandler.fetch_json,
+                                                rate=args.prefetch_rate)
+        ProxyHandler.prefetch.start()
+        print(f"  [Prefetch] Crawling registered contracts at up to "
+              f"{args.prefetch_rate:g} upstream calls/s", file=sys.stderr)
     url = f"http://localhost:{port}"
 
     print()
@@ -647,11 +6109,19 @@ def main() -> None:
     if not args.no_browser:
         webbrowser.open(url)
 
+    # `docker stop` sends SIGTERM — treat it like Ctrl+C so in-flight
+    # requests get to finish instead of being cut off mid-response.
+    signal.signal(
+        signal.SIGTERM,
+        lambda *_: threading.Thread(target=server.shutdown).start(),
+    )
+
     try:
         server.serve_forever()
     except KeyboardInterrupt:
-        print("\n  Shutting down...")
-        server.shutdown()
+        pass
+    print("\n  Shutting down...")
+    server.server_close()
 
 
 if __name__ == "__main__":